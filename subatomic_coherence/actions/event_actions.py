@@ -1,16 +1,19 @@
-from subatomic_coherence.testing.test import TestResult, ResultCode
+from subatomic_coherence.actions.simple_actions import resolve_value
+from subatomic_coherence.profiling.profiling import profiled
+from subatomic_coherence.testing.test import PENDING_RESULT, SUCCESS_RESULT
 
 
 def expect_event(user, event_template):
     def expect_event_function(slack_user_workspace, data_store):
-        user_client = slack_user_workspace.find_user_client_by_username(user)
+        user_client = slack_user_workspace.find_user_client_by_username(resolve_value(user, data_store))
         event_verifier = EventVerifier(event_template)
-        for event in user_client.events:
-            if event_verifier.verify(event):
-                for key in event_verifier.stored_values:
-                    data_store[key] = event_verifier.stored_values[key]
-                return TestResult(ResultCode.success)
-        return TestResult(ResultCode.pending)
+        user_client.events.last_processed_event = None
+        for event, stored_values in event_verifier.verify_batch(user_client.events, limit=1):
+            for key in stored_values:
+                data_store[key] = stored_values[key]
+            user_client.events.last_processed_event = event
+            return SUCCESS_RESULT
+        return PENDING_RESULT
 
     return expect_event_function
 
@@ -64,11 +67,30 @@ class EventVerifier(object):
         self.stored_values = {}
         self.event_pattern_context = EventPatternContext()
         self.parse_template(self.event_template)
+        self.literal_fields = self.find_literal_fields(self.event_template)
 
     def verify(self, event):
         self.stored_values = {}
         return self.verify_property(self.event_template, event)
 
+    def verify_batch(self, events, limit=None):
+        """
+        Verifies a block of events, returning a list of (event, stored_values) tuples for the matched events in order.
+        events can be any iterable of events or an EventBatch shared between several verifiers. Only the events whose
+        root level literal fields match the template are fully verified, see EventBatch.
+        """
+        if not isinstance(events, EventBatch):
+            events = EventBatch(events)
+        matches = []
+        with profiled("verification", "event"):
+            for event_index in events.candidates(self.literal_fields):
+                event = events.events[event_index]
+                if self.verify(event):
+                    matches.append((event, self.stored_values))
+                    if limit is not None and len(matches) >= limit:
+                        break
+        return matches
+
     def verify_dict_property(self, base_property, event_property, property_name, depth):
         self.event_pattern_context.reset_groups(depth)
         if isinstance(event_property, dict) and property_name in event_property:
@@ -125,6 +147,24 @@ class EventVerifier(object):
 
         return value
 
+    def find_literal_fields(self, event_template):
+        # Root level properties which can only be matched by one exact value, these are used to filter event batches
+        literal_fields = []
+        if not isinstance(event_template, dict):
+            return literal_fields
+        for property_name, base_property in event_template.items():
+            if isinstance(base_property, str):
+                cleaned_base_property = self.clean_value(base_property)
+                if cleaned_base_property != "*":
+                    literal_fields.append((property_name, cleaned_base_property))
+            elif type(base_property) is SimpleEventPattern and base_property.group_id is None:
+                try:
+                    hash(base_property.expected_value)
+                except TypeError:
+                    continue
+                literal_fields.append((property_name, base_property.expected_value))
+        return literal_fields
+
     def parse_template(self, next_property, property_stack=None):
         if property_stack is None:
             property_stack = ["base"]
@@ -139,6 +179,55 @@ class EventVerifier(object):
             self.event_pattern_context.add_event_pattern(next_property)
 
 
+def verify_batch(events, event_verifiers):
+    """
+    Verifies a block of events against several EventVerifiers at once, sharing the columns extracted from the events.
+    Returns a list with the matches of each verifier, see EventVerifier.verify_batch.
+    """
+    event_batch = EventBatch(events)
+    return [event_verifier.verify_batch(event_batch) for event_verifier in event_verifiers]
+
+
+class EventBatch(object):
+    """
+    A columnar view of a block of events. The values of a root level event field are extracted once per batch into an
+    index of value to event positions, so filtering the batch on the literal fields of a template is a dictionary lookup
+    and a set intersection per field rather than a walk of the template for every event. Events that pass the filter
+    still need to be fully verified.
+    """
+
+    def __init__(self, events):
+        self.events = list(events)
+        self.columns = {}
+
+    def column(self, field_name):
+        if field_name not in self.columns:
+            column = {}
+            for event_index, event in enumerate(self.events):
+                if isinstance(event, dict) and field_name in event:
+                    try:
+                        column.setdefault(event[field_name], []).append(event_index)
+                    except TypeError:
+                        # Unhashable values (dicts and lists) can never equal a literal field
+                        pass
+            self.columns[field_name] = column
+        return self.columns[field_name]
+
+    def candidates(self, literal_fields):
+        if len(literal_fields) == 0:
+            return range(len(self.events))
+        candidate_indexes = None
+        for field_name, value in literal_fields:
+            field_indexes = self.column(field_name).get(value, [])
+            if candidate_indexes is None:
+                candidate_indexes = set(field_indexes)
+            else:
+                candidate_indexes.intersection_update(field_indexes)
+            if len(candidate_indexes) == 0:
+                break
+        return sorted(candidate_indexes)
+
+
 class EventPatternContext(object):
     def __init__(self):
         self.event_pattern_groups = {}
@@ -205,6 +294,8 @@ class EventPatternGroup(object):
 
 
 class EventPattern(object):
+    __slots__ = ("group_id", "matched", "matched_value", "storage_name", "property_stack")
+
     def __init__(self, storage_name=None, group_id=None):
         self.group_id = group_id
         self.matched = False
@@ -234,6 +325,8 @@ class EventPattern(object):
 
 
 class WildCardEventPattern(EventPattern):
+    __slots__ = ()
+
     def __init__(self, storage_name=None, group_id=None):
         super().__init__(storage_name, group_id)
 
@@ -242,6 +335,8 @@ class WildCardEventPattern(EventPattern):
 
 
 class SimpleEventPattern(EventPattern):
+    __slots__ = ("expected_value",)
+
     def __init__(self, expected_value, storage_name=None, group_id=None):
         super().__init__(storage_name, group_id)
         self.expected_value = expected_value
@@ -251,6 +346,8 @@ class SimpleEventPattern(EventPattern):
 
 
 class ComplexEventPattern(EventPattern):
+    __slots__ = ("template", "event_verifier")
+
     def __init__(self, template, storage_name, group_id=None):
         super().__init__(storage_name, group_id)
         self.template = template
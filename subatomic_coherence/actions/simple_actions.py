@@ -1,4 +1,30 @@
-from subatomic_coherence.testing.test import TestResult, ResultCode
+from subatomic_coherence.actions.text_matchers import text_matcher
+from subatomic_coherence.profiling.profiling import profiled
+from subatomic_coherence.testing.test import TestResult, ResultCode, PENDING_RESULT, SUCCESS_RESULT, RESPONSE_TIMES
+from subatomic_coherence.user.action_index import action_index, get_main_message_body
+from subatomic_coherence.user.slack_user import EventStore
+
+
+class StoredValue(object):
+    def __init__(self, storage_name, index=None):
+        self.storage_name = storage_name
+        self.index = index
+
+    def resolve(self, data_store):
+        value = data_store[self.storage_name]
+        if self.index is not None:
+            value = value[self.index]
+        return value
+
+
+def stored_value(storage_name, index=None):
+    return StoredValue(storage_name, index)
+
+
+def resolve_value(value, data_store):
+    if isinstance(value, StoredValue):
+        return value.resolve(data_store)
+    return value
 
 
 def _expect_message(to_user_client,
@@ -7,38 +33,57 @@ def _expect_message(to_user_client,
                     message_text=None,
                     ignore_case=True,
                     is_thread=False,
-                    thread_ts=None):
-    for event in to_user_client.events:
-        if event["type"] == "message":
-            message = event
-            if "subtype" in event and "message" in event:
-                message = event["message"]
-
-            event_conditions_pass = (not is_thread or "thread_ts" in event) and \
-                                    (thread_ts is None or event["thread_ts"] == thread_ts)
-            if event_conditions_pass and "user" in message and message["user"] == from_user_id:
-                if channel_id is None or ("channel" in message and message["channel"]):
-                    if _try_compare_message_text(message["text"], message_text, ignore_case):
-                        return event
+                    thread_ts=None,
+                    sent_after_ts=None):
+    event_store = to_user_client.events
+    event_store.last_processed_event = None
+    with profiled("verification", "message"):
+        for event in event_store.find_messages(from_user_id, channel_id, thread_ts, is_thread):
+            message = get_main_message_body(event)
+            if sent_after_ts is not None and float(message.get("ts", 0)) <= sent_after_ts:
+                continue
+            if _try_compare_message_text(message["text"], message_text, ignore_case):
+                event_store.last_processed_event = event
+                return event
     return None
 
 
+def _find_validated_message(slack_user_workspace,
+                            data_store,
+                            from_user_slack_name,
+                            to_user_slack_name,
+                            channel_name,
+                            thread_ts,
+                            thread_ts_name,
+                            message_text,
+                            ignore_case,
+                            validators,
+                            sent_after_ts=None):
+    user_receiver = slack_user_workspace.find_user_client_by_username(resolve_value(to_user_slack_name, data_store))
+    user_sender_details = slack_user_workspace.find_user_by_username(resolve_value(from_user_slack_name, data_store))
+    channel_id = _try_get_channel_id(slack_user_workspace, resolve_value(channel_name, data_store))
+    actual_thread_ts = data_store.get(thread_ts_name, thread_ts)
+    message = _expect_message(user_receiver, user_sender_details["id"], channel_id, message_text, ignore_case,
+                              actual_thread_ts is not None, actual_thread_ts, sent_after_ts)
+    if message is None or not all([validator(message) for validator in validators]):
+        return None
+    return message
+
+
 def _try_compare_message_text(real_message,
                               comparison_text,
                               ignore_case=True):
-    result = False
-    if comparison_text is not None:
-        actual_text = real_message
-        if ignore_case:
-            comparison_text = comparison_text.lower()
-            actual_text = actual_text.lower()
-        if comparison_text == actual_text:
-            result = True
-    else:
-        # Response is true if there is no text to compare to. Probably bad but allows use a more general way.
-        # Maybe should rename this function
-        result = True
-    return result
+    # comparison_text may be a prebuilt TextMatcher, actions build these once when the test is defined
+    return text_matcher(comparison_text, ignore_case).match(real_message)
+
+
+def _store_sent_message_ts(response, ts_name, data_store):
+    if ts_name is None:
+        return SUCCESS_RESULT
+    if not response or not response.get("ok"):
+        return TestResult(ResultCode.failure, f"Failed to send the message stored as {ts_name}: {response}")
+    data_store[ts_name] = response["ts"]
+    return SUCCESS_RESULT
 
 
 def _try_get_channel_id(slack_user_workspace, channel_name):
@@ -53,26 +98,28 @@ def _try_get_channel_id(slack_user_workspace, channel_name):
     return channel_id
 
 
-def _get_main_message_body(event):
-    message = event
-    if "subtype" in event and "message" in event:
-        message = event["message"]
-    return message
+def _is_action_message_from_user(event, user_id, channel_id=None):
+    message = get_main_message_body(event)
+    return event.get("type") == "message" and message.get("user") == user_id and \
+        (channel_id is None or event.get("channel", message.get("channel")) == channel_id) and \
+        action_index(event).has_actions()
 
 
 def send_message_to_user(from_user_slack_name,
                          to_user_slack_name,
                          message,
                          thread_ts=None,
-                         thread_ts_name=None):
+                         thread_ts_name=None,
+                         ts_name=None):
     def send_message_to_user_function(slack_user_workspace, data_store):
-        user_sender = slack_user_workspace.find_user_client_by_username(from_user_slack_name)
-        user_receiver_details = slack_user_workspace.find_user_by_username(to_user_slack_name)
+        user_sender = slack_user_workspace.find_user_client_by_username(resolve_value(from_user_slack_name, data_store))
+        user_receiver_details = slack_user_workspace.find_user_by_username(
+            resolve_value(to_user_slack_name, data_store))
         actual_thread_ts = thread_ts
         if thread_ts_name in data_store:
             actual_thread_ts = data_store[thread_ts_name]
-        user_sender.send_message(user_receiver_details["id"], message, thread_ts=actual_thread_ts)
-        return TestResult(ResultCode.success)
+        response = user_sender.send_message(user_receiver_details["id"], message, thread_ts=actual_thread_ts)
+        return _store_sent_message_ts(response, ts_name, data_store)
 
     return send_message_to_user_function
 
@@ -81,15 +128,16 @@ def send_message_to_channel(from_user_slack_name,
                             channel_name,
                             message,
                             thread_ts=None,
-                            thread_ts_name=None):
+                            thread_ts_name=None,
+                            ts_name=None):
     def send_message_to_channel_function(slack_user_workspace, data_store):
-        user_sender = slack_user_workspace.find_user_client_by_username(from_user_slack_name)
-        channel_details = slack_user_workspace.find_channel_by_name(channel_name)
+        user_sender = slack_user_workspace.find_user_client_by_username(resolve_value(from_user_slack_name, data_store))
+        channel_details = slack_user_workspace.find_channel_by_name(resolve_value(channel_name, data_store))
         actual_thread_ts = thread_ts
         if thread_ts_name in data_store:
             actual_thread_ts = data_store[thread_ts_name]
-        user_sender.send_message(channel_details["id"], message, thread_ts=actual_thread_ts)
-        return TestResult(ResultCode.success)
+        response = user_sender.send_message(channel_details["id"], message, thread_ts=actual_thread_ts)
+        return _store_sent_message_ts(response, ts_name, data_store)
 
     return send_message_to_channel_function
 
@@ -104,32 +152,57 @@ def expect_message_from_user(from_user_slack_name,
                              validators=None):
     if validators is None:
         validators = []
+    message_text = text_matcher(message_text, ignore_case)
 
     def expect_message_from_user_function(slack_user_workspace, data_store):
-        user_receiver = slack_user_workspace.find_user_client_by_username(to_user_slack_name)
-        user_sender_details = slack_user_workspace.find_user_by_username(from_user_slack_name)
-        channel_id = _try_get_channel_id(slack_user_workspace, channel_name)
-        actual_thread_ts = thread_ts
-        is_thread = False
-        if thread_ts_name in data_store:
-            actual_thread_ts = data_store[thread_ts_name]
-        if actual_thread_ts is not None:
-            is_thread = True
-        message = _expect_message(user_receiver, user_sender_details["id"], channel_id, message_text, ignore_case,
-                                  is_thread, actual_thread_ts)
-        if message is not None:
-            validated = True
-            for validator in validators:
-                validated &= validator(message)
-            if validated:
-                if thread_ts_name is not None:
-                    data_store[thread_ts_name] = message["thread_ts"]
-                return TestResult(ResultCode.success)
-        return TestResult(ResultCode.pending)
+        message = _find_validated_message(slack_user_workspace, data_store, from_user_slack_name, to_user_slack_name,
+                                          channel_name, thread_ts, thread_ts_name, message_text, ignore_case,
+                                          validators)
+        if message is None:
+            return PENDING_RESULT
+        if thread_ts_name is not None:
+            data_store[thread_ts_name] = message["thread_ts"]
+        return SUCCESS_RESULT
 
     return expect_message_from_user_function
 
 
+def expect_message_within(from_user_slack_name,
+                          to_user_slack_name,
+                          sent_ts_name,
+                          max_response_time,
+                          channel_name=None,
+                          thread_ts=None,
+                          thread_ts_name=None,
+                          message_text=None,
+                          ignore_case=True,
+                          response_time_name=None,
+                          validators=None):
+    if validators is None:
+        validators = []
+    if response_time_name is None:
+        response_time_name = f"{sent_ts_name}_response_time"
+    message_text = text_matcher(message_text, ignore_case)
+
+    def expect_message_within_function(slack_user_workspace, data_store):
+        sent_ts = float(data_store[sent_ts_name])
+        message = _find_validated_message(slack_user_workspace, data_store, from_user_slack_name, to_user_slack_name,
+                                          channel_name, thread_ts, thread_ts_name, message_text, ignore_case,
+                                          validators, sent_ts)
+        if message is None:
+            return PENDING_RESULT
+        # Both timestamps are set by Slack, so the response time does not depend on the local clock
+        response_time = round((float(get_main_message_body(message)["ts"]) - sent_ts) * 1000)
+        data_store[response_time_name] = response_time
+        data_store.setdefault(RESPONSE_TIMES, {})[response_time_name] = response_time
+        if response_time > max_response_time:
+            return TestResult(ResultCode.failure, f"Response took {response_time}ms, longer than the "
+                                                  f"{max_response_time}ms allowed for {response_time_name}")
+        return SUCCESS_RESULT
+
+    return expect_message_within_function
+
+
 def expect_and_store_action_message(from_user_slack_name,
                                     to_user_slack_name,
                                     event_storage_name,
@@ -139,29 +212,30 @@ def expect_and_store_action_message(from_user_slack_name,
                                     validators=None):
     if validators is None:
         validators = []
+    message_text = text_matcher(message_text, ignore_case)
 
     def expect_and_store_action_message_function(slack_user_workspace, data_store):
-        user_sender_details = slack_user_workspace.find_user_by_username(from_user_slack_name)
-        user_receiver = slack_user_workspace.find_user_client_by_username(to_user_slack_name)
-        channel_id = _try_get_channel_id(slack_user_workspace, channel_name)
-        for event in user_receiver.events:
-            message = event
-            if event["type"] == "message" and "subtype" in event and "message" in event:
-                message = event["message"]
-            if message["type"] == "message" and message["user"] == user_sender_details["id"]:
-                if channel_id is None or ("channel" in message and message["channel"]):
-                    if "attachments" in message and len(message["attachments"]) > 0:
-                        attachments = message["attachments"]
-                        for attachment in attachments:
-                            if "actions" in attachment and len(attachment["actions"]) > 0:
-                                if _try_compare_message_text(message["text"], message_text, ignore_case):
-                                    validated = True
-                                    for validator in validators:
-                                        validated &= validator(event)
-                                    if validated:
-                                        data_store[event_storage_name] = event
-                                        return TestResult(ResultCode.success)
-        return TestResult(ResultCode.pending)
+        user_sender_details = slack_user_workspace.find_user_by_username(
+            resolve_value(from_user_slack_name, data_store))
+        user_receiver = slack_user_workspace.find_user_client_by_username(resolve_value(to_user_slack_name, data_store))
+        channel_id = _try_get_channel_id(slack_user_workspace, resolve_value(channel_name, data_store))
+        user_id = user_sender_details["id"]
+        if isinstance(user_receiver.events, EventStore):
+            action_messages = user_receiver.events.find_action_messages(user_id, channel_id)
+        else:
+            # Plain lists of events are not indexed, so they are filtered here
+            action_messages = [event for event in user_receiver.events
+                               if _is_action_message_from_user(event, user_id, channel_id)]
+        for event in action_messages:
+            message = get_main_message_body(event)
+            if message_text.match(message.get("text", "")):
+                validated = True
+                for validator in validators:
+                    validated &= validator(event)
+                if validated:
+                    data_store[event_storage_name] = event
+                    return SUCCESS_RESULT
+        return PENDING_RESULT
 
     return expect_and_store_action_message_function
 
@@ -175,7 +249,7 @@ def respond_to_custom_stored_action_message(from_user_slack_name,
                                             channel_key="channel",
                                             ts_key="ts"):
     def respond_to_custom_stored_action_message_function(slack_user_workspace, data_store):
-        user_sender = slack_user_workspace.find_user_client_by_username(from_user_slack_name)
+        user_sender = slack_user_workspace.find_user_client_by_username(resolve_value(from_user_slack_name, data_store))
         service_id = data_store[service_id_key]
         bot_user_id = data_store[bot_user_id_key]
         attachment_id = data_store[attachment_id_key]
@@ -191,7 +265,7 @@ def respond_to_custom_stored_action_message(from_user_slack_name,
                                                          channel,
                                                          ts)
         if result:
-            return TestResult(ResultCode.success)
+            return SUCCESS_RESULT
         else:
             return TestResult(ResultCode.failure, response.content)
 
@@ -221,28 +295,26 @@ def respond_to_stored_action_message(from_user_slack_name,
         attachment_action_validators = []
 
     def respond_to_stored_action_message_function(slack_user_workspace, data_store):
-        user_sender = slack_user_workspace.find_user_client_by_username(from_user_slack_name)
+        user_sender = slack_user_workspace.find_user_client_by_username(resolve_value(from_user_slack_name, data_store))
         button_event = data_store[event_storage_name]
-        button_event_main_message = _get_main_message_body(button_event)
+        button_event_main_message = get_main_message_body(button_event)
         service_id = button_event_main_message["bot_id"]
         bot_user_id = button_event_main_message["user"]
-        for attachment in button_event_main_message["attachments"]:
-            if "actions" in attachment and (len(attachment_ids) == 0 or int(attachment["id"]) in attachment_ids):
-                for action in attachment["actions"]:
-                    if len(action_ids) == 0 or int(action["id"]) in action_ids:
-                        validated = True
-                        for validator in attachment_action_validators:
-                            validated &= validator(attachment, action)
-                        if validated:
-                            result, response = user_sender.attachment_action(service_id, bot_user_id, [action],
-                                                                             attachment_ids,
-                                                                             attachment["callback_id"],
-                                                                             button_event["channel"],
-                                                                             button_event_main_message["ts"])
-                            if result:
-                                return TestResult(ResultCode.success)
-                            else:
-                                return TestResult(ResultCode.failure, response.content)
+        attachment_actions = action_index(button_event).find_attachment_actions(attachment_ids, action_ids)
+        for attachment, action in attachment_actions:
+            validated = True
+            for validator in attachment_action_validators:
+                validated &= validator(attachment, action)
+            if validated:
+                result, response = user_sender.attachment_action(service_id, bot_user_id, [action],
+                                                                 attachment_ids,
+                                                                 attachment["callback_id"],
+                                                                 button_event["channel"],
+                                                                 button_event_main_message["ts"])
+                if result:
+                    return SUCCESS_RESULT
+                else:
+                    return TestResult(ResultCode.failure, response.content)
 
         return TestResult(ResultCode.failure, "Action or attachment not found.")
 
@@ -251,20 +323,22 @@ def respond_to_stored_action_message(from_user_slack_name,
 
 def expect_channel_created(user, channel_name):
     def expect_channel_created_function(slack_user_workspace, data_store):
-        user_client = slack_user_workspace.find_user_client_by_username(user)
+        user_client = slack_user_workspace.find_user_client_by_username(resolve_value(user, data_store))
+        expected_channel_name = resolve_value(channel_name, data_store)
         for event in user_client.events:
-            if event["type"] == "channel_created" and event["channel"]["name"] == channel_name:
-                return TestResult(ResultCode.success)
-        return TestResult(ResultCode.pending)
+            if event["type"] == "channel_created" and event["channel"]["name"] == expected_channel_name:
+                return SUCCESS_RESULT
+        return PENDING_RESULT
 
     return expect_channel_created_function
 
 
 def delete_channel(as_user, channel_name):
     def delete_channel_function(slack_user_workspace, data_store):
-        as_user_client = slack_user_workspace.find_user_client_by_username(as_user)
-        result, response = as_user_client.delete_channel(slack_user_workspace.find_channel_by_name(channel_name)["id"])
-        test_result = TestResult(ResultCode.success)
+        as_user_client = slack_user_workspace.find_user_client_by_username(resolve_value(as_user, data_store))
+        channel_details = slack_user_workspace.find_channel_by_name(resolve_value(channel_name, data_store))
+        result, response = as_user_client.delete_channel(channel_details["id"])
+        test_result = SUCCESS_RESULT
         if result is False:
             test_result = TestResult(ResultCode.failure, response["error"])
         return test_result
@@ -274,15 +348,16 @@ def delete_channel(as_user, channel_name):
 
 def invite_user_to_channel(inviting_user, invited_user, channel_name, is_private=False):
     def invite_user_to_channel_function(slack_user_workspace, data_store):
-        inviting_user_client = slack_user_workspace.find_user_client_by_username(inviting_user)
-        invited_user_details = slack_user_workspace.find_user_by_username(invited_user)
-        channel_id = _try_get_channel_id(slack_user_workspace, channel_name)
+        inviting_user_client = slack_user_workspace.find_user_client_by_username(
+            resolve_value(inviting_user, data_store))
+        invited_user_details = slack_user_workspace.find_user_by_username(resolve_value(invited_user, data_store))
+        channel_id = _try_get_channel_id(slack_user_workspace, resolve_value(channel_name, data_store))
         if is_private:
             result, response = inviting_user_client.invite_to_group(invited_user_details["id"], channel_id)
         else:
             result, response = inviting_user_client.invite_to_channel(invited_user_details["id"], channel_id)
 
-        test_result = TestResult(ResultCode.success)
+        test_result = SUCCESS_RESULT
         if result is False:
             test_result = TestResult(ResultCode.failure, response["error"])
         return test_result
@@ -292,17 +367,39 @@ def invite_user_to_channel(inviting_user, invited_user, channel_name, is_private
 
 def kick_user_from_channel(kicking_user, kicked_user, channel_name, is_private=False):
     def kick_user_from_channel_function(slack_user_workspace, data_store):
-        kicker_user_client = slack_user_workspace.find_user_client_by_username(kicking_user)
-        kicked_user_details = slack_user_workspace.find_user_by_username(kicked_user)
-        channel_id = _try_get_channel_id(slack_user_workspace, channel_name)
+        kicker_user_client = slack_user_workspace.find_user_client_by_username(resolve_value(kicking_user, data_store))
+        kicked_user_details = slack_user_workspace.find_user_by_username(resolve_value(kicked_user, data_store))
+        channel_id = _try_get_channel_id(slack_user_workspace, resolve_value(channel_name, data_store))
         if is_private:
             result, response = kicker_user_client.kick_from_group(kicked_user_details["id"], channel_id)
         else:
             result, response = kicker_user_client.kick_from_channel(kicked_user_details["id"], channel_id)
 
-        test_result = TestResult(ResultCode.success)
+        test_result = SUCCESS_RESULT
         if result is False:
             test_result = TestResult(ResultCode.failure, response["error"])
         return test_result
 
     return kick_user_from_channel_function
+
+
+def lease_users(role, count, storage_name):
+    def lease_users_function(slack_user_workspace, data_store):
+        leased_usernames = slack_user_workspace.persona_pool.lease(role, count, slack_user_workspace.active_test)
+        if leased_usernames is None:
+            return PENDING_RESULT
+        data_store[storage_name] = leased_usernames
+        return SUCCESS_RESULT
+
+    return lease_users_function
+
+
+def acquire_channel(storage_name):
+    def acquire_channel_function(slack_user_workspace, data_store):
+        channel = slack_user_workspace.channel_pool.acquire(slack_user_workspace.active_test, slack_user_workspace)
+        if channel is None:
+            return PENDING_RESULT
+        data_store[storage_name] = channel["name"]
+        return SUCCESS_RESULT
+
+    return acquire_channel_function
@@ -0,0 +1,118 @@
+import difflib
+import fnmatch
+import re
+import unicodedata
+
+_WHITESPACE = re.compile(r"\s+")
+_PATTERN_TYPE = type(_WHITESPACE)
+
+
+class TextMatcher(object):
+    """
+    Matches the text of a message. Matchers are built when a test is defined, so any compiling or normalising of the
+    expected text is done once and matching a received message is a single comparison.
+    """
+
+    def match(self, text):
+        raise NotImplementedError()
+
+
+class AnyTextMatcher(TextMatcher):
+    def match(self, text):
+        return True
+
+
+class ExactTextMatcher(TextMatcher):
+    def __init__(self, expected_text, ignore_case=True):
+        self.ignore_case = ignore_case
+        self.expected_text = expected_text.lower() if ignore_case else expected_text
+
+    def match(self, text):
+        if self.ignore_case:
+            text = text.lower()
+        return text == self.expected_text
+
+
+class RegexTextMatcher(TextMatcher):
+    def __init__(self, pattern, ignore_case=False, full_match=False):
+        flags = re.IGNORECASE if ignore_case else 0
+        if isinstance(pattern, _PATTERN_TYPE):
+            self.pattern = re.compile(pattern.pattern, pattern.flags | flags) if ignore_case else pattern
+        else:
+            self.pattern = re.compile(pattern, flags)
+        self._match = self.pattern.fullmatch if full_match else self.pattern.search
+
+    def match(self, text):
+        return self._match(text) is not None
+
+
+class GlobTextMatcher(RegexTextMatcher):
+    def __init__(self, pattern, ignore_case=True):
+        super().__init__(fnmatch.translate(pattern), ignore_case, full_match=True)
+
+
+class NormalizedTextMatcher(TextMatcher):
+    """
+    Matches text after unicode normalisation, collapsing runs of whitespace and, by default, ignoring case.
+    """
+
+    def __init__(self, expected_text, ignore_case=True):
+        self.ignore_case = ignore_case
+        self.expected_text = self.normalize(expected_text)
+
+    def normalize(self, text):
+        text = _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+        if self.ignore_case:
+            text = text.casefold()
+        return text
+
+    def match(self, text):
+        return self.normalize(text) == self.expected_text
+
+
+class FuzzyTextMatcher(NormalizedTextMatcher):
+    """
+    Matches text whose similarity ratio to the normalised expected text is at least the threshold. The expected text is
+    given to the SequenceMatcher once, as it caches its analysis of the second sequence between comparisons.
+    """
+
+    def __init__(self, expected_text, threshold=0.9, ignore_case=True):
+        super().__init__(expected_text, ignore_case)
+        self.threshold = threshold
+        self.sequence_matcher = difflib.SequenceMatcher(None, "", self.expected_text, autojunk=False)
+
+    def match(self, text):
+        self.sequence_matcher.set_seq1(self.normalize(text))
+        return self.sequence_matcher.real_quick_ratio() >= self.threshold and \
+            self.sequence_matcher.quick_ratio() >= self.threshold and \
+            self.sequence_matcher.ratio() >= self.threshold
+
+
+def regex(pattern, ignore_case=False, full_match=False):
+    return RegexTextMatcher(pattern, ignore_case, full_match)
+
+
+def glob(pattern, ignore_case=True):
+    return GlobTextMatcher(pattern, ignore_case)
+
+
+def normalized(expected_text, ignore_case=True):
+    return NormalizedTextMatcher(expected_text, ignore_case)
+
+
+def fuzzy(expected_text, threshold=0.9, ignore_case=True):
+    return FuzzyTextMatcher(expected_text, threshold, ignore_case)
+
+
+def text_matcher(message_text, ignore_case=True):
+    """
+    Builds a TextMatcher for the message_text given to a message expectation. None matches any text, strings are matched
+    exactly, compiled regular expressions are searched for, and TextMatchers are used as they are.
+    """
+    if isinstance(message_text, TextMatcher):
+        return message_text
+    if message_text is None:
+        return AnyTextMatcher()
+    if isinstance(message_text, _PATTERN_TYPE):
+        return RegexTextMatcher(message_text)
+    return ExactTextMatcher(message_text, ignore_case)
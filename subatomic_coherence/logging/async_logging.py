@@ -0,0 +1,116 @@
+import copy
+import queue
+import sys
+import threading
+from logging.handlers import QueueHandler
+
+
+class AsyncLogSink(object):
+    def __init__(self, stream=None, capacity=10000, batch_size=256, put_timeout=1.0):
+        self.stream = stream if stream is not None else sys.stdout
+        self.handlers = []
+        self.queue = queue.Queue(maxsize=capacity)
+        self.batch_size = batch_size
+        self.put_timeout = put_timeout
+        self.dropped = 0
+        # Several threads log at once, such as the test loop and the clean up workers
+        self._dropped_lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="coherence-log-sink", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            # The sentinel is put with blocking semantics so that nothing queued before stop is lost
+            self.queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    def is_running(self):
+        return self._thread is not None
+
+    def write(self, text):
+        self._put(_ConsoleLine(text))
+
+    def wrap_handler(self, handler):
+        self.handlers.append(handler)
+        return AsyncLogHandler(self)
+
+    def enqueue_record(self, record):
+        self._put(record)
+
+    def _put(self, item):
+        # Block for a bounded amount of time when the queue is full. This applies backpressure to the producer
+        # without allowing a stalled sink to hang the suite indefinitely.
+        try:
+            self.queue.put(item, timeout=self.put_timeout)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+    def _run(self):
+        running = True
+        while running:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if any(item is _STOP for item in batch):
+                running = False
+                batch = [item for item in batch if item is not _STOP]
+            self._process_batch(batch)
+
+    def _process_batch(self, batch):
+        console_lines = []
+        for item in batch:
+            if isinstance(item, _ConsoleLine):
+                console_lines.append(item.text)
+            else:
+                self._flush_console(console_lines)
+                console_lines = []
+                self._handle_record(item)
+        self._flush_console(console_lines)
+        for handler in self.handlers:
+            # noinspection PyBroadException
+            try:
+                handler.flush()
+            except Exception:
+                pass
+
+    def _handle_record(self, record):
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def _flush_console(self, console_lines):
+        if len(console_lines) > 0:
+            self.stream.write("\n".join(console_lines) + "\n")
+            self.stream.flush()
+
+
+class AsyncLogHandler(QueueHandler):
+    def __init__(self, sink):
+        super().__init__(sink.queue)
+        self.sink = sink
+
+    def prepare(self, record):
+        # QueueHandler.prepare formats the record here, on the logging thread. The record is queued unformatted
+        # instead, so the message, including lazily serialised arguments such as LazyJson, is only built by the
+        # wrapped handlers on the sink thread. The copy keeps other handlers of the record from changing it meanwhile.
+        return copy.copy(record)
+
+    def enqueue(self, record):
+        self.sink.enqueue_record(record)
+
+
+class _ConsoleLine(object):
+    def __init__(self, text):
+        self.text = text
+
+
+_STOP = object()
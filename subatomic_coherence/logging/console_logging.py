@@ -1,51 +1,93 @@
+import json
 import logging
 import re
+from collections import deque
 
 from colorama import Style, Fore
 
+_ANSI_ESCAPE = re.compile(r'\x1B\[[0-?]*[ -/]*[@-~]')
+
 
 class ConsoleLogger(object):
 
-    buffered_log = []
+    buffer_capacity = 10000
+    buffered_log = deque(maxlen=buffer_capacity)
     interactive_mode = False
+    sink = None
 
     @staticmethod
     def success(message):
         ConsoleLogger.buffer_message(message)
-        logging.info(f"{message}\n")
+        logging.info("%s\n", message)
         if not ConsoleLogger.interactive_mode:
-            print(f"{Fore.GREEN}{message}{Style.RESET_ALL}")
+            ConsoleLogger.write(f"{Fore.GREEN}{message}{Style.RESET_ALL}")
 
     @staticmethod
     def error(message):
         ConsoleLogger.buffer_message(message)
-        logging.error(f"{message}\n")
+        logging.error("%s\n", message)
         if not ConsoleLogger.interactive_mode:
-            print(f"{Fore.RED}{message}{Style.RESET_ALL}")
+            ConsoleLogger.write(f"{Fore.RED}{message}{Style.RESET_ALL}")
 
     @staticmethod
     def info(message):
         ConsoleLogger.buffer_message(message)
-        logging.info(f"{message}\n")
+        logging.info("%s\n", message)
         if not ConsoleLogger.interactive_mode:
-            print(f"{Fore.MAGENTA}{message}{Style.RESET_ALL}")
+            ConsoleLogger.write(f"{Fore.MAGENTA}{message}{Style.RESET_ALL}")
 
     @staticmethod
     def log(message):
         ConsoleLogger.buffer_message(message)
-        logging.info(f"{message}\n")
+        logging.info("%s\n", message)
         if not ConsoleLogger.interactive_mode:
-            print(message)
+            ConsoleLogger.write(message)
+
+    @staticmethod
+    def write(text):
+        if ConsoleLogger.sink is not None:
+            ConsoleLogger.sink.write(text)
+        else:
+            print(text)
 
     @staticmethod
     def buffer_message(message):
-        ansi_escape = re.compile(r'\x1B\[[0-?]*[ -/]*[@-~]')
-        message_filtered = ansi_escape.sub("", message)
-        message_lines = message_filtered.split("\n")
-        ConsoleLogger.buffered_log.extend(message_lines)
+        # Only the interactive UI drains the buffer, so there is no point in keeping lines without it
+        if not ConsoleLogger.interactive_mode:
+            return
+        message_filtered = _ANSI_ESCAPE.sub("", message)
+        ConsoleLogger.buffered_log.extend(message_filtered.split("\n"))
 
     @staticmethod
     def read_buffered_log():
-        buffered_return = ConsoleLogger.buffered_log
-        ConsoleLogger.buffered_log = []
-        return buffered_return
+        # Drained with popleft as the UI reads the buffer from its own thread while the suite keeps appending to it
+        buffered_return = []
+        while True:
+            try:
+                buffered_return.append(ConsoleLogger.buffered_log.popleft())
+            except IndexError:
+                return buffered_return
+
+    @staticmethod
+    def set_buffer_capacity(capacity):
+        ConsoleLogger.buffer_capacity = capacity
+        ConsoleLogger.buffered_log = deque(ConsoleLogger.buffered_log, maxlen=capacity)
+
+
+class LazyJson(object):
+    def __init__(self, value, **dumps_kwargs):
+        self.value = value
+        self.dumps_kwargs = dumps_kwargs
+
+    def __str__(self):
+        return json.dumps(self.value, **self.dumps_kwargs)
+
+
+class LazyCall(object):
+    def __init__(self, function, *args, **kwargs):
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+
+    def __str__(self):
+        return str(self.function(*self.args, **self.kwargs))
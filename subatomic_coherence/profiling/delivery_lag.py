@@ -0,0 +1,66 @@
+from subatomic_coherence.profiling.profiling import Histogram
+
+
+class DeliveryLagTracker(object):
+    """
+    Measures the RTM delivery lag of each slack user, the time between an event happening in Slack, its event_ts or
+    ts, and the event being read by the suite. A long lag points at Slack delivering events slowly rather than at the
+    bot or the suite, which otherwise all show up as the same step timeout. The lag relies on the local clock agreeing
+    with Slack's, a small negative lag means the local clock is behind.
+    """
+
+    def __init__(self, track_distribution=False):
+        self.track_distribution = track_distribution
+        self.users = {}
+
+    def record(self, username, event, received_at):
+        """
+        Records the delivery lag of an event read at received_at, in seconds since the epoch. Returns the lag in
+        milliseconds, or None for events without a timestamp such as hello or pong.
+        """
+        event_time = event_time_stamp(event)
+        if event_time is None:
+            return None
+        lag = (received_at - event_time) * 1000
+        if username not in self.users:
+            self.users[username] = DeliveryLag(self.track_distribution)
+        self.users[username].record(lag)
+        return lag
+
+    def summary(self):
+        lines = ["RTM delivery lag (events, mean ms, min ms, max ms):"]
+        for username, delivery_lag in sorted(self.users.items()):
+            lines.append(f"{username}: {delivery_lag.count}, {delivery_lag.mean():.1f}, {delivery_lag.minimum:.1f}, "
+                         f"{delivery_lag.maximum:.1f}")
+            if delivery_lag.histogram is not None:
+                lines.append("    " + delivery_lag.histogram.format_buckets())
+        return "\n".join(lines)
+
+
+class DeliveryLag(object):
+    def __init__(self, track_distribution=False):
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+        self.histogram = Histogram() if track_distribution else None
+
+    def record(self, lag):
+        self.count += 1
+        self.total += lag
+        self.minimum = lag if self.minimum is None else min(self.minimum, lag)
+        self.maximum = lag if self.maximum is None else max(self.maximum, lag)
+        if self.histogram is not None:
+            # Negative lags from clock skew are counted in the lowest bucket
+            self.histogram.record(max(lag, 0))
+
+    def mean(self):
+        return self.total / self.count if self.count > 0 else 0.0
+
+
+def event_time_stamp(event):
+    time_stamp = event.get("event_ts", event.get("ts"))
+    try:
+        return float(time_stamp)
+    except (TypeError, ValueError):
+        return None
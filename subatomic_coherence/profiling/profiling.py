@@ -0,0 +1,153 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+_hooks = []
+
+
+class ProfilingHook(object):
+    """
+    Receives a before and after callback around each profiled operation. Operations are identified by a category,
+    one of "api_call", "rtm_read", "run_element", "verification" or "ui", and a name within it such as the Slack API
+    method, the slack username, the step function name or "publish" for the status published to the UI. Callbacks can
+    be made from several threads at once.
+    """
+
+    def before(self, category, name):
+        pass
+
+    def after(self, category, name, start_time, duration):
+        # start_time is a time.perf_counter value and duration is in seconds
+        pass
+
+
+def add_profiling_hook(hook):
+    _hooks.append(hook)
+
+
+def remove_profiling_hook(hook):
+    if hook in _hooks:
+        _hooks.remove(hook)
+
+
+def profiled(category, name):
+    """
+    Returns a context manager that profiles the code it wraps. When no hooks are registered a shared context manager
+    that does nothing is returned, so profiling costs a single check while it is switched off.
+    """
+    if len(_hooks) == 0:
+        return _NOT_PROFILED
+    return _ProfiledOperation(category, name)
+
+
+class _NotProfiled(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        return False
+
+
+_NOT_PROFILED = _NotProfiled()
+
+
+class _ProfiledOperation(object):
+    __slots__ = ("category", "name", "hooks", "start_time")
+
+    def __init__(self, category, name):
+        self.category = category
+        self.name = name
+        self.hooks = list(_hooks)
+        self.start_time = 0
+
+    def __enter__(self):
+        for hook in self.hooks:
+            hook.before(self.category, self.name)
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        duration = time.perf_counter() - self.start_time
+        for hook in self.hooks:
+            hook.after(self.category, self.name, self.start_time, duration)
+        return False
+
+
+class ProfileCollector(ProfilingHook):
+    """
+    Aggregates profiled operations into a histogram per operation, with power of two millisecond buckets, and keeps
+    the most recent spans for export as a Chrome trace (chrome://tracing or https://ui.perfetto.dev).
+    """
+
+    def __init__(self, max_spans=100000):
+        self.histograms = {}
+        self.spans = deque(maxlen=max_spans)
+        self.start_time = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def after(self, category, name, start_time, duration):
+        with self._lock:
+            key = (category, name)
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].record(duration * 1000)
+            self.spans.append((category, name, start_time, duration, threading.get_ident()))
+
+    def summary(self):
+        with self._lock:
+            histograms = sorted(self.histograms.items(), key=lambda entry: entry[1].total, reverse=True)
+        lines = ["Profile summary (total ms, count, mean ms, max ms):"]
+        for (category, name), histogram in histograms:
+            lines.append(f"{category} {name}: {histogram.total:.1f}, {histogram.count}, {histogram.mean():.2f}, "
+                         f"{histogram.maximum:.2f}")
+            lines.append("    " + histogram.format_buckets())
+        return "\n".join(lines)
+
+    def chrome_trace(self):
+        with self._lock:
+            spans = list(self.spans)
+        process_id = os.getpid()
+        trace_events = [{
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": (start_time - self.start_time) * 1000000,
+            "dur": duration * 1000000,
+            "pid": process_id,
+            "tid": thread_id
+        } for category, name, start_time, duration, thread_id in spans]
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path):
+        with open(path, "w") as trace_file:
+            json.dump(self.chrome_trace(), trace_file)
+
+
+class Histogram(object):
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+        # buckets[i] counts values below 2 ** i milliseconds (and at least 2 ** (i - 1) for i > 0)
+        self.buckets = []
+
+    def record(self, value):
+        self.count += 1
+        self.total += value
+        self.maximum = max(self.maximum, value)
+        bucket = 0
+        while value >= 2 ** bucket:
+            bucket += 1
+        if bucket >= len(self.buckets):
+            self.buckets.extend([0] * (bucket + 1 - len(self.buckets)))
+        self.buckets[bucket] += 1
+
+    def mean(self):
+        return self.total / self.count if self.count > 0 else 0.0
+
+    def format_buckets(self):
+        return ", ".join(f"<{2 ** bucket}ms: {count}" for bucket, count in enumerate(self.buckets) if count > 0)
@@ -0,0 +1,87 @@
+import gc
+import os
+import threading
+import time
+from collections import deque
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, where memory usage is not reported
+    resource = None
+
+
+class ResourceMonitor(object):
+    """
+    Samples the resource usage of the process over a long run: memory, CPU time, live Python objects and threads,
+    together with any sizes given by the caller, such as the lengths of the suite's in-memory stores. The most recent
+    samples are kept to look for leaks, see suspected_leaks.
+    """
+
+    def __init__(self, max_samples=10000):
+        self.samples = deque(maxlen=max_samples)
+        self.start_time = time.monotonic()
+
+    def sample(self, **sizes):
+        sample = {
+            "elapsed_ms": round((time.monotonic() - self.start_time) * 1000),
+            "memory_bytes": memory_usage(),
+            "cpu_ms": round(time.process_time() * 1000),
+            "python_objects": len(gc.get_objects()),
+            "threads": threading.active_count()
+        }
+        sample.update(sizes)
+        self.samples.append(sample)
+        return sample
+
+    def suspected_leaks(self, metrics=("memory_bytes", "python_objects", "threads"), min_samples=10,
+                        growth_threshold=0.1):
+        """
+        Returns (metric, growth, growth_per_hour) tuples for the given metrics that keep growing. The first half of the
+        samples is treated as warm up, a metric is suspected of leaking when the least squares trend of the second half
+        grows it by more than growth_threshold (a fraction of its value at the start of the second half).
+        """
+        if len(self.samples) < min_samples:
+            return []
+        samples = list(self.samples)[len(self.samples) // 2:]
+        elapsed = [sample["elapsed_ms"] for sample in samples]
+        duration = elapsed[-1] - elapsed[0]
+        if duration <= 0:
+            return []
+        leaks = []
+        for metric in metrics:
+            values = [sample.get(metric) for sample in samples]
+            if any(not isinstance(value, (int, float)) for value in values):
+                continue
+            slope = _trend(elapsed, values)
+            growth = slope * duration
+            if growth > 0 and growth > growth_threshold * max(abs(values[0]), 1):
+                leaks.append((metric, growth, slope * 3600000))
+        return leaks
+
+
+def memory_usage():
+    """
+    Returns the resident memory of the process in bytes, or its peak resident memory where the current value can not
+    be read, or None where neither is available.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    if resource is not None:
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+    return None
+
+
+def _trend(x_values, y_values):
+    # Least squares slope of y over x
+    x_mean = sum(x_values) / len(x_values)
+    y_mean = sum(y_values) / len(y_values)
+    variance = sum((x - x_mean) ** 2 for x in x_values)
+    if variance == 0:
+        return 0
+    return sum((x - x_mean) * (y - y_mean) for x, y in zip(x_values, y_values)) / variance
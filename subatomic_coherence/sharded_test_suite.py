@@ -0,0 +1,224 @@
+import heapq
+import logging
+import multiprocessing
+import pickle
+import queue
+import traceback
+from collections import namedtuple
+
+from subatomic_coherence.logging.console_logging import ConsoleLogger
+from subatomic_coherence.slack_test_suite import SlackTestSuite, build_summary
+from subatomic_coherence.testing.test_history import TestHistory
+
+TestOutcome = namedtuple("TestOutcome", ["name", "passed", "message", "call_stack_message", "shard_index",
+                                         "response_times"])
+ShardResult = namedtuple("ShardResult", ["shard_index", "outcomes", "recorded_events", "error"])
+
+
+class ShardedTestSuite(object):
+    def __init__(self, description="Sharded Test Suite", log_file=None, log_level=logging.INFO, record_events=False,
+                 history_file=None, max_failures=None):
+        self.description = description
+        self.history_file = history_file
+        self.max_failures = max_failures
+        self.log_file = log_file
+        self.log_level = log_level
+        self.record_events = record_events
+        self.shards = []
+        self.test_factories = []
+        self.successful_tests = []
+        self.failed_tests = []
+        self.recorded_events = []
+        self.shard_errors = {}
+        # Seconds between checks for workers that died without reporting their results
+        self.result_poll_interval = 1
+
+    def add_shard(self, slack_users):
+        """
+        Adds a worker process to the suite. slack_users is a list of (username, token) or
+        (username, token, connection_timeout) tuples. Each shard connects with its own tokens, so shards can point at
+        different test workspaces or at separate pools of users in the same workspace.
+        """
+        self.shards.append(list(slack_users))
+        return self
+
+    def add_test(self, test_name, test_factory):
+        # Tests are built inside the worker processes as TestPortal chains hold closures which cannot be sent between
+        # processes, so a factory returning a new TestPortal is added instead of the TestPortal itself.
+        self.test_factories.append((test_name, test_factory))
+
+    def run_tests(self):
+        ConsoleLogger.info(f"Running subatomic_coherence sharded test suite: {self.description} "
+                           f"({len(self.test_factories)} tests across {len(self.shards)} shards)")
+        if len(self.shards) == 0:
+            ConsoleLogger.error("No shards have been added to the sharded test suite")
+            return False
+
+        context = _get_multiprocessing_context()
+        if context.get_start_method() == "spawn" and not self._check_factories_picklable():
+            return False
+        result_queue = context.Queue()
+        processes = {}
+        assigned_tests = self._assign_tests()
+        for shard_index, shard_tests in enumerate(assigned_tests):
+            process = context.Process(target=_run_shard,
+                                      args=(shard_index, self.shards[shard_index], shard_tests,
+                                            self._shard_settings(shard_index), result_queue),
+                                      name=f"coherence-shard-{shard_index}")
+            process.start()
+            processes[shard_index] = process
+
+        # Results are collected before joining so that a worker is never blocked writing a large result to the queue
+        self._collect_shard_results(processes, assigned_tests, result_queue)
+        for process in processes.values():
+            process.join()
+
+        ConsoleLogger.log(build_summary(self.successful_tests, self.failed_tests))
+        self._log_recorded_events()
+        return len(self.failed_tests) == 0 and len(self.shard_errors) == 0
+
+    def _assign_tests(self):
+        shard_tests = [[] for _ in self.shards]
+        test_history = None
+        if self.history_file is not None:
+            test_history = TestHistory(self.history_file)
+        if test_history is None or not test_history.has_history():
+            for test_index, test_factory in enumerate(self.test_factories):
+                shard_tests[test_index % len(self.shards)].append(test_factory)
+            return shard_tests
+
+        # Longest processing time first: each test, longest expected duration first, goes to the shard with the least
+        # expected work so far, which keeps the shards finishing close together
+        shard_loads = [(0, shard_index) for shard_index in range(len(self.shards))]
+        for test_factory in sorted(self.test_factories,
+                                   key=lambda entry: test_history.expected_duration(entry[0]), reverse=True):
+            shard_load, shard_index = heapq.heappop(shard_loads)
+            shard_tests[shard_index].append(test_factory)
+            heapq.heappush(shard_loads, (shard_load + test_history.expected_duration(test_factory[0]), shard_index))
+        return shard_tests
+
+    def _shard_settings(self, shard_index):
+        log_file = None
+        if self.log_file is not None:
+            log_file = f"{self.log_file}.shard{shard_index}"
+        return {
+            "description": f"{self.description} [shard {shard_index}]",
+            "log_file": log_file,
+            "log_level": self.log_level,
+            "record_events": self.record_events,
+            "history_file": self.history_file,
+            # Each shard stops after max_failures of its own tests fail
+            "max_failures": self.max_failures
+        }
+
+    def _collect_shard_results(self, processes, assigned_tests, result_queue):
+        pending_shards = set(processes)
+        while len(pending_shards) > 0:
+            try:
+                shard_result = result_queue.get(timeout=self.result_poll_interval)
+            except queue.Empty:
+                # A worker that dies hard, e.g. killed for running out of memory, never posts its result
+                for shard_index in sorted(pending_shards):
+                    if not processes[shard_index].is_alive():
+                        pending_shards.discard(shard_index)
+                        self._merge_shard_result(_dead_shard_result(shard_index, assigned_tests[shard_index],
+                                                                    processes[shard_index].exitcode))
+                continue
+            if shard_result.shard_index in pending_shards:
+                pending_shards.discard(shard_result.shard_index)
+                self._merge_shard_result(shard_result)
+
+    def _check_factories_picklable(self):
+        # spawned workers receive their tests pickled, which lambdas and closures can not be
+        unpicklable_tests = []
+        for test_name, test_factory in self.test_factories:
+            try:
+                pickle.dumps(test_factory)
+            except (pickle.PicklingError, AttributeError, TypeError):
+                unpicklable_tests.append(test_name)
+        if len(unpicklable_tests) > 0:
+            ConsoleLogger.error("Test factories must be module level functions where workers are spawned rather "
+                                f"than forked, these can not be sent to a worker: {', '.join(unpicklable_tests)}")
+            return False
+        return True
+
+    def _merge_shard_result(self, shard_result):
+        if shard_result.error is not None:
+            self.shard_errors[shard_result.shard_index] = shard_result.error
+            ConsoleLogger.error(f"Shard {shard_result.shard_index} failed: {shard_result.error}")
+        for outcome in shard_result.outcomes:
+            if outcome.passed:
+                self.successful_tests.append(outcome)
+            else:
+                self.failed_tests.append(outcome)
+        self.recorded_events.extend(shard_result.recorded_events)
+
+    def _log_recorded_events(self):
+        if len(self.recorded_events) > 0:
+            ConsoleLogger.success("The following events were successfully recorded (ordered by timestamp):")
+            self.recorded_events = sorted(self.recorded_events, key=lambda entry: entry.time_stamp)
+            ConsoleLogger.info("[")
+            for index, event in enumerate(self.recorded_events):
+                comma = "," if index < len(self.recorded_events) - 1 else ""
+                ConsoleLogger.info(event.json() + comma)
+            ConsoleLogger.info("]")
+
+
+def _get_multiprocessing_context():
+    # fork lets workers inherit test factories defined as closures or lambdas, spawn is used where fork is unavailable
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context("spawn")
+
+
+def _dead_shard_result(shard_index, shard_tests, exit_code):
+    error = f"Shard exited with code {exit_code} before reporting its results"
+    outcomes = [TestOutcome(test_name, False, f"Test did not complete: {error}", test_name, shard_index, None)
+                for test_name, _ in shard_tests]
+    return ShardResult(shard_index, outcomes, [], error)
+
+
+def _run_shard(shard_index, slack_users, shard_tests, settings, result_queue):
+    outcomes = []
+    recorded_events = []
+    error = None
+    test_names = [test_name for test_name, _ in shard_tests]
+    # noinspection PyBroadException
+    try:
+        test_suite = SlackTestSuite(description=settings["description"], log_file=settings["log_file"],
+                                    log_level=settings["log_level"], history_file=settings.get("history_file"),
+                                    max_failures=settings.get("max_failures"))
+        test_suite.test_status.is_recording = settings["record_events"]
+        for slack_user in slack_users:
+            test_suite.add_slack_user(*slack_user)
+        for test_name, test_factory in shard_tests:
+            test_suite.add_test(test_name, test_factory())
+        if len(shard_tests) > 0:
+            test_suite.run_tests()
+        outcomes = _collect_outcomes(test_suite, shard_index)
+        recorded_events = test_suite.recorded_events
+    except SystemExit:
+        error = "Slack clients failed to connect"
+    except BaseException:
+        error = traceback.format_exc()
+
+    finished_tests = set(outcome.name for outcome in outcomes)
+    for test_name in test_names:
+        if test_name not in finished_tests:
+            outcomes.append(TestOutcome(test_name, False, f"Test did not complete: {error}", test_name, shard_index,
+                                        None))
+    result_queue.put(ShardResult(shard_index, outcomes, recorded_events, error))
+
+
+def _collect_outcomes(test_suite, shard_index):
+    outcomes = []
+    for test in test_suite.successful_tests:
+        outcomes.append(TestOutcome(test.name, True, test.message, test.call_stack_message, shard_index,
+                                    test.response_times))
+    for test in test_suite.failed_tests + test_suite.cancelled_tests:
+        outcomes.append(TestOutcome(test.name, False, test.message, test.call_stack_message, shard_index,
+                                    test.response_times))
+    for test in test_suite.skipped_tests:
+        outcomes.append(TestOutcome(test.name, False, "Skipped after reaching the maximum number of failures",
+                                    test.name, shard_index, None))
+    return outcomes
@@ -1,30 +1,54 @@
 import json
 import logging
+import threading
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 
 from colorama import Fore, Style
 
 import subatomic_coherence.ui.ui as UI
-from subatomic_coherence.logging.console_logging import ConsoleLogger
+from subatomic_coherence.logging.async_logging import AsyncLogSink
+from subatomic_coherence.logging.console_logging import ConsoleLogger, LazyJson
+from subatomic_coherence.profiling.delivery_lag import DeliveryLagTracker
+from subatomic_coherence.profiling.profiling import ProfileCollector, add_profiling_hook, profiled, \
+    remove_profiling_hook
+from subatomic_coherence.testing.event_router import EventRouter
 from subatomic_coherence.testing.test import ResultCode
+from subatomic_coherence.testing.test_history import TestHistory
+from subatomic_coherence.testing.test_impact import changed_files, impacted_tags
+from subatomic_coherence.testing.test_queue import TestQueue
 from subatomic_coherence.ui.ui import TestStatus
 from subatomic_coherence.ui.ui import TestingStage
+from subatomic_coherence.user.channel_pool import ChannelPool
 from subatomic_coherence.user.slack_user import SlackUser
 from subatomic_coherence.user.slack_user_workspace import SlackUserWorkspace
 
 
 class SlackTestSuite(object):
     def __init__(self, description="Test Suite", log_file=None, log_level=logging.INFO, listen_after_tests=False,
-                 interactive=False):
+                 interactive=False, async_logging=False, ui_max_fps=20, max_concurrent_tests=1,
+                 clean_up_workers=1, clean_up_on_completion=False, history_file=None, max_failures=None,
+                 adaptive_timeout=None, profile_file=None, delivery_lag_distribution=False):
         self.description = description
         self.slack_user_workspace = SlackUserWorkspace()
-        self.tests = []
+        self.tests = TestQueue()
+        self.live_tests = []
+        self.event_router = EventRouter()
+        self.max_concurrent_tests = max_concurrent_tests
         self._full_test_list = []
         self.total_tests = 0
         self.successful_tests = []
         self.failed_tests = []
+        self.cancelled_tests = []
+        self.skipped_tests = []
+        self.max_failures = max_failures
+        self.selected_tags = None
+        self.include_untagged = False
         self.new_events = False
         self.log_file = log_file
+        # The sink's thread only runs during run_tests, records logged before then wait in its queue
+        self.log_sink = AsyncLogSink() if async_logging else None
         self._set_log_file(log_file, log_level)
         self.listen_after_tests = listen_after_tests
         self.is_listening = False
@@ -35,15 +59,54 @@ class SlackTestSuite(object):
         if not self.interactive:
             self.test_status.current_operation = TestingStage.run_tests
         self.current_recording = False
-        self.screen = None
+        self.ui_max_fps = ui_max_fps
+        self.ui = None
+        self.clean_up_workers = clean_up_workers
+        self.clean_up_on_completion = clean_up_on_completion
+        self.clean_up_failures = []
+        self._clean_up_executor = None
+        self._clean_up_futures = []
+        self.adaptive_timeout = adaptive_timeout
+        self.test_history = None
+        if history_file is not None or adaptive_timeout is not None:
+            # Without a history file adaptive timeouts are learned from the steps completed during this run only
+            self.test_history = TestHistory(history_file)
+        self._test_start_times = {}
+        self.profile_file = profile_file
+        self.profile_collector = None
+        self.delivery_lag = DeliveryLagTracker(delivery_lag_distribution)
 
     def run_tests(self):
-        ConsoleLogger.info(f"Running subatomic_coherence test suite: {self.description}")
-        if not self._connect_clients():
-            exit(1)
+        self._start_log_sink()
+        try:
+            ConsoleLogger.info(f"Running subatomic_coherence test suite: {self.description}")
+            self._start_profiling()
+            if not self._connect_clients():
+                self._stop_profiling()
+                exit(1)
+            if self.slack_user_workspace.channel_pool is not None:
+                self.slack_user_workspace.channel_pool.prepare(self.slack_user_workspace)
+            self._select_tests()
+            if self.interactive:
+                self._run_interactive()
+            else:
+                self._run_test_loop()
+            self._run_clean_up()
+            self._log_recorded_events()
+            if len(self.delivery_lag.users) > 0:
+                ConsoleLogger.log(self.delivery_lag.summary())
+            self._log_injected_faults()
+            if self.test_history is not None:
+                self.test_history.save()
+            self._stop_profiling()
+        finally:
+            self._stop_log_sink()
+
+    def _run_test_loop(self):
         run_tests = len(self.tests) > 0
         while run_tests:
-            if len(self.tests) > 0 and self.test_status.break_at_test == self.tests[0].name:
+            self.test_status.process_commands()
+            if len(self.tests) > 0 and self.test_status.break_at_test == self.tests.peek().name:
                 self.test_status.current_operation = TestingStage.idle
 
             self._read_slack_events(self.test_status.is_recording)
@@ -56,27 +119,103 @@ class SlackTestSuite(object):
             self._clear_event_stores()
 
             self._update_test_status()
+            with profiled("ui", "publish"):
+                self.test_status.publish()
 
             run_tests = not self.test_status.current_operation == TestingStage.quit
-            if self.interactive:
-                UI.update_screen(self._get_screen(), self.test_status)
-
-        self._run_clean_up()
-        self._log_recorded_events()
 
-    def add_slack_user(self, username, token, connection_timeout=None):
-        self.slack_user_workspace.add_slack_user_client(SlackUser(username, token, connection_timeout))
-
-    def add_test(self, test_name, new_test):
+    def _run_interactive(self):
+        # Asciimatics installs signal handlers when it opens the screen, which can only be done on the main thread, so
+        # the screen is drawn on the calling thread while the test loop runs on a worker thread. A screen that fails to
+        # open raises here, before any test is started.
+        self.test_status.current_operation = TestingStage.idle
+        self.test_status.publish()
+        ui = UI.InteractiveUI(self.test_status, self.ui_max_fps)
+        ui.open()
+        self.ui = ui
+        loop_errors = []
+        loop_thread = threading.Thread(target=self._run_ui_test_loop, args=(self.ui, loop_errors),
+                                       name="coherence-tests")
+        loop_thread.start()
+        try:
+            self.ui.run()
+        finally:
+            # The UI also stops on its own when it fails or the user quits, the test loop is stopped with it
+            self.test_status.send_command(UI.UICommand.quit)
+            loop_thread.join()
+            self.ui = None
+        if len(loop_errors) > 0:
+            raise loop_errors[0]
+
+    def _run_ui_test_loop(self, ui, loop_errors):
+        try:
+            self._run_test_loop()
+        except BaseException as error:
+            loop_errors.append(error)
+        finally:
+            ui.stop()
+
+    def add_slack_user(self, username, token, connection_timeout=None, roles=None, fault_profile=None,
+                       ratelimit_retries=0):
+        # A FaultProfile injects delays, dropped and duplicated events and rate limit errors into the user's client
+        self.slack_user_workspace.add_slack_user_client(SlackUser(username, token, connection_timeout, fault_profile,
+                                                                  ratelimit_retries),
+                                                        roles)
+
+    def add_channel_pool(self, owner_username, name_prefix="coherence", size=5):
+        self.slack_user_workspace.channel_pool = ChannelPool(owner_username, name_prefix, size)
+
+    def add_test(self, test_name, new_test, priority=0):
+        # Queued tests with a higher priority are started first. Tests with equal priorities are started longest
+        # expected duration first when tests run concurrently and a history file is used, otherwise in the order added,
+        # as a serial run gains nothing from reordering and tests may rely on the order they were added in
         new_test.name = test_name
-        self.tests.append(new_test)
+        expected_duration = 0
+        if self.test_history is not None and self.max_concurrent_tests > 1:
+            expected_duration = self.test_history.expected_duration(test_name)
+        self.tests.push(new_test, priority, expected_duration)
         self._full_test_list.append(new_test)
         self.total_tests += 1
 
+    def select_tags(self, tags, include_untagged=False):
+        """
+        Runs only the tests tagged with at least one of the given tags, see TestPortal.tag. Untagged tests are only run
+        when include_untagged is True.
+        """
+        self.selected_tags = set(tags)
+        self.include_untagged = include_untagged
+
+    def select_impacted_tests(self, tag_patterns, base_ref="HEAD", repository_path=None, include_untagged=False):
+        """
+        Runs only the tests tagged for the files changed in the git working tree compared to base_ref. tag_patterns maps
+        glob patterns of changed files to tags, see test_impact.impacted_tags. All tests are run if the diff can not be
+        read.
+        """
+        files = changed_files(base_ref, repository_path)
+        if files is None:
+            ConsoleLogger.error("Could not read the changed files, all tests will be run")
+            return
+        tags = impacted_tags(tag_patterns, files)
+        ConsoleLogger.info(f"Tags impacted by {len(files)} changed files: {', '.join(sorted(tags)) or 'None'}")
+        self.select_tags(tags, include_untagged)
+
+    def _select_tests(self):
+        if self.selected_tags is None:
+            return
+        deselected_tests = self.tests.remove_if(
+            lambda test: not (test.tags & self.selected_tags or (self.include_untagged and len(test.tags) == 0)))
+        if len(deselected_tests) > 0:
+            deselected_ids = set(id(test) for test in deselected_tests)
+            self._full_test_list = [test for test in self._full_test_list if id(test) not in deselected_ids]
+            self.total_tests -= len(deselected_tests)
+        selected_tags = ", ".join(sorted(self.selected_tags)) or "None"
+        ConsoleLogger.info(f"Selected {len(self.tests)} tests tagged {selected_tags}, "
+                           f"{len(deselected_tests)} tests not selected")
+
     def _connect_clients(self):
         for slack_user in self.slack_user_workspace.slack_user_clients:
             if not slack_user.connect():
-                logging.error("{user} slack client failed to connect".format(user=slack_user.username))
+                logging.error("%s slack client failed to connect", slack_user.username)
                 return False
 
         self._configure_workspace()
@@ -92,69 +231,136 @@ class SlackTestSuite(object):
 
     def _read_slack_events(self, record_events):
         self.new_events = False
+        # Events only need to be kept in the shared per user stores while a live test has not declared any routes
+        all_tests_routed = len(self.live_tests) > 0 and all(len(test.routes) > 0 for test in self.live_tests)
         for slack_user in self.slack_user_workspace.slack_user_clients:
-            events = slack_user.client.rtm_read()
+            events = slack_user.rtm_read()
+            received_at = time.time()
             for event in events:
+                delivery_lag = self.delivery_lag.record(slack_user.username, event, received_at)
                 if record_events:
-                    self.recorded_events.append(RecordedEvent(slack_user.username, event))
-                slack_user.load_events(event)
-                logging.info("User {user} received event {event}"
-                             .format(user=slack_user.username, event=json.dumps(event)))
-                if event["type"] == "channel_created":
-                    self.slack_user_workspace.workspace_channels.append(event["channel"])
+                    self.recorded_events.append(RecordedEvent(slack_user.username, event, delivery_lag))
+                self.event_router.route(slack_user.username, event)
+                if not all_tests_routed:
+                    slack_user.load_events(event)
+                logging.info("User %s received event %s", slack_user.username, LazyJson(event),
+                             extra={"slack_user": slack_user.username, "slack_event_type": event.get("type"),
+                                    "slack_delivery_lag_ms": delivery_lag})
+                self.slack_user_workspace.apply_event(event)
                 self.new_events = True
 
     def _update_test_status(self):
         if len(self.tests) == 0:
             self.test_status.next_test = "None"
+            if len(self.live_tests) > 0:
+                return
             if self.interactive and self.test_status.current_operation == TestingStage.run_tests:
                 self.test_status.current_operation = TestingStage.idle
             elif not self.interactive:
                 self.test_status.current_operation = TestingStage.quit
         else:
-            self.test_status.next_test = self.tests[0].name
+            self.test_status.next_test = self.tests.peek().name
 
     def _process_current_test(self):
         test_completed = False
-        if len(self.tests) > 0:
-            current_test = self.tests[0]
+        self._start_queued_tests()
+        if len(self.live_tests) > 0:
             if self.new_events:
                 logging.info("Processing new events")
-            result = current_test.test(self.slack_user_workspace)
-            if not current_test.is_live:
-                if result.result_code == ResultCode.success:
-                    self.successful_tests += [current_test]
-                    ConsoleLogger.success(f"Test passed: { current_test.name}")
-                else:
-                    self.failed_tests += [current_test]
-                    message = f"{Fore.RED}Test failed: {Fore.LIGHTRED_EX}{current_test.name}" \
-                              f"\n{Fore.RED}Action Stack: {Fore.YELLOW}{result.call_stack}" \
-                              f"\n{Fore.RED}Result Message: {Fore.YELLOW}{result.message}{Style.RESET_ALL}"
-                    ConsoleLogger.log(message)
-                self.tests = self.tests[1:]
-                test_completed = True
-
-            if len(self.tests) == 0:
-                total_tests = str(len(self.successful_tests) + len(self.failed_tests))
-
-                summary = f"\n\n{Fore.MAGENTA}Test Summary:\n" \
-                          f"{Fore.GREEN}{str(len(self.successful_tests))}/{total_tests} " \
-                          f"tests passed\n{Style.RESET_ALL}"
-                for test in self.successful_tests:
-                    summary += f"{Fore.GREEN}Test passed: {test.name}{Style.RESET_ALL}\n"
-
-                summary += f"\n{Fore.RED}{str(len(self.failed_tests))}/{total_tests} tests failed\n"
-                for test in self.failed_tests:
-                    summary += f"{Fore.RED}Test failed: {Fore.LIGHTRED_EX}{test.name}\n" \
-                               f"{Fore.RED}Action Stack: {Fore.YELLOW}{test.call_stack_message}\n" \
-                               f"{Fore.RED}Result Message: {Fore.YELLOW}{test.message}\n\n{Style.RESET_ALL}"
-
-                ConsoleLogger.log(summary)
+            for current_test in list(self.live_tests):
+                if not current_test.is_live:
+                    # Cancelled by fail fast while processing an earlier test this tick
+                    continue
+                self.slack_user_workspace.active_test = current_test
+                self.event_router.activate(current_test, self.slack_user_workspace)
+                result = current_test.test(self.slack_user_workspace)
+                self.event_router.deactivate()
+                self.slack_user_workspace.active_test = None
+                if len(current_test.routes) > 0:
+                    self.event_router.update_routes(current_test, self.slack_user_workspace)
+                if not current_test.is_live:
+                    self._complete_test(current_test, result)
+                    test_completed = True
+
+            if len(self.tests) == 0 and len(self.live_tests) == 0:
+                ConsoleLogger.log(build_summary(self.successful_tests, self.failed_tests, self.cancelled_tests,
+                                                self.skipped_tests))
         return test_completed
 
+    def _start_queued_tests(self):
+        available_slots = self.max_concurrent_tests
+        if self.test_status.current_operation == TestingStage.run_one_test:
+            available_slots = 1
+        while len(self.tests) > 0 and len(self.live_tests) < available_slots:
+            next_test = self.tests.pop()
+            self.live_tests.append(next_test)
+            self._test_start_times[next_test] = time.monotonic()
+            if self.adaptive_timeout is not None:
+                self._apply_adaptive_timeouts(next_test)
+            if len(next_test.routes) > 0:
+                self.event_router.update_routes(next_test, self.slack_user_workspace)
+
+    def _complete_test(self, current_test, result):
+        start_time = self._test_start_times.get(current_test)
+        if self.test_history is not None:
+            if start_time is not None and result.result_code == ResultCode.success:
+                # Only successful runs are recorded, failures can end early or run to a timeout
+                self.test_history.record(current_test.name, (time.monotonic() - start_time) * 1000)
+            for step_name, latency in current_test.step_latencies:
+                self.test_history.record_step_latency(step_name, latency)
+        self._release_test(current_test)
+        if result.result_code == ResultCode.success:
+            self.successful_tests.append(current_test)
+            ConsoleLogger.success(f"Test passed: { current_test.name}")
+        else:
+            self.failed_tests.append(current_test)
+            message = f"{Fore.RED}Test failed: {Fore.LIGHTRED_EX}{current_test.name}" \
+                      f"\n{Fore.RED}Action Stack: {Fore.YELLOW}{result.call_stack}" \
+                      f"\n{Fore.RED}Result Message: {Fore.YELLOW}{result.message}{Style.RESET_ALL}"
+            ConsoleLogger.log(message)
+            if self.max_failures is not None and self._failed_test_count() >= self.max_failures:
+                self._fail_fast()
+
+    def _failed_test_count(self):
+        return len(self.failed_tests)
+
+    def _apply_adaptive_timeouts(self, test):
+        for step_name, element in test.steps():
+            element.timeout = self.adaptive_timeout.timeout(self.test_history.latencies(step_name), element.timeout)
+
+    def _release_test(self, test):
+        self.live_tests.remove(test)
+        self.event_router.remove(test)
+        self._test_start_times.pop(test, None)
+        self.slack_user_workspace.persona_pool.release(test)
+        if self.slack_user_workspace.channel_pool is not None:
+            self.slack_user_workspace.channel_pool.release(test)
+        if self.clean_up_on_completion and test.has_clean_up():
+            # This thread keeps applying events to the workspace while the clean up runs, so the clean up is given a
+            # snapshot of it taken as the test completes
+            self._submit_clean_up(test, self.slack_user_workspace.snapshot())
+
+    def _fail_fast(self):
+        # Live tests are cancelled and queued tests skipped. Skipped tests never started, so they are dropped from the
+        # full test list and their clean ups are not run
+        message = f"Cancelled after {self._failed_test_count()} failed tests"
+        for test in list(self.live_tests):
+            test.cancel(message)
+            self._release_test(test)
+            self.cancelled_tests.append(test)
+        skipped_tests = []
+        while len(self.tests) > 0:
+            skipped_tests.append(self.tests.pop())
+        self.skipped_tests.extend(skipped_tests)
+        skipped_ids = set(id(test) for test in skipped_tests)
+        self._full_test_list = [test for test in self._full_test_list if id(test) not in skipped_ids]
+        ConsoleLogger.error(f"Stopping after {self._failed_test_count()} failed tests: "
+                            f"{len(self.cancelled_tests)} tests cancelled, {len(self.skipped_tests)} tests skipped")
+
     def _clear_event_stores(self):
         for slack_user in self.slack_user_workspace.slack_user_clients:
             slack_user.clear_event_store()
+        self.event_router.clear_event_stores()
 
     def clear_recorded_events(self):
         self.recorded_events = []
@@ -180,13 +386,48 @@ class SlackTestSuite(object):
             formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
             handler.setFormatter(formatter)
 
+            # writes are moved to the background sink thread when asynchronous logging is enabled
+            if self.log_sink is not None:
+                handler = self.log_sink.wrap_handler(handler)
+                handler.setLevel(log_level)
+
             # add the handlers to the logger
             logger.addHandler(handler)
 
-    def _get_screen(self):
-        if self.interactive and self.screen is None:
-            self.screen = UI.initialise(self.test_status)
-        return self.screen
+    def _log_injected_faults(self):
+        for slack_user in self.slack_user_workspace.slack_user_clients:
+            injected_faults = getattr(slack_user.client, "injected_faults", None)
+            if injected_faults:
+                ConsoleLogger.info(f"Faults injected for {slack_user.username}: " +
+                                   ", ".join(f"{fault} {count}" for fault, count in sorted(injected_faults.items())))
+
+    def _start_profiling(self):
+        if self.profile_file is not None and self.profile_collector is None:
+            self.profile_collector = ProfileCollector()
+            add_profiling_hook(self.profile_collector)
+
+    def _stop_profiling(self):
+        if self.profile_collector is None:
+            return
+        remove_profiling_hook(self.profile_collector)
+        ConsoleLogger.log(self.profile_collector.summary())
+        try:
+            self.profile_collector.write_chrome_trace(self.profile_file)
+            ConsoleLogger.info(f"Profile written to {self.profile_file}")
+        except OSError:
+            logging.exception("Failed to write profile to %s", self.profile_file)
+        self.profile_collector = None
+
+    def _start_log_sink(self):
+        if self.log_sink is not None:
+            self.log_sink.start()
+            ConsoleLogger.sink = self.log_sink
+
+    def _stop_log_sink(self):
+        if self.log_sink is not None:
+            self.log_sink.stop()
+            if ConsoleLogger.sink is self.log_sink:
+                ConsoleLogger.sink = None
 
     def _log_recorded_events(self):
         if len(self.recorded_events) > 0:
@@ -202,20 +443,88 @@ class SlackTestSuite(object):
             ConsoleLogger.info("]")
 
     def _run_clean_up(self):
+        submitted_tests = set(test for test, _ in self._clean_up_futures)
         for test in self._full_test_list:
-            ConsoleLogger.info(f"Running clean up for test: {test.name}")
-            # noinspection PyBroadException
-            try:
-                test.tidy(self.slack_user_workspace)
-            except:
-                error_stack_trace = traceback.format_exc()
-                ConsoleLogger.info("Clean up error ignored: " + error_stack_trace)
+            if test not in submitted_tests:
+                self._submit_clean_up(test)
+
+        for test, future in self._clean_up_futures:
+            self._record_clean_up_result(test, future)
+        self._clean_up_futures = []
+        if self._clean_up_executor is not None:
+            self._clean_up_executor.shutdown()
+            self._clean_up_executor = None
+
+        if self.slack_user_workspace.channel_pool is not None:
+            self.slack_user_workspace.channel_pool.clean_up(self.slack_user_workspace)
+
+        if len(self.clean_up_failures) > 0:
+            report = f"{len(self.clean_up_failures)} clean up(s) failed:"
+            for test_name, _ in self.clean_up_failures:
+                report += f"\n{test_name}"
+            ConsoleLogger.error(report)
+
+    def _record_clean_up_result(self, test, future):
+        error = future.exception()
+        if error is not None:
+            error_stack_trace = "".join(traceback.format_exception(type(error), error, error.__traceback__))
+            self.clean_up_failures.append((test.name, error_stack_trace))
+            ConsoleLogger.info("Clean up error ignored: " + error_stack_trace)
+
+    def _submit_clean_up(self, test, slack_user_workspace=None):
+        # Clean ups mostly wait on rate limited Slack endpoints, so they are run on a thread pool. The rate limiters on
+        # each SlackUser are shared between the threads so that concurrent clean ups still respect the Slack limits.
+        if self._clean_up_executor is None:
+            self._clean_up_executor = ThreadPoolExecutor(max_workers=self.clean_up_workers,
+                                                         thread_name_prefix="coherence-clean-up")
+        if slack_user_workspace is None:
+            slack_user_workspace = self.slack_user_workspace
+        self._clean_up_futures.append((test, self._clean_up_executor.submit(self._tidy_test, test,
+                                                                            slack_user_workspace)))
+
+    def _tidy_test(self, test, slack_user_workspace):
+        ConsoleLogger.info(f"Running clean up for test: {test.name}")
+        test.tidy(slack_user_workspace)
+
+
+def build_summary(successful_tests, failed_tests, cancelled_tests=(), skipped_tests=()):
+    total_tests = str(len(successful_tests) + len(failed_tests) + len(cancelled_tests) + len(skipped_tests))
+
+    summary = f"\n\n{Fore.MAGENTA}Test Summary:\n" \
+              f"{Fore.GREEN}{str(len(successful_tests))}/{total_tests} " \
+              f"tests passed\n{Style.RESET_ALL}"
+    for test in successful_tests:
+        summary += f"{Fore.GREEN}Test passed: {test.name}{_format_response_times(test)}{Style.RESET_ALL}\n"
+
+    summary += f"\n{Fore.RED}{str(len(failed_tests))}/{total_tests} tests failed\n"
+    for test in failed_tests:
+        summary += f"{Fore.RED}Test failed: {Fore.LIGHTRED_EX}{test.name}{_format_response_times(test)}\n" \
+                   f"{Fore.RED}Action Stack: {Fore.YELLOW}{test.call_stack_message}\n" \
+                   f"{Fore.RED}Result Message: {Fore.YELLOW}{test.message}\n\n{Style.RESET_ALL}"
+    if len(cancelled_tests) > 0 or len(skipped_tests) > 0:
+        summary += f"{Fore.YELLOW}{str(len(cancelled_tests))} tests cancelled and {str(len(skipped_tests))} tests " \
+                   f"skipped after reaching the maximum number of failures\n{Style.RESET_ALL}"
+        for test in cancelled_tests:
+            summary += f"{Fore.YELLOW}Test cancelled: {test.name}{Style.RESET_ALL}\n"
+        for test in skipped_tests:
+            summary += f"{Fore.YELLOW}Test skipped: {test.name}{Style.RESET_ALL}\n"
+    return summary
+
+
+def _format_response_times(test):
+    response_times = getattr(test, "response_times", None)
+    if not response_times:
+        return ""
+    return " (" + ", ".join(f"{name}: {response_time}ms" for name, response_time in response_times.items()) + ")"
 
 
 class RecordedEvent(object):
-    def __init__(self, client_name, event):
+    __slots__ = ("coherence_slack_client_name", "event", "time_stamp", "delivery_lag")
+
+    def __init__(self, client_name, event, delivery_lag=None):
         self.coherence_slack_client_name = client_name
         self.event = event
+        self.delivery_lag = delivery_lag
         self.time_stamp = ""
         if "event_ts" in event:
             self.time_stamp = event["event_ts"]
@@ -223,5 +532,7 @@ class RecordedEvent(object):
             self.time_stamp = event["ts"]
 
     def json(self):
-        return json.dumps({"CoherenceSlackClient": self.coherence_slack_client_name, "SlackEvent": self.event},
-                          indent=4)
+        recorded_event = {"CoherenceSlackClient": self.coherence_slack_client_name, "SlackEvent": self.event}
+        if self.delivery_lag is not None:
+            recorded_event["DeliveryLagMs"] = round(self.delivery_lag, 1)
+        return json.dumps(recorded_event, indent=4)
@@ -0,0 +1,163 @@
+import json
+import logging
+import time
+from collections import deque
+
+from subatomic_coherence.logging.console_logging import ConsoleLogger
+from subatomic_coherence.profiling.resource_usage import ResourceMonitor
+from subatomic_coherence.slack_test_suite import SlackTestSuite
+from subatomic_coherence.testing.test import ResultCode
+
+
+class SoakTestSuite(SlackTestSuite):
+    """
+    Runs a set of tests again and again for a long period against a live bot. A new round of tests is started every
+    round_interval milliseconds, once the previous round has finished, until duration milliseconds have passed,
+    rounds rounds have run or max_failures tests have failed. Without any of these the suite runs until it is stopped.
+
+    Everything a SlackTestSuite keeps for the whole run is bounded: only the newest max_recorded_events recorded
+    events and max_completed_tests completed tests are kept, clean ups are run as each test completes, and test
+    history is saved at every metrics flush. Every metrics_interval milliseconds the resource usage of the process and
+    the sizes of the suite's stores are appended to metrics_file as a line of JSON and checked for leaks. Between
+    rounds the suite sleeps for up to idle_interval milliseconds at a time rather than polling Slack continuously.
+    """
+
+    def __init__(self, description="Soak Test Suite", round_interval=300000, duration=None, rounds=None,
+                 metrics_file=None, metrics_interval=60000, max_recorded_events=10000, max_completed_tests=1000,
+                 idle_interval=100, **kwargs):
+        super().__init__(description, **kwargs)
+        self.round_interval = round_interval
+        self.duration = duration
+        self.rounds = rounds
+        self.metrics_file = metrics_file
+        self.metrics_interval = metrics_interval
+        self.idle_interval = idle_interval
+        # Clean ups can not wait for the end of a run that may last for days
+        self.clean_up_on_completion = True
+        self.recorded_events = deque(maxlen=max_recorded_events)
+        self.successful_tests = deque(maxlen=max_completed_tests)
+        self.failed_tests = deque(maxlen=max_completed_tests)
+        self.cancelled_tests = deque(maxlen=max_completed_tests)
+        self.skipped_tests = deque(maxlen=max_completed_tests)
+        self.clean_up_failures = deque(maxlen=max_completed_tests)
+        self.test_factories = []
+        self.rounds_started = 0
+        self.total_successful_tests = 0
+        self.total_failed_tests = 0
+        self.resource_monitor = ResourceMonitor()
+        self.reported_leaks = set()
+        self._start_time = None
+        self._next_round_time = None
+        self._next_flush_time = None
+
+    def add_test(self, test_name, test_factory, priority=0):
+        # Each round needs fresh TestPortal chains, so a factory returning a new TestPortal is added, as with the
+        # ShardedTestSuite
+        self.test_factories.append((test_name, test_factory, priority))
+
+    def run_tests(self):
+        self._start_time = time.monotonic()
+        self._next_flush_time = self._start_time + self.metrics_interval / 1000
+        self._start_round(self._start_time)
+        super().run_tests()
+        self._flush_metrics()
+        ConsoleLogger.log(self.build_soak_report())
+
+    def clear_recorded_events(self):
+        self.recorded_events.clear()
+
+    def build_soak_report(self):
+        report = f"Soak test report: {self.rounds_started} rounds, {self.total_successful_tests} tests passed, " \
+                 f"{self.total_failed_tests} tests failed"
+        samples = self.resource_monitor.samples
+        if len(samples) > 0 and samples[0]["memory_bytes"] is not None and samples[-1]["memory_bytes"] is not None:
+            report += f"\nMemory: {_megabytes(samples[0]['memory_bytes'])} MB at the start, " \
+                      f"{_megabytes(samples[-1]['memory_bytes'])} MB at the end"
+        leaks = self.resource_monitor.suspected_leaks()
+        for metric, growth, growth_per_hour in leaks:
+            report += f"\nPossible leak: {metric} grew by {growth:.0f} ({growth_per_hour:.0f} per hour)"
+        if len(leaks) == 0:
+            report += "\nNo growing resources detected"
+        return report
+
+    def _update_test_status(self):
+        now = time.monotonic()
+        idle = len(self.tests) == 0 and len(self.live_tests) == 0
+        if idle and not self._is_finished(now) and now >= self._next_round_time:
+            self._start_round(now)
+            self._select_tests()
+            idle = len(self.tests) == 0
+        if now >= self._next_flush_time:
+            self._next_flush_time = now + self.metrics_interval / 1000
+            self._flush_metrics()
+        if idle and not self._is_finished(now):
+            # Waiting for the next round, without spinning a core on the test loop
+            self.test_status.next_test = "None"
+            time.sleep(max(0, min(self.idle_interval / 1000, self._next_round_time - now,
+                                  self._next_flush_time - now)))
+            return
+        super()._update_test_status()
+
+    def _is_finished(self, now):
+        return (self.rounds is not None and self.rounds_started >= self.rounds) or \
+               (self.duration is not None and (now - self._start_time) * 1000 >= self.duration) or \
+               (self.max_failures is not None and self.total_failed_tests >= self.max_failures)
+
+    def _start_round(self, now):
+        self.rounds_started += 1
+        self._next_round_time = now + self.round_interval / 1000
+        # Completed tests only stay in the full test list until their clean ups have been collected
+        self._collect_clean_ups()
+        self._full_test_list = [test for test in self._full_test_list if test.is_live]
+        for test_name, test_factory, priority in self.test_factories:
+            super().add_test(test_name, test_factory(), priority)
+        ConsoleLogger.info(f"Starting soak test round {self.rounds_started}")
+
+    def _complete_test(self, current_test, result):
+        if result.result_code == ResultCode.success:
+            self.total_successful_tests += 1
+        else:
+            self.total_failed_tests += 1
+        super()._complete_test(current_test, result)
+
+    def _failed_test_count(self):
+        # failed_tests only keeps the newest failures
+        return self.total_failed_tests
+
+    def _collect_clean_ups(self):
+        running_clean_ups = []
+        for test, future in self._clean_up_futures:
+            if future.done():
+                self._record_clean_up_result(test, future)
+            else:
+                running_clean_ups.append((test, future))
+        self._clean_up_futures = running_clean_ups
+
+    def _flush_metrics(self):
+        sample = self.resource_monitor.sample(
+            recorded_events=len(self.recorded_events),
+            buffered_log=len(ConsoleLogger.buffered_log),
+            current_log=len(self.test_status.current_log),
+            stored_events=sum(len(slack_user.events.events)
+                              for slack_user in self.slack_user_workspace.slack_user_clients),
+            live_tests=len(self.live_tests),
+            running_clean_ups=len(self._clean_up_futures))
+        if self.test_history is not None:
+            self.test_history.save()
+        for metric, growth, growth_per_hour in self.resource_monitor.suspected_leaks():
+            if metric not in self.reported_leaks:
+                self.reported_leaks.add(metric)
+                ConsoleLogger.error(f"Possible leak: {metric} grew by {growth:.0f} ({growth_per_hour:.0f} per hour)")
+        if self.metrics_file is None:
+            return
+        metrics = dict(sample, time=time.time(), round=self.rounds_started,
+                       successful_tests=self.total_successful_tests, failed_tests=self.total_failed_tests)
+        try:
+            with open(self.metrics_file, "a") as metrics_file:
+                metrics_file.write(json.dumps(metrics) + "\n")
+        except OSError:
+            logging.exception("Failed to write soak test metrics to %s", self.metrics_file)
+
+
+def _megabytes(byte_count):
+    return round(byte_count / 1048576, 1)
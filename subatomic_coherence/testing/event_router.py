@@ -0,0 +1,128 @@
+from subatomic_coherence.actions.simple_actions import resolve_value
+from subatomic_coherence.user.slack_user import EventStore
+
+
+class EventRouter(object):
+    """
+    Routes incoming events straight to the tests whose conversations they belong to. A test declares the conversations
+    it is interested in with TestPortal.route, naming a channel, a thread_ts stored in the test's data_store, and/or a
+    sending user. These are resolved into (channel id, thread ts, user id) keys, where None matches anything, and kept
+    in a dictionary. Routing an event is a fixed number of dictionary lookups, so traffic that no test is interested in
+    is discarded in constant time.
+
+    While a routed test runs, the events property of each SlackUser is swapped for the test's own EventStore for that
+    user, so existing actions only ever see the events routed to the test.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.test_routes = {}
+        self.test_events = {}
+        self._active_event_stores = None
+
+    def update_routes(self, test, slack_user_workspace):
+        route_keys = set()
+        for route in test.routes:
+            try:
+                route_key = self._resolve_route(route, test.data_store, slack_user_workspace)
+            except (KeyError, IndexError):
+                # Stored values used by the route have not been stored by the test yet
+                route_key = None
+            if route_key is not None:
+                route_keys.add(route_key)
+
+        previous_route_keys = self.test_routes.get(test, set())
+        if route_keys == previous_route_keys:
+            return
+        for route_key in previous_route_keys - route_keys:
+            self.routes[route_key].discard(test)
+            if len(self.routes[route_key]) == 0:
+                del self.routes[route_key]
+        for route_key in route_keys - previous_route_keys:
+            self.routes.setdefault(route_key, set()).add(test)
+        self.test_routes[test] = route_keys
+        self.test_events.setdefault(test, {})
+
+    def remove(self, test):
+        for route_key in self.test_routes.pop(test, set()):
+            self.routes[route_key].discard(test)
+            if len(self.routes[route_key]) == 0:
+                del self.routes[route_key]
+        self.test_events.pop(test, None)
+
+    def route(self, username, event):
+        if len(self.routes) == 0:
+            return False
+        channel_id, thread_ts, user_id = route_fields(event)
+        routed = False
+        for channel_key in (channel_id, None):
+            for thread_key in (thread_ts, None):
+                for user_key in (user_id, None):
+                    tests = self.routes.get((channel_key, thread_key, user_key))
+                    if tests is not None:
+                        for test in tests:
+                            self._event_store(test, username).load_event(event)
+                            routed = True
+        return routed
+
+    def activate(self, test, slack_user_workspace):
+        if len(test.routes) == 0:
+            return
+        self._active_event_stores = {}
+        for slack_user in slack_user_workspace.slack_user_clients:
+            self._active_event_stores[slack_user] = slack_user.events
+            slack_user.events = self._event_store(test, slack_user.username)
+
+    def deactivate(self):
+        if self._active_event_stores is not None:
+            for slack_user, event_store in self._active_event_stores.items():
+                slack_user.events = event_store
+            self._active_event_stores = None
+
+    def clear_event_stores(self):
+        for event_stores in self.test_events.values():
+            for event_store in event_stores.values():
+                event_store.clear_event_store()
+
+    def _event_store(self, test, username):
+        event_stores = self.test_events.setdefault(test, {})
+        if username not in event_stores:
+            event_stores[username] = EventStore()
+        return event_stores[username]
+
+    @staticmethod
+    def _resolve_route(route, data_store, slack_user_workspace):
+        channel_id = None
+        if route.channel_name is not None:
+            channel = slack_user_workspace.find_group_or_channel_by_name(resolve_value(route.channel_name, data_store))
+            if channel is None:
+                return None
+            channel_id = channel["id"]
+
+        thread_ts = None
+        if route.thread_ts_name is not None:
+            thread_ts = data_store.get(route.thread_ts_name)
+
+        user_id = None
+        if route.from_user is not None:
+            user = slack_user_workspace.find_user_by_username(resolve_value(route.from_user, data_store))
+            if user is None:
+                return None
+            user_id = user["id"]
+
+        return channel_id, thread_ts, user_id
+
+
+def route_fields(event):
+    channel = event.get("channel")
+    if isinstance(channel, dict):
+        channel = channel.get("id")
+    message = event
+    if "subtype" in event and isinstance(event.get("message"), dict):
+        message = event["message"]
+    # The root message of a thread has no thread_ts, its own ts is the thread_ts of the replies
+    thread_ts = message.get("thread_ts", message.get("ts"))
+    user = message.get("user")
+    if isinstance(user, dict):
+        user = user.get("id")
+    return channel, thread_ts, user
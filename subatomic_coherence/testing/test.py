@@ -1,16 +1,21 @@
 import json
 import time
+from collections import namedtuple
 from enum import Enum
 import traceback
 
 from subatomic_coherence.logging.console_logging import ConsoleLogger
+from subatomic_coherence.profiling.profiling import profiled
 
 
 class TestElement(object):
+    __slots__ = ("test_stage", "timeout", "next_action", "run_element", "has_child", "start_time", "is_started",
+                 "call_stack_message", "parent")
+
     def __init__(self, run_element, timeout=15000):
         self.test_stage = ResultCode.pending
         self.timeout = timeout
-        self.next_action = lambda slack_user_workspace, data_store: TestResult(ResultCode.success, "SUCCESS")
+        self.next_action = _test_element_success
         self.run_element = run_element
         self.has_child = False
         self.start_time = 0
@@ -20,6 +25,9 @@ class TestElement(object):
 
 
 class TestPortal(TestElement):
+    __slots__ = ("current_action", "is_live", "message", "name", "data_store", "simple_call_stack", "clean_up",
+                 "routes", "tags", "step_latencies")
+
     def __init__(self, timeout=15000):
         super().__init__(self.start_test, timeout)
         self.current_action = self
@@ -28,7 +36,10 @@ class TestPortal(TestElement):
         self.name = "Unnamed Test"
         self.data_store = {}
         self.simple_call_stack = []
-        self.clean_up = lambda slack_user_workspace: None
+        self.clean_up = _no_clean_up
+        self.routes = []
+        self.tags = set()
+        self.step_latencies = []
 
     def then(self, next_action, timeout=15000):
         found_leaf_then = False
@@ -43,10 +54,36 @@ class TestPortal(TestElement):
 
         return self
 
+    def route(self, channel_name=None, thread_ts_name=None, from_user=None):
+        self.routes.append(EventRoute(channel_name, thread_ts_name, from_user))
+        return self
+
+    def tag(self, *tags):
+        # Tags name the bot commands or features a test covers so that a suite can select the tests to run by tag
+        self.tags.update(tags)
+        return self
+
+    def cancel(self, message="Test cancelled"):
+        # Cancelling a live test fails it without running its remaining steps
+        if self.is_live:
+            self.is_live = False
+            self.test_stage = ResultCode.failure
+            self.message = message
+            self.call_stack_message = self._build_simple_stack_message()
+        return TestResult(self.test_stage, self.message, self.call_stack_message)
+
+    @property
+    def response_times(self):
+        # Response times in milliseconds measured by the test's steps, by name
+        return self.data_store.get(RESPONSE_TIMES, {})
+
     def set_clean_up(self, clean_up_function):
         self.clean_up = clean_up_function
         return self
 
+    def has_clean_up(self):
+        return self.clean_up is not _no_clean_up
+
     def tidy(self, slack_user_workspace):
         self.clean_up(slack_user_workspace)
 
@@ -63,7 +100,12 @@ class TestPortal(TestElement):
                     result = TestResult(ResultCode.failure, "Time out occurred when calling {function_name}"
                                         .format(function_name=self.current_action.run_element.__name__))
                 else:
-                    result = self.current_action.run_element(slack_users, self.data_store)
+                    with profiled("run_element", self.current_action.run_element.__name__):
+                        result = self.current_action.run_element(slack_users, self.data_store)
+                if result.result_code is ResultCode.success and self.current_action is not self:
+                    # Latencies of completed steps are kept for adaptive timeouts
+                    self.step_latencies.append((self.step_name(len(self.simple_call_stack), self.current_action),
+                                                current_time - self.current_action.start_time))
                 if result.result_code is ResultCode.failure:
                     self.test_stage = ResultCode.failure
                     self.is_live = False
@@ -81,6 +123,9 @@ class TestPortal(TestElement):
                     self.is_live = False
                     self.message = result.message
                     self.call_stack_message = self._build_simple_stack_message()
+            if self.test_stage is ResultCode.pending and self.message == ResultCode.pending.name:
+                # Live tests are polled every tick, so the unchanged pending result is shared rather than rebuilt
+                return PENDING_TEST_RESULT
             return TestResult(self.test_stage, self.message, self.call_stack_message)
         except:
             error_stack_trace = traceback.format_exc()
@@ -90,9 +135,21 @@ class TestPortal(TestElement):
             self.call_stack_message = self._build_simple_stack_message()
             return TestResult(self.test_stage, self.message, self.call_stack_message)
 
+    def steps(self):
+        # Yields (step_name, element) for each step after the portal itself
+        element = self
+        step_index = 0
+        while element.has_child:
+            element = element.next_action
+            step_index += 1
+            yield self.step_name(step_index, element), element
+
+    def step_name(self, step_index, element):
+        return f"{self.name}.{step_index}.{element.run_element.__name__}"
+
     def start_test(self, slack_user_workspace, data_store):
         ConsoleLogger.success(f"Running Test: {self.name}")
-        return TestResult(ResultCode.success)
+        return SUCCESS_RESULT
 
     def _push_action_onto_stack(self, current_action):
         self.simple_call_stack += [CallStackAction(current_action.run_element.__name__)]
@@ -106,13 +163,20 @@ class TestPortal(TestElement):
         return message
 
 
+EventRoute = namedtuple("EventRoute", ["channel_name", "thread_ts_name", "from_user"])
+
+
 class CallStackAction(object):
+    __slots__ = ("name", "accepted_event")
+
     def __init__(self, name):
         self.name = name
         self.accepted_event = None
 
 
 class TestResult(object):
+    __slots__ = ("result", "result_code", "message", "call_stack")
+
     def __init__(self, result_code, message="", call_stack=""):
         self.result = result_code.name
         self.result_code = result_code
@@ -124,3 +188,21 @@ class ResultCode(Enum):
     pending = 0
     success = 1
     failure = 2
+
+
+# Results are shared between calls wherever they carry no test specific details, they must not be modified
+PENDING_RESULT = TestResult(ResultCode.pending)
+SUCCESS_RESULT = TestResult(ResultCode.success)
+PENDING_TEST_RESULT = TestResult(ResultCode.pending, ResultCode.pending.name)
+_ELEMENT_SUCCESS_RESULT = TestResult(ResultCode.success, "SUCCESS")
+
+# The data store key response times are kept under, see TestPortal.response_times
+RESPONSE_TIMES = "__response_times__"
+
+
+def _test_element_success(slack_user_workspace, data_store):
+    return _ELEMENT_SUCCESS_RESULT
+
+
+def _no_clean_up(slack_user_workspace):
+    return None
@@ -0,0 +1,133 @@
+import logging
+import sqlite3
+import statistics
+import time
+from collections import deque
+from contextlib import closing
+
+
+class TestHistory(object):
+    """
+    Durations of tests and latencies of test steps from previous runs kept in a small sqlite database. Each test's
+    expected duration is an exponentially weighted average of its successful runs, so a test that has become slower or
+    faster is rescheduled within a few runs. Tests without any history are expected to take the median duration of the
+    known tests. The most recent latencies of each step are kept for adaptive timeouts, see AdaptiveTimeout.
+
+    The history is read once when it is opened, new durations and latencies are held in memory until save is called so
+    that completing a test never waits on the database. A history without a path is kept in memory only. While saves
+    are failing at most max_pending_latencies unsaved step latencies are held, the oldest are dropped beyond that.
+    """
+
+    def __init__(self, path=None, smoothing=0.5, step_samples=200, max_pending_latencies=100000):
+        self.path = path
+        self.smoothing = smoothing
+        self.step_samples = step_samples
+        self.durations = {}
+        self.runs = {}
+        self.step_latencies = {}
+        self._pending_durations = {}
+        self._pending_step_latencies = deque(maxlen=max_pending_latencies)
+        self._default_duration = None
+        if self.path is None:
+            return
+        with closing(self._connect()) as connection, connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS test_durations ("
+                               "test_name TEXT PRIMARY KEY, duration_ms REAL NOT NULL, runs INTEGER NOT NULL, "
+                               "updated_at REAL NOT NULL)")
+            connection.execute("CREATE TABLE IF NOT EXISTS step_latencies ("
+                               "step_name TEXT NOT NULL, latency_ms REAL NOT NULL, recorded_at REAL NOT NULL)")
+            connection.execute("CREATE INDEX IF NOT EXISTS step_latencies_step_name ON step_latencies (step_name)")
+            for test_name, duration_ms, runs in connection.execute(
+                    "SELECT test_name, duration_ms, runs FROM test_durations"):
+                self.durations[test_name] = duration_ms
+                self.runs[test_name] = runs
+            for step_name, latency_ms in connection.execute(
+                    "SELECT step_name, latency_ms FROM step_latencies ORDER BY rowid"):
+                self._step_latencies(step_name).append(latency_ms)
+
+    def has_history(self):
+        return len(self.durations) > 0
+
+    def expected_duration(self, test_name):
+        if test_name in self.durations:
+            return self.durations[test_name]
+        if self._default_duration is None:
+            self._default_duration = statistics.median(self.durations.values()) if self.has_history() else 0
+        return self._default_duration
+
+    def record(self, test_name, duration_ms):
+        if test_name in self.durations:
+            duration_ms = self.durations[test_name] + self.smoothing * (duration_ms - self.durations[test_name])
+        self.durations[test_name] = duration_ms
+        self.runs[test_name] = self.runs.get(test_name, 0) + 1
+        if self.path is not None:
+            self._pending_durations[test_name] = duration_ms
+        self._default_duration = None
+
+    def latencies(self, step_name):
+        return list(self.step_latencies.get(step_name, ()))
+
+    def record_step_latency(self, step_name, latency_ms):
+        self._step_latencies(step_name).append(latency_ms)
+        if self.path is not None:
+            self._pending_step_latencies.append((step_name, latency_ms, time.time()))
+
+    def save(self):
+        if self.path is None or (len(self._pending_durations) == 0 and len(self._pending_step_latencies) == 0):
+            return
+        updated_at = time.time()
+        rows = [(test_name, duration_ms, self.runs[test_name], updated_at)
+                for test_name, duration_ms in self._pending_durations.items()]
+        saved_steps = [(step_name,) for step_name in set(entry[0] for entry in self._pending_step_latencies)]
+        try:
+            with closing(self._connect()) as connection, connection:
+                connection.executemany("INSERT OR REPLACE INTO test_durations "
+                                       "(test_name, duration_ms, runs, updated_at) VALUES (?, ?, ?, ?)", rows)
+                connection.executemany("INSERT INTO step_latencies (step_name, latency_ms, recorded_at) "
+                                       "VALUES (?, ?, ?)", self._pending_step_latencies)
+                # Only the most recent samples of each step are kept
+                connection.executemany("DELETE FROM step_latencies WHERE step_name = ?1 AND rowid NOT IN ("
+                                       "SELECT rowid FROM step_latencies WHERE step_name = ?1 "
+                                       f"ORDER BY rowid DESC LIMIT {int(self.step_samples)})", saved_steps)
+            self._pending_durations = {}
+            self._pending_step_latencies.clear()
+        except sqlite3.Error:
+            logging.exception("Failed to save test history to %s", self.path)
+
+    def _step_latencies(self, step_name):
+        if step_name not in self.step_latencies:
+            self.step_latencies[step_name] = deque(maxlen=self.step_samples)
+        return self.step_latencies[step_name]
+
+    def _connect(self):
+        # Sharded suites save from several processes at once, the timeout lets them queue for the database lock
+        return sqlite3.connect(self.path, timeout=30)
+
+
+class AdaptiveTimeout(object):
+    """
+    A timeout policy for test steps learned from their recorded latencies. Once a step has at least min_samples
+    latencies, its timeout is the given percentile of them multiplied by multiplier, bounded by floor and ceiling. The
+    ceiling defaults to the timeout given to the step, so adaptive timeouts only ever shorten a step's timeout. Steps
+    without enough history keep their own timeout.
+    """
+
+    def __init__(self, percentile=99, multiplier=3, floor=1000, ceiling=None, min_samples=20):
+        self.percentile = percentile
+        self.multiplier = multiplier
+        self.floor = floor
+        self.ceiling = ceiling
+        self.min_samples = min_samples
+
+    def timeout(self, latencies, default_timeout):
+        if len(latencies) < self.min_samples:
+            return default_timeout
+        ceiling = default_timeout if self.ceiling is None else self.ceiling
+        return min(max(percentile(latencies, self.percentile) * self.multiplier, self.floor), ceiling)
+
+
+def percentile(values, percent):
+    # Nearest rank percentile
+    ordered_values = sorted(values)
+    rank = -(-percent * len(ordered_values) // 100)
+    return ordered_values[max(1, min(len(ordered_values), int(rank))) - 1]
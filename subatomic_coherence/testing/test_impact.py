@@ -0,0 +1,36 @@
+import fnmatch
+import logging
+import subprocess
+
+
+def changed_files(base_ref="HEAD", repository_path=None):
+    """
+    Lists the files changed in the working tree of a git repository compared to base_ref, including untracked files.
+    Returns None when the diff cannot be read, for example when git is not installed or the path is not a repository.
+    """
+    try:
+        changed = _git(["diff", "--name-only", base_ref], repository_path)
+        untracked = _git(["ls-files", "--others", "--exclude-standard", "--full-name"], repository_path)
+    except (OSError, subprocess.CalledProcessError) as error:
+        logging.warning("Could not read the changed files compared to %s: %s", base_ref, error)
+        return None
+    return sorted(set(changed + untracked))
+
+
+def impacted_tags(tag_patterns, files):
+    """
+    Maps changed files to test tags. tag_patterns is a dictionary of glob patterns, matched against the file paths
+    relative to the repository root, to the tag or list of tags of the tests that cover the matching files, e.g.
+    {"bot/commands/deploy/*": "deploy", "bot/core/*": ["deploy", "status"]}.
+    """
+    tags = set()
+    for pattern, pattern_tags in tag_patterns.items():
+        if any(fnmatch.fnmatch(file, pattern) for file in files):
+            tags.update([pattern_tags] if isinstance(pattern_tags, str) else pattern_tags)
+    return tags
+
+
+def _git(arguments, repository_path):
+    result = subprocess.run(["git"] + arguments, cwd=repository_path, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            universal_newlines=True, check=True)
+    return [line for line in result.stdout.splitlines() if len(line) > 0]
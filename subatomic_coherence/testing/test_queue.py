@@ -0,0 +1,47 @@
+import heapq
+import itertools
+
+
+class TestQueue(object):
+    """
+    The queue of tests waiting to run. Tests with a higher priority are run first, tests with the same priority are
+    run longest expected duration first, and otherwise in the order they were added. Starting the longest tests first
+    lets concurrently running tests finish closer together. Adding and taking a test are O(log n) and the next test can
+    be read in O(1), so generated suites with tens of thousands of tests are not slowed down by the queue itself.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._sequence = itertools.count()
+
+    def push(self, test, priority=0, expected_duration=0):
+        heapq.heappush(self._heap, (-priority, -expected_duration, next(self._sequence), test))
+
+    def pop(self):
+        return heapq.heappop(self._heap)[-1]
+
+    def peek(self):
+        return self._heap[0][-1]
+
+    def remove_if(self, predicate):
+        """
+        Removes every queued test for which predicate(test) is True, returning the removed tests in run order.
+        """
+        removed_entries = sorted(entry for entry in self._heap if predicate(entry[-1]))
+        if len(removed_entries) > 0:
+            removed_tests = set(id(entry[-1]) for entry in removed_entries)
+            self._heap = [entry for entry in self._heap if id(entry[-1]) not in removed_tests]
+            heapq.heapify(self._heap)
+        return [entry[-1] for entry in removed_entries]
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __iter__(self):
+        # Iterates in run order without consuming the queue
+        return iter([entry[-1] for entry in sorted(self._heap)])
+
+    def __getitem__(self, index):
+        if index == 0 and len(self._heap) > 0:
+            return self._heap[0][-1]
+        return list(self)[index]
@@ -1,4 +1,8 @@
+import threading
+import time
+from collections import deque, namedtuple
 from enum import Enum
+from itertools import islice
 
 from asciimatics.exceptions import StopApplication
 from asciimatics.scene import Scene
@@ -22,15 +26,44 @@ class TestingStage(Enum):
     quit = 4
 
 
+class UICommand(Enum):
+    toggle_recording = 0
+    run_tests = 1
+    run_one_test = 2
+    set_break_at_test = 3
+    quit = 4
+    clear_log = 5
+
+
+StatusSnapshot = namedtuple("StatusSnapshot", ["current_operation", "is_recording", "recorded_event_count",
+                                               "total_tests", "next_test", "break_at_test", "log_version",
+                                               "log_lines"])
+
+
 class TestStatus(object):
-    def __init__(self, test_suite):
+    """
+    TestStatus is shared between the test suite thread and the interactive UI thread. The suite thread owns all of the
+    mutable state and is the only thread that changes it. The UI thread only ever reads the immutable StatusSnapshot
+    last published by the suite and asks for changes by appending UICommands to a deque, which the suite drains on its
+    next iteration. Appending to and popping from a deque are atomic, so neither side takes a lock. The log is also
+    read into current_log by the suite thread, the snapshot carries the newest log_window_size lines of it.
+    """
+
+    def __init__(self, test_suite, log_capacity=10000, log_window_size=500):
         self.can_run_tests = False
         self.is_recording = False
         self.test_suite = test_suite
         self.current_operation = TestingStage.startup
-        self.current_log = []
+        self.current_log = deque(maxlen=log_capacity)
+        self.log_version = 0
+        self.log_window_size = log_window_size
+        self._log_lines = ()
+        self._log_lines_version = 0
         self.next_test = ""
         self.break_at_test = ""
+        self.commands = deque()
+        self.snapshot = None
+        self.publish()
 
     def toggle_recording(self):
         self.is_recording = not self.is_recording
@@ -41,12 +74,55 @@ class TestStatus(object):
     def count_recorded_events(self):
         return len(self.test_suite.recorded_events)
 
+    def send_command(self, command, value=None):
+        self.commands.append((command, value))
+
+    def process_commands(self):
+        while True:
+            try:
+                command, value = self.commands.popleft()
+            except IndexError:
+                return
+            if command == UICommand.toggle_recording:
+                self.toggle_recording()
+            elif command == UICommand.run_tests:
+                self.current_operation = TestingStage.run_tests
+            elif command == UICommand.run_one_test:
+                self.current_operation = TestingStage.run_one_test
+            elif command == UICommand.set_break_at_test:
+                self.break_at_test = value
+            elif command == UICommand.quit:
+                self.current_operation = TestingStage.quit
+            elif command == UICommand.clear_log:
+                self.clear_log()
+
+    def publish(self):
+        self.update_log()
+        if self._log_lines_version != self.log_version:
+            self._log_lines_version = self.log_version
+            self._log_lines = tuple(self.log_window(self.log_window_size))
+        self.snapshot = StatusSnapshot(self.current_operation, self.is_recording, self.count_recorded_events(),
+                                       self.test_suite.total_tests, self.next_test, self.break_at_test,
+                                       self.log_version, self._log_lines)
+
     def update_log(self):
-        for entry in ConsoleLogger.read_buffered_log():
-            self.current_log += [(entry, len(self.current_log))]
+        new_entries = ConsoleLogger.read_buffered_log()
+        self.current_log.extend(new_entries)
+        self.log_version += len(new_entries)
+        return len(new_entries) > 0
+
+    def log_window(self, size):
+        # Only the newest lines are handed to the list view, numbered by their absolute position in the log
+        first_index = self.log_version - min(size, len(self.current_log))
+        window = reversed(list(islice(reversed(self.current_log), size)))
+        return [(entry, first_index + offset) for offset, entry in enumerate(window)]
 
     def clear_log(self):
-        self.current_log = []
+        self.current_log.clear()
+        self.log_version += 1
+
+    def fingerprint(self):
+        return self.snapshot
 
 
 class MainMenu(Frame):
@@ -59,6 +135,8 @@ class MainMenu(Frame):
         # Save off the model that accesses the contacts database.
         self._model = model
         self._current_option_count = 0
+        self._rendered_log_version = -1
+        self._log_window_size = screen.height
         label_original = self.palette["label"]
         self.palette["label"] = (Screen.COLOUR_WHITE, label_original[1], label_original[2])
         self.log = ListBox(Widget.FILL_FRAME, [])
@@ -116,38 +194,96 @@ class MainMenu(Frame):
         layout.add_widget(menu_option, 0)
 
     def _toggle_recording(self):
-        self._model.toggle_recording()
-        self._set_status()
+        self._model.send_command(UICommand.toggle_recording)
 
     def _set_status(self):
-        tests_are_running = self._model.current_operation in [TestingStage.run_tests, TestingStage.run_one_test]
-        self.recording_status_text.value = f'{self._model.is_recording}'
-        self.events_recorded_text.value = f'{len(self._model.test_suite.recorded_events)}'
-        self.total_tests_text.value = f'{self._model.test_suite.total_tests}'
+        snapshot = self._model.snapshot
+        tests_are_running = snapshot.current_operation in [TestingStage.run_tests, TestingStage.run_one_test]
+        self.recording_status_text.value = f'{snapshot.is_recording}'
+        self.events_recorded_text.value = f'{snapshot.recorded_event_count}'
+        self.total_tests_text.value = f'{snapshot.total_tests}'
         self.running_tests_text.value = f'{tests_are_running}'
-        self.next_test_text.value = f'{self._model.next_test}'
-        self._model.update_log()
-        self.log.options = self._model.current_log
+        self.next_test_text.value = f'{snapshot.next_test}'
+        if self._rendered_log_version != snapshot.log_version:
+            self._rendered_log_version = snapshot.log_version
+            self.log.options = list(snapshot.log_lines[-self._log_window_size:])
 
     def _run_tests(self):
-        self._model.current_operation = TestingStage.run_tests
+        self._model.send_command(UICommand.run_tests)
 
     def _run_next_test(self):
-        self._model.current_operation = TestingStage.run_one_test
+        self._model.send_command(UICommand.run_one_test)
 
     def _quit(self):
-        self._model.current_operation = TestingStage.quit
+        self._model.send_command(UICommand.quit)
         raise StopApplication("QUIT")
 
     def _update_break_test(self):
-        self._model.break_at_test = self.break_at_test_text.value
+        self._model.send_command(UICommand.set_break_at_test, self.break_at_test_text.value)
 
     def _update(self, frame_no):
         self._set_status()
         super(MainMenu, self)._update(frame_no)
 
 
-def initialise(test_status):
+class ScreenRenderer(object):
+    def __init__(self, screen, test_status, max_fps=20):
+        self.screen = screen
+        self.test_status = test_status
+        self.frame_interval = 1.0 / max_fps
+        self._last_frame_time = None
+        self._last_fingerprint = None
+        self.current_time = time.monotonic
+
+    def update(self):
+        now = self.current_time()
+        if self._last_frame_time is not None and now - self._last_frame_time < self.frame_interval:
+            return False
+        self._last_frame_time = now
+        fingerprint = self.test_status.fingerprint()
+        # Asciimatics only redraws on input unless an update is forced, so only force one when the status changed
+        if fingerprint != self._last_fingerprint:
+            self._last_fingerprint = fingerprint
+            self.screen.force_update()
+        self.screen.draw_next_frame(repeat=True)
+        return True
+
+
+class InteractiveUI(object):
+    """
+    Draws the TestStatus of a suite until stop is called or the user quits. Asciimatics installs signal handlers when
+    the screen is opened, so the UI must be opened and run on the main thread, the suite runs its tests on another.
+    """
+
+    def __init__(self, test_status, max_fps=20):
+        self.test_status = test_status
+        self.max_fps = max_fps
+        self._stopped = threading.Event()
+        self._renderer = None
+
+    def open(self):
+        if threading.current_thread() is not threading.main_thread():
+            raise RuntimeError("The interactive UI can only be opened on the main thread")
+        if self._renderer is None:
+            self._renderer = initialise(self.test_status, self.max_fps)
+
+    def run(self):
+        self.open()
+        try:
+            while not self._stopped.is_set():
+                if not self._renderer.update():
+                    time.sleep(self._renderer.frame_interval / 2)
+        except StopApplication:
+            pass
+        finally:
+            self._renderer.screen.close()
+            self._renderer = None
+
+    def stop(self):
+        self._stopped.set()
+
+
+def initialise(test_status, max_fps=20):
     screen = Screen.open()
     scenes = [
         Scene([MainMenu(screen, test_status)], -1, name="Main"),
@@ -155,16 +291,4 @@ def initialise(test_status):
 
     screen.set_scenes(scenes)
 
-    test_status.current_operation = TestingStage.idle
-
-    return screen
-
-
-def update_screen(screen, test_status):
-    try:
-        screen.draw_next_frame(repeat=True)
-        screen.force_update()
-        if test_status.current_operation == TestingStage.quit:
-            screen.close()
-    except StopApplication as e:
-        screen.close()
+    return ScreenRenderer(screen, test_status, max_fps)
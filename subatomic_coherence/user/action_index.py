@@ -0,0 +1,94 @@
+from collections import OrderedDict
+
+
+class ActionIndex(object):
+    """
+    An index of the actions of a message's attachments, keyed by attachment id and action id. Ids are normalised with
+    action_id_key so that "1" and 1 find the same attachment. Block Kit elements are not indexed, their actions are
+    delivered to the app's request URL and can not be triggered through chat.attachmentAction.
+    """
+
+    def __init__(self, message):
+        self.attachment_actions = []
+        self.by_attachment = {}
+        self.by_action = {}
+
+        for attachment in message.get("attachments") or []:
+            actions = attachment.get("actions") or []
+            if len(actions) == 0:
+                continue
+            attachment_key = action_id_key(attachment.get("id"))
+            for action in actions:
+                entry = (len(self.attachment_actions), attachment, action)
+                self.attachment_actions.append(entry)
+                self.by_attachment.setdefault(attachment_key, []).append(entry)
+                self.by_action.setdefault((attachment_key, action_id_key(action.get("id"))), []).append(entry)
+
+    def has_actions(self):
+        return len(self.attachment_actions) > 0
+
+    def find_attachment_actions(self, attachment_ids=None, action_ids=None):
+        """
+        Returns the (attachment, action) pairs with one of the given attachment ids and action ids, in the order they
+        appear in the message. Empty or None ids match every attachment or action.
+        """
+        if attachment_ids and action_ids:
+            entries = [entry
+                       for attachment_id in attachment_ids
+                       for action_id in action_ids
+                       for entry in self.by_action.get((action_id_key(attachment_id), action_id_key(action_id)), [])]
+        elif attachment_ids:
+            entries = [entry
+                       for attachment_id in attachment_ids
+                       for entry in self.by_attachment.get(action_id_key(attachment_id), [])]
+        elif action_ids:
+            action_keys = set(action_id_key(action_id) for action_id in action_ids)
+            entries = [entry for entry in self.attachment_actions if action_id_key(entry[2].get("id")) in action_keys]
+        else:
+            entries = self.attachment_actions
+        return [(attachment, action) for _, attachment, action in sorted(entries, key=lambda entry: entry[0])]
+
+
+class _ActionIndexCache(object):
+    # Indexes are memoised by the identity of the event, the event is kept alongside its index so an id can never be
+    # reused by a different event while it is cached
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self.indexes = OrderedDict()
+
+    def get(self, event):
+        cached = self.indexes.get(id(event))
+        if cached is not None and cached[0] is event:
+            self.indexes.move_to_end(id(event))
+            return cached[1]
+        index = ActionIndex(get_main_message_body(event))
+        self.indexes[id(event)] = (event, index)
+        if len(self.indexes) > self.capacity:
+            self.indexes.popitem(last=False)
+        return index
+
+
+_action_index_cache = _ActionIndexCache()
+
+
+def action_index(event):
+    """
+    Returns the ActionIndex of a message event. Message events are indexed as they are loaded into an EventStore, so
+    this is normally a lookup, other events are indexed on first use.
+    """
+    return _action_index_cache.get(event)
+
+
+def action_id_key(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def get_main_message_body(event):
+    # Edited messages carry the message itself under "message"
+    message = event
+    if "subtype" in event and isinstance(event.get("message"), dict):
+        message = event["message"]
+    return message
@@ -0,0 +1,99 @@
+import logging
+import queue
+import threading
+import traceback
+import uuid
+from collections import deque
+
+from subatomic_coherence.logging.console_logging import ConsoleLogger
+
+
+class ChannelPool(object):
+    """
+    Hands each test its own freshly named channel. Channels are created once, before the tests start, and are recycled
+    instead of deleted when a test finishes: a background thread removes every member other than the owner and renames
+    the channel to a new unique name before returning it to the pool. The owner's Web API calls are serialised by its
+    SlackUser, so the recycle thread can share the owner with the suite thread. At the end of the suite the channels are
+    archived, and the next run unarchives and reuses them.
+    """
+
+    def __init__(self, owner_username, name_prefix="coherence", size=5):
+        self.owner_username = owner_username
+        self.name_prefix = name_prefix
+        self.size = size
+        self.channels = []
+        self.free_channels = deque()
+        self.leased_channels = {}
+        self.recycle_queue = queue.Queue()
+        self._recycle_thread = None
+
+    def prepare(self, slack_user_workspace):
+        owner = slack_user_workspace.find_user_client_by_username(self.owner_username)
+        for channel in slack_user_workspace.workspace_channels:
+            if len(self.channels) >= self.size:
+                break
+            if channel["name"].startswith(f"{self.name_prefix}-"):
+                if channel.get("is_archived", False) and not owner.unarchive_channel(channel["id"])[0]:
+                    continue
+                self.channels.append(channel)
+                self.recycle_queue.put(channel)
+
+        while len(self.channels) < self.size:
+            result, response = owner.create_channel(self._new_channel_name())
+            if not result:
+                break
+            slack_user_workspace.upsert_channel(response["channel"])
+            self.channels.append(response["channel"])
+            self.free_channels.append(response["channel"])
+
+        self._recycle_thread = threading.Thread(target=self._recycle_channels, args=(owner,),
+                                                name="coherence-channel-pool", daemon=True)
+        self._recycle_thread.start()
+
+    def acquire(self, lessee, slack_user_workspace):
+        try:
+            channel = self.free_channels.popleft()
+        except IndexError:
+            return None
+        # Renames happen on the recycle thread, the workspace is only updated here on the suite thread
+        slack_user_workspace.upsert_channel(channel)
+        self.leased_channels.setdefault(lessee, []).append(channel)
+        return channel
+
+    def release(self, lessee):
+        for channel in self.leased_channels.pop(lessee, []):
+            self.recycle_queue.put(channel)
+
+    def clean_up(self, slack_user_workspace):
+        if self._recycle_thread is not None:
+            self.recycle_queue.put(None)
+            self._recycle_thread.join()
+            self._recycle_thread = None
+        owner = slack_user_workspace.find_user_client_by_username(self.owner_username)
+        for channel in self.channels:
+            owner.archive_channel(channel["id"])
+
+    def _recycle_channels(self, owner):
+        while True:
+            channel = self.recycle_queue.get()
+            if channel is None:
+                return
+            # noinspection PyBroadException
+            try:
+                self.free_channels.append(self._recycle_channel(owner, channel))
+            except Exception:
+                ConsoleLogger.error(f"Failed to recycle channel {channel['id']}: {traceback.format_exc()}")
+
+    def _recycle_channel(self, owner, channel):
+        members = owner.query_channel_members(channel["id"]) or []
+        for member in members:
+            if member != owner.slack_id:
+                owner.kick_from_channel(member, channel["id"])
+        result, response = owner.rename_channel(channel["id"], self._new_channel_name())
+        if result:
+            channel = response["channel"]
+            logging.info("Recycled pooled channel %s as %s", channel["id"], channel["name"])
+        return channel
+
+    def _new_channel_name(self):
+        return f"{self.name_prefix}-{uuid.uuid4().hex[:8]}"
@@ -0,0 +1,128 @@
+import json
+import logging
+import random
+import threading
+import time
+from collections import Counter
+
+import requests
+
+
+class FaultProfile(object):
+    """
+    Describes how a degraded Slack behaves. Rates are probabilities between 0 and 1, delays are (minimum, maximum)
+    ranges in milliseconds from which each delay is drawn uniformly:
+
+    - api_delay: delay added to every Web API call
+    - ratelimit_rate: chance of a Web API call failing with a ratelimited error instead of being made
+    - retry_after: the Retry-After, in seconds, of the ratelimited errors
+    - rtm_delay: delay before an RTM event is delivered, events are held back rather than blocking the suite
+    - drop_rate: chance of an RTM event never being delivered
+    - duplicate_rate: chance of an RTM event being delivered twice
+    - methods: the Web API methods faults are injected into, all methods when None
+
+    The faults injected for each slack user are drawn from random generators seeded with the seed and the username,
+    one for Web API calls and one for RTM events, so a run with the same seed injects the same faults into the same
+    calls and events however the calls and reads interleave.
+    """
+
+    def __init__(self, seed=0, api_delay=(0, 0), ratelimit_rate=0.0, retry_after=1, rtm_delay=(0, 0), drop_rate=0.0,
+                 duplicate_rate=0.0, methods=None):
+        self.seed = seed
+        self.api_delay = api_delay
+        self.ratelimit_rate = ratelimit_rate
+        self.retry_after = retry_after
+        self.rtm_delay = rtm_delay
+        self.drop_rate = drop_rate
+        self.duplicate_rate = duplicate_rate
+        self.methods = None if methods is None else set(methods)
+
+
+class FaultInjectingClient(object):
+    """
+    Wraps a SlackClient, injecting the faults of a FaultProfile into its api_call and rtm_read, and into Web API calls
+    posted directly over HTTP with post. Everything else is passed through to the wrapped client. The number of
+    injected faults of each kind is kept in injected_faults.
+    """
+
+    def __init__(self, client, fault_profile, username=""):
+        self.client = client
+        self.fault_profile = fault_profile
+        self.injected_faults = Counter()
+        self._api_random = random.Random(f"{fault_profile.seed}:{username}:api")
+        self._rtm_random = random.Random(f"{fault_profile.seed}:{username}:rtm")
+        # Web API calls are also made from the clean up threads
+        self._lock = threading.Lock()
+        self._delayed_events = []
+
+    def api_call(self, method, *args, **kwargs):
+        if self._inject_api_faults(method):
+            return {"ok": False, "error": "ratelimited",
+                    "headers": {"Retry-After": str(self.fault_profile.retry_after)}}
+        return self.client.api_call(method, *args, **kwargs)
+
+    def post(self, method, url, **kwargs):
+        # Injected ratelimits are returned as the HTTP 429 response Slack sends for them
+        if self._inject_api_faults(method):
+            response = requests.Response()
+            response.status_code = 429
+            response.headers["Retry-After"] = str(self.fault_profile.retry_after)
+            response._content = json.dumps({"ok": False, "error": "ratelimited"}).encode()
+            return response
+        return requests.post(url, **kwargs)
+
+    def rtm_read(self):
+        fault_profile = self.fault_profile
+        now = time.monotonic()
+        with self._lock:
+            for event in self.client.rtm_read():
+                if self._rtm_random.random() < fault_profile.drop_rate:
+                    self.injected_faults["dropped"] += 1
+                    continue
+                copies = 1
+                if self._rtm_random.random() < fault_profile.duplicate_rate:
+                    self.injected_faults["duplicated"] += 1
+                    copies = 2
+                for copy in range(copies):
+                    delay = _draw_delay(self._rtm_random, fault_profile.rtm_delay)
+                    if delay > 0:
+                        self.injected_faults["rtm_delay"] += 1
+                    self._delayed_events.append((now + delay / 1000, len(self._delayed_events),
+                                                 event if copy == 0 else dict(event)))
+            # Events are delivered in the order of their delivery times, as a slow Slack can reorder them
+            self._delayed_events.sort(key=lambda entry: entry[:2])
+            ready_count = 0
+            while ready_count < len(self._delayed_events) and self._delayed_events[ready_count][0] <= now:
+                ready_count += 1
+            ready_events = [event for _, _, event in self._delayed_events[:ready_count]]
+            self._delayed_events = [(delivery_time, index, event) for index, (delivery_time, _, event)
+                                    in enumerate(self._delayed_events[ready_count:])]
+        return ready_events
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def _inject_api_faults(self, method):
+        # Delays the call and returns whether it should fail with a ratelimited error
+        fault_profile = self.fault_profile
+        if fault_profile.methods is not None and method not in fault_profile.methods:
+            return False
+        with self._lock:
+            ratelimited = self._api_random.random() < fault_profile.ratelimit_rate
+            delay = _draw_delay(self._api_random, fault_profile.api_delay)
+            if ratelimited:
+                self.injected_faults["ratelimited"] += 1
+            if delay > 0:
+                self.injected_faults["api_delay"] += 1
+        if delay > 0:
+            time.sleep(delay / 1000)
+        if ratelimited:
+            logging.debug("Injected ratelimited error into %s", method)
+        return ratelimited
+
+
+def _draw_delay(generator, delay_range):
+    minimum, maximum = delay_range
+    if maximum <= 0:
+        return 0
+    return generator.uniform(minimum, maximum)
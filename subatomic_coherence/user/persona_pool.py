@@ -0,0 +1,35 @@
+class PersonaPool(object):
+    def __init__(self):
+        self.personas = {}
+        self.leases = {}
+        self.leases_by_lessee = {}
+
+    def add_persona(self, username, role):
+        if role not in self.personas:
+            self.personas[role] = []
+        if username not in self.personas[role]:
+            self.personas[role].append(username)
+
+    def roles(self):
+        return list(self.personas.keys())
+
+    def available(self, role):
+        return [username for username in self.personas.get(role, []) if username not in self.leases]
+
+    def lease(self, role, count, lessee):
+        # Leases are all or nothing so that two tests waiting on the same role can never deadlock on half a lease
+        available_personas = self.available(role)
+        if len(available_personas) < count:
+            return None
+        leased_personas = available_personas[:count]
+        for username in leased_personas:
+            self.leases[username] = lessee
+        self.leases_by_lessee.setdefault(lessee, []).extend(leased_personas)
+        return leased_personas
+
+    def leased_by(self, lessee):
+        return list(self.leases_by_lessee.get(lessee, []))
+
+    def release(self, lessee):
+        for username in self.leases_by_lessee.pop(lessee, []):
+            del self.leases[username]
@@ -1,17 +1,26 @@
 import json
 import logging
+import threading
 from time import sleep, time
 
 import requests
 from slackclient import SlackClient
 
-from subatomic_coherence.logging.console_logging import ConsoleLogger
+from subatomic_coherence.logging.console_logging import ConsoleLogger, LazyCall
+from subatomic_coherence.profiling.profiling import profiled
+from subatomic_coherence.user.action_index import action_index
+from subatomic_coherence.user.fault_injection import FaultInjectingClient
 
 
 class SlackUser(object):
-    def __init__(self, username, slack_token, connect_timeout=None):
+    def __init__(self, username, slack_token, connect_timeout=None, fault_profile=None, ratelimit_retries=0):
         self.username = username
         self.client = SlackClient(slack_token)
+        if fault_profile is not None:
+            self.client = FaultInjectingClient(self.client, fault_profile, username)
+        self.ratelimit_retries = ratelimit_retries
+        # The client is shared by the suite thread, the clean up workers and the channel pool's recycle thread
+        self._client_lock = threading.Lock()
         self.token = slack_token
         if connect_timeout is not None:
             connect_timeout = connect_timeout / 1000.0
@@ -21,13 +30,39 @@ class SlackUser(object):
         self.events = EventStore()
         self.domain = ""
         self.rate_limiters = {
-            self.delete_channel.__name__: RateLimiter(1, 10000)
+            self.delete_channel.__name__: RateLimiter(1, 10000),
+            self.create_channel.__name__: RateLimiter(20, 60000),
+            self.rename_channel.__name__: RateLimiter(20, 60000),
+            self.archive_channel.__name__: RateLimiter(20, 60000),
+            self.unarchive_channel.__name__: RateLimiter(20, 60000),
+            self.kick_from_channel.__name__: RateLimiter(50, 60000),
+            self.kick_from_group.__name__: RateLimiter(50, 60000)
         }
 
     def connect(self):
         connection_result = self.client.rtm_connect(timeout=self.connect_timeout)
         return connection_result
 
+    def api_call(self, method, *args, **kwargs):
+        return self._call_web_api(method, self.client.api_call, method, *args, **kwargs)
+
+    def _call_web_api(self, method, call, *args, **kwargs):
+        # Calls rejected by Slack's rate limits are retried after the Retry-After given by Slack, or after a second.
+        # The retries sleep on the calling thread, so they are off unless ratelimit_retries is given
+        for attempt in range(self.ratelimit_retries + 1):
+            with self._client_lock, profiled("api_call", method):
+                response = call(*args, **kwargs)
+            if not _is_ratelimited(response) or attempt == self.ratelimit_retries:
+                return response
+            retry_after = _retry_after(response)
+            logging.warning("User %s was rate limited calling %s, retrying in %s seconds", self.username, method,
+                            retry_after, extra={"slack_user": self.username})
+            sleep(retry_after)
+
+    def rtm_read(self):
+        with profiled("rtm_read", self.username):
+            return self.client.rtm_read()
+
     def link_user_details(self, user_detail_list):
         return self._get_user_identity(user_detail_list)
 
@@ -37,15 +72,17 @@ class SlackUser(object):
         keyword_args["text"] = message
         keyword_args["as_user"] = True
         keyword_args["link_names"] = 1
-        self.client.api_call(
+        response = self.api_call(
             "chat.postMessage",
             None,
             **keyword_args
         )
-        logging.info(f"User {self.username} sent message to {destination}. Content: {message}")
+        logging.info("User %s sent message to %s. Content: %s", self.username, destination, message,
+                     extra={"slack_user": self.username, "slack_channel": destination})
+        return response
 
     def invite_to_channel(self, user_id, channel_id):
-        response = self.client.api_call(
+        response = self.api_call(
             "channels.invite",
             user=user_id,
             channel=channel_id
@@ -55,11 +92,11 @@ class SlackUser(object):
             ConsoleLogger.error(
                 f"Failed to invite user {user_id} to channel {channel_id} as user {self.username}:{self.slack_id}")
         else:
-            logging.info(f"User {user_id} invited to channel {channel_id}")
+            logging.info("User %s invited to channel %s", user_id, channel_id)
         return result
 
     def invite_to_group(self, user_id, group_id):
-        response = self.client.api_call(
+        response = self.api_call(
             "groups.invite",
             user=user_id,
             channel=group_id
@@ -69,11 +106,13 @@ class SlackUser(object):
             ConsoleLogger.error(
                 f"Failed to invite user {user_id} to group {group_id} as user {self.username}:{self.slack_id}")
         else:
-            logging.info(f"User {user_id} invited to group {group_id}")
+            logging.info("User %s invited to group %s", user_id, group_id)
         return result, response
 
     def kick_from_channel(self, user_id, channel_id):
-        response = self.client.api_call(
+        self.rate_limiters[self.kick_from_channel.__name__].acquire()
+
+        response = self.api_call(
             "channels.kick",
             user=user_id,
             channel=channel_id
@@ -83,11 +122,13 @@ class SlackUser(object):
             ConsoleLogger.error(
                 f"Failed to kick user {user_id} from channel {channel_id} as user {self.username}:{self.slack_id}")
         else:
-            logging.info(f"User {user_id} kicked from channel {channel_id}")
+            logging.info("User %s kicked from channel %s", user_id, channel_id)
         return result, response
 
     def kick_from_group(self, user_id, group_id):
-        response = self.client.api_call(
+        self.rate_limiters[self.kick_from_group.__name__].acquire()
+
+        response = self.api_call(
             "groups.kick",
             user=user_id,
             channel=group_id
@@ -97,30 +138,93 @@ class SlackUser(object):
             ConsoleLogger.error(
                 f"Failed to kick user {user_id} from group {group_id} as user {self.username}:{self.slack_id}")
         else:
-            logging.info(f"User {user_id} kicked from group {group_id}")
+            logging.info("User %s kicked from group %s", user_id, group_id)
         return result, response
 
     def delete_channel(self, channel_id):
-        rate_limiter = self.rate_limiters[self.delete_channel.__name__]
-
-        wait_time = rate_limiter.wait_time() / 1000
-        if wait_time > 0:
-            sleep(wait_time)
+        self.rate_limiters[self.delete_channel.__name__].acquire()
 
-        response = self.client.api_call(
+        response = self.api_call(
             "channels.delete",
             channel=channel_id
         )
 
-        rate_limiter.log_call()
-
         result = response["ok"]
         if result is True:
-            logging.info(f"Channel {channel_id} deleted successfully.")
+            logging.info("Channel %s deleted successfully.", channel_id)
         else:
             ConsoleLogger.error(f"Channel {channel_id} delete command failed as user {self.username}:{self.slack_id}")
         return result, response
 
+    def create_channel(self, channel_name):
+        self.rate_limiters[self.create_channel.__name__].acquire()
+
+        response = self.api_call(
+            "channels.create",
+            name=channel_name
+        )
+
+        result = response["ok"]
+        if result is True:
+            logging.info("Channel %s created successfully.", channel_name)
+        else:
+            ConsoleLogger.error(f"Channel {channel_name} create command failed as user {self.username}:{self.slack_id}")
+        return result, response
+
+    def rename_channel(self, channel_id, channel_name):
+        self.rate_limiters[self.rename_channel.__name__].acquire()
+
+        response = self.api_call(
+            "channels.rename",
+            channel=channel_id,
+            name=channel_name
+        )
+
+        result = response["ok"]
+        if result is True:
+            logging.info("Channel %s renamed to %s.", channel_id, channel_name)
+        else:
+            ConsoleLogger.error(f"Channel {channel_id} rename command failed as user {self.username}:{self.slack_id}")
+        return result, response
+
+    def archive_channel(self, channel_id):
+        self.rate_limiters[self.archive_channel.__name__].acquire()
+
+        response = self.api_call(
+            "channels.archive",
+            channel=channel_id
+        )
+
+        result = response["ok"]
+        if result is True:
+            logging.info("Channel %s archived successfully.", channel_id)
+        else:
+            ConsoleLogger.error(f"Channel {channel_id} archive command failed as user {self.username}:{self.slack_id}")
+        return result, response
+
+    def unarchive_channel(self, channel_id):
+        self.rate_limiters[self.unarchive_channel.__name__].acquire()
+
+        response = self.api_call(
+            "channels.unarchive",
+            channel=channel_id
+        )
+
+        result = response["ok"]
+        if result is True:
+            logging.info("Channel %s unarchived successfully.", channel_id)
+        else:
+            ConsoleLogger.error(f"Channel {channel_id} unarchive command failed as user "
+                                f"{self.username}:{self.slack_id}")
+        return result, response
+
+    def query_channel_members(self, channel_id):
+        members = None
+        result = self.api_call("channels.info", channel=channel_id)
+        if result["ok"]:
+            members = result["channel"].get("members", [])
+        return members
+
     def attachment_action(self, service_id, bot_user_id, actions, attachment_id, callback_id, channel_id, message_ts):
         payload = {
             "actions": actions,
@@ -137,12 +241,18 @@ class SlackUser(object):
         }
 
         request_url = f"https://{self.domain}.slack.com/api/chat.attachmentAction"
-        response = requests.post(request_url, files=files)
+        response = self._call_web_api("chat.attachmentAction", self._post, "chat.attachmentAction", request_url,
+                                      files=files)
         if response.status_code == 200:
             return True, response
         else:
             return False, response
 
+    def _post(self, method, url, **kwargs):
+        if isinstance(self.client, FaultInjectingClient):
+            return self.client.post(method, url, **kwargs)
+        return requests.post(url, **kwargs)
+
     def load_events(self, events):
         if type(events) in [list, tuple]:
             for event in events:
@@ -155,7 +265,7 @@ class SlackUser(object):
 
     def query_workspace_domain(self):
         domain = None
-        result = self.client.api_call("team.info")
+        result = self.api_call("team.info")
         if result["ok"]:
             domain = result["team"]["domain"]
             self.domain = domain
@@ -165,10 +275,10 @@ class SlackUser(object):
     def query_workspace_user_details(self, cursor=None):
         user_list = []
         if cursor is not None:
-            result = self.client.api_call("users.list", cursor=cursor)
+            result = self.api_call("users.list", cursor=cursor)
         else:
-            result = self.client.api_call("users.list")
-        logging.debug("Got user list {user_list}".format(user_list=result))
+            result = self.api_call("users.list")
+        logging.debug("Got user list %s", result)
         if result["ok"]:
             user_list += result["members"]
         if "response_metadata" in result and "next_cursor" in result["response_metadata"]:
@@ -179,10 +289,10 @@ class SlackUser(object):
     def query_workspace_channels(self, cursor=None):
         channels_list = []
         if cursor is not None:
-            result = self.client.api_call("channels.list", cursor=cursor)
+            result = self.api_call("channels.list", cursor=cursor)
         else:
-            result = self.client.api_call("channels.list")
-        logging.debug("Got channel list {channels_list}".format(channels_list=result))
+            result = self.api_call("channels.list")
+        logging.debug("Got channel list %s", result)
         if result["ok"]:
             channels_list += result["channels"]
         if "response_metadata" in result and "next_cursor" in result["response_metadata"]:
@@ -192,8 +302,8 @@ class SlackUser(object):
 
     def query_workspace_groups(self):
         groups_list = []
-        result = self.client.api_call("groups.list")
-        logging.debug("Got group list {groups_list}".format(groups_list=result))
+        result = self.api_call("groups.list")
+        logging.debug("Got group list %s", result)
         if result["ok"]:
             groups_list += result["groups"]
 
@@ -203,21 +313,54 @@ class SlackUser(object):
         for user in workspace_user_details:
             if user["name"] == self.username:
                 self.slack_id = user["id"]
-                logging.info("Associated slack id {slack_id} to username {username}".format(
-                    slack_id=self.slack_id, username=self.username))
+                logging.info("Associated slack id %s to username %s", self.slack_id, self.username,
+                             extra={"slack_user": self.username, "slack_id": self.slack_id})
                 return True
-        logging.error("No associated slack user details found for user {username}."
-                      " List of available users:\n{userlist}"
-                      .format(username=self.username, userlist=workspace_user_details))
+        logging.error("No associated slack user details found for user %s. List of available usernames:\n%s",
+                      self.username, LazyCall(_join_usernames, workspace_user_details),
+                      extra={"slack_user": self.username})
         return False
 
 
+def _is_ratelimited(response):
+    if not isinstance(response, dict):
+        # Calls posted over HTTP directly see the HTTP 429 response
+        return getattr(response, "status_code", None) == 429
+    return response.get("ok") is False and response.get("error") == "ratelimited"
+
+
+def _retry_after(response):
+    headers = response.get("headers", {}) if isinstance(response, dict) else response.headers
+    try:
+        return float(headers.get("Retry-After", 1))
+    except (TypeError, ValueError):
+        return 1
+
+
+def _join_usernames(workspace_user_details):
+    return ", ".join(str(user.get("name")) for user in workspace_user_details)
+
+
+ANY_THREAD = object()
+
+
 class RateLimiter(object):
     def __init__(self, count, time_period):
         self.count = count
         self.time_period = time_period
         self.calls = []
         self.current_milli_time = lambda: int(round(time() * 1000))
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        # Reserves a call slot, sleeping outside of the lock so that other threads can check their own slots
+        while True:
+            with self.lock:
+                wait_time = self.wait_time()
+                if wait_time <= 0:
+                    self.log_call()
+                    return
+            sleep(wait_time / 1000)
 
     def can_call(self):
         self.prune()
@@ -225,8 +368,8 @@ class RateLimiter(object):
 
     def wait_time(self):
         self.prune()
-        if len(self.calls) > 0:
-            return self.time_period - (self.current_milli_time() - self.calls[0])
+        if len(self.calls) >= self.count:
+            return self.time_period - (self.current_milli_time() - self.calls[-self.count])
         return 0
 
     def prune(self):
@@ -241,20 +384,59 @@ class RateLimiter(object):
 
 
 class EventStore:
+    __slots__ = ("events", "last_processed_event", "next_event_index", "message_index", "action_message_index")
+
     def __init__(self):
         self.events = []
         self.last_processed_event = None
         self.next_event_index = 0
+        self.message_index = {}
+        self.action_message_index = {}
 
     def load_event(self, event):
         self.events.append(event)
+        if event.get("type") == "message":
+            self._index_message(event)
+
+    def find_messages(self, user_id, channel_id=None, thread_ts=None, is_thread=False):
+        thread_key = thread_ts
+        if thread_key is None and is_thread:
+            thread_key = ANY_THREAD
+        return self.message_index.get((user_id, channel_id, thread_key), [])
+
+    def find_action_messages(self, user_id, channel_id=None):
+        return self.action_message_index.get((user_id, channel_id), [])
 
     def clear_event_store(self):
         self.events = []
         self.next_event_index = 0
         self.last_processed_event = None
+        self.message_index = {}
+        self.action_message_index = {}
+
+    def _index_message(self, event):
+        # Messages are indexed under every combination of the channel and thread filters expect_message_from_user can
+        # ask for, with None meaning any channel or no thread, so each lookup is a single dictionary access.
+        message = event
+        if "subtype" in event and "message" in event:
+            message = event["message"]
+        user_id = message.get("user")
+        if user_id is None:
+            return
+        channel_id = event.get("channel", message.get("channel"))
+        channel_keys = (None,) if channel_id is None else (None, channel_id)
+        thread_ts = event.get("thread_ts")
+        thread_keys = (None,) if thread_ts is None else (None, thread_ts, ANY_THREAD)
+        for channel_key in channel_keys:
+            for thread_key in thread_keys:
+                self.message_index.setdefault((user_id, channel_key, thread_key), []).append(event)
+        if "attachments" in message and action_index(event).has_actions():
+            for channel_key in channel_keys:
+                self.action_message_index.setdefault((user_id, channel_key), []).append(event)
 
     def __iter__(self):
+        # Each iteration starts from the first event so that concurrently running tests can all read the same store
+        self.next_event_index = 0
         return self
 
     def __next__(self):
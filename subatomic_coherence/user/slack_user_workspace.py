@@ -1,30 +1,76 @@
+from subatomic_coherence.user.persona_pool import PersonaPool
+
+
 class SlackUserWorkspace(object):
+    """
+    The directory of users, channels and private groups in the workspace along with the connected SlackUser clients.
+    The directory is queried once when the suite connects and kept current from then on by apply_event, which applies
+    the changes described by RTM events such as team_join, user_change, channel_rename and group_joined. Entries are
+    indexed by id and by name.
+    """
+
     def __init__(self):
         self.slack_user_clients = []
-        self.workspace_user_details = []
-        self.workspace_channels = []
-        self.workspace_groups = []
+        self.users = WorkspaceDirectory()
+        self.channels = WorkspaceDirectory()
+        self.groups = WorkspaceDirectory()
+        self.persona_pool = PersonaPool()
+        self.channel_pool = None
+        self.active_test = None
+
+    @property
+    def workspace_user_details(self):
+        return self.users.entries
+
+    @workspace_user_details.setter
+    def workspace_user_details(self, workspace_user_details):
+        # Assigning a new list rebuilds the directory's indexes, as the set_ methods do
+        self.users.set_entries(workspace_user_details)
+
+    @property
+    def workspace_channels(self):
+        return self.channels.entries
+
+    @workspace_channels.setter
+    def workspace_channels(self, workspace_channels):
+        self.channels.set_entries(workspace_channels)
+
+    @property
+    def workspace_groups(self):
+        return self.groups.entries
+
+    @workspace_groups.setter
+    def workspace_groups(self, workspace_groups):
+        self.groups.set_entries(workspace_groups)
+
+    def snapshot(self):
+        """
+        Returns a copy of the workspace for use on another thread while this workspace keeps being updated. The
+        directories of users, channels and groups are copied, the SlackUser clients and the pools are shared.
+        """
+        snapshot = SlackUserWorkspace()
+        snapshot.slack_user_clients = list(self.slack_user_clients)
+        snapshot.users = self.users.copy()
+        snapshot.channels = self.channels.copy()
+        snapshot.groups = self.groups.copy()
+        snapshot.persona_pool = self.persona_pool
+        snapshot.channel_pool = self.channel_pool
+        return snapshot
 
     def set_workspace_user_details(self, workspace_user_details):
-        self.workspace_user_details = workspace_user_details
+        self.users.set_entries(workspace_user_details)
 
     def set_workspace_channels(self, workspace_channels):
-        self.workspace_channels = workspace_channels
+        self.channels.set_entries(workspace_channels)
 
     def set_workspace_groups(self, workspace_groups):
-        self.workspace_groups = workspace_groups
+        self.groups.set_entries(workspace_groups)
 
     def find_user_by_username(self, username):
-        for user in self.workspace_user_details:
-            if user["name"] == username:
-                return user
-        return None
+        return self.users.find_by_name(username)
 
     def find_user_by_slack_id(self, slack_id):
-        for user in self.workspace_user_details:
-            if user["id"] == slack_id:
-                return user
-        return None
+        return self.users.find_by_id(slack_id)
 
     def find_user_client_by_username(self, username):
         for user in self.slack_user_clients:
@@ -38,32 +84,31 @@ class SlackUserWorkspace(object):
                 return user
         return None
 
-    def add_slack_user_client(self, new_user):
+    def add_slack_user_client(self, new_user, roles=None):
         self.slack_user_clients.append(new_user)
+        for role in roles or []:
+            self.persona_pool.add_persona(new_user.username, role)
+
+    def upsert_user(self, user):
+        return self.users.upsert(user)
+
+    def upsert_channel(self, channel):
+        return self.channels.upsert(channel)
+
+    def upsert_group(self, group):
+        return self.groups.upsert(group)
 
     def find_channel_by_name(self, channel_name):
-        for channel in self.workspace_channels:
-            if channel["name"] == channel_name:
-                return channel
-        return None
+        return self.channels.find_by_name(channel_name)
 
     def find_channel_by_slack_id(self, slack_id):
-        for channel in self.workspace_channels:
-            if channel["id"] == slack_id:
-                return channel
-        return None
+        return self.channels.find_by_id(slack_id)
 
     def find_group_by_name(self, group_name):
-        for group in self.workspace_groups:
-            if group["name"] == group_name:
-                return group
-        return None
+        return self.groups.find_by_name(group_name)
 
     def find_group_by_slack_id(self, slack_id):
-        for group in self.workspace_groups:
-            if group["id"] == slack_id:
-                return group
-        return None
+        return self.groups.find_by_id(slack_id)
 
     def find_group_or_channel_by_name(self, name):
         result = self.find_channel_by_name(name)
@@ -82,4 +127,101 @@ class SlackUserWorkspace(object):
             user_last_event = user.events.last_processed_event
             if user_last_event is not None:
                 return user_last_event
-        return None
\ No newline at end of file
+        return None
+
+    def apply_event(self, event):
+        """
+        Updates the directory from an RTM event. Events that do not describe a change to the directory are ignored.
+        Every connected user receives most of these events, so applying the same event more than once has no effect.
+        """
+        event_type = event.get("type")
+        if event_type in ("team_join", "user_change"):
+            self.upsert_user(event["user"])
+        elif event_type in ("channel_created", "channel_joined"):
+            self.upsert_channel(event["channel"])
+        elif event_type in ("group_joined", "group_created"):
+            self.upsert_group(event["channel"])
+        elif event_type in ("channel_rename", "group_rename"):
+            self._upsert_conversation(event["channel"], event_type == "group_rename")
+        elif event_type in ("channel_archive", "group_archive"):
+            self._upsert_conversation({"id": event["channel"], "is_archived": True}, event_type == "group_archive")
+        elif event_type in ("channel_unarchive", "group_unarchive"):
+            self._upsert_conversation({"id": event["channel"], "is_archived": False}, event_type == "group_unarchive")
+        elif event_type in ("channel_deleted", "group_deleted"):
+            self.channels.remove(event["channel"])
+            self.groups.remove(event["channel"])
+
+    def _upsert_conversation(self, conversation, is_group):
+        # Private channels are reported with either channel_ or group_ events depending on the client, so changes go to
+        # whichever directory already holds the conversation
+        if self.groups.find_by_id(conversation["id"]) is not None:
+            self.groups.upsert(conversation)
+        elif self.channels.find_by_id(conversation["id"]) is not None or not is_group:
+            self.channels.upsert(conversation)
+        else:
+            self.groups.upsert(conversation)
+
+
+class WorkspaceDirectory(object):
+    """
+    A list of users, channels or groups indexed by id and by name. Where names are duplicated the first entry is found,
+    as with a search of the list. Upserting an existing entry updates it in place, so references to it stay current.
+    """
+
+    def __init__(self):
+        self.entries = []
+        self.by_id = {}
+        self.by_name = {}
+
+    def set_entries(self, entries):
+        self.entries = entries
+        self.by_id = {}
+        self.by_name = {}
+        for entry in entries:
+            self._index(entry)
+
+    def copy(self):
+        # Entries are copied too, as upserts update them in place
+        directory = WorkspaceDirectory()
+        directory.set_entries([dict(entry) for entry in self.entries])
+        return directory
+
+    def find_by_id(self, entry_id):
+        return self.by_id.get(entry_id)
+
+    def find_by_name(self, name):
+        return self.by_name.get(name)
+
+    def upsert(self, entry):
+        existing_entry = self.by_id.get(entry.get("id"))
+        if existing_entry is None:
+            self.entries.append(entry)
+            self._index(entry)
+            return entry
+        if existing_entry is not entry:
+            self._remove_name(existing_entry)
+            existing_entry.update(entry)
+            self._index(existing_entry)
+        return existing_entry
+
+    def remove(self, entry_id):
+        existing_entry = self.by_id.pop(entry_id, None)
+        if existing_entry is not None:
+            self.entries.remove(existing_entry)
+            self._remove_name(existing_entry)
+
+    def _index(self, entry):
+        if entry.get("id") is not None:
+            self.by_id.setdefault(entry["id"], entry)
+        if entry.get("name") is not None:
+            self.by_name.setdefault(entry["name"], entry)
+
+    def _remove_name(self, entry):
+        name = entry.get("name")
+        if self.by_name.get(name) is entry:
+            del self.by_name[name]
+            # Fall back to any other entry sharing the name
+            for other_entry in self.entries:
+                if other_entry is not entry and other_entry.get("name") == name:
+                    self.by_name[name] = other_entry
+                    break
@@ -1,8 +1,8 @@
 from unittest.mock import MagicMock
 
 from subatomic_coherence.actions.event_actions import WildCardEventPattern, SimpleEventPattern, EventPatternGroup, \
-    EventPatternContext, EventVerifier, expect_event, ComplexEventPattern
-from subatomic_coherence.testing.test import ResultCode
+    EventPatternContext, EventVerifier, expect_event, ComplexEventPattern, verify_batch
+from subatomic_coherence.testing.test import ResultCode, TestPortal, TestResult
 from subatomic_coherence.user.slack_user import SlackUser
 from subatomic_coherence.user.slack_user_workspace import SlackUserWorkspace
 
@@ -550,6 +550,23 @@ def test_expect_event_with_simple_event_expect_values_success_and_values_stored(
     assert store["store"] == "some text"
 
 
+def test_expect_event_in_test_expect_accepted_event_in_call_stack_message():
+    user = SlackUser("user", "token")
+    slack_user_workspace = SlackUserWorkspace()
+    slack_user_workspace.slack_user_clients.append(user)
+    slack_user_workspace.find_user_client_by_username = MagicMock(return_value=user)
+    user.load_events([{"type": "not_a_message"}, {"type": "reaction_added", "reaction": "thumbsup"}])
+    test = TestPortal().then(expect_event("user", {"type": "reaction_added"})) \
+        .then(lambda slack_user_workspace, data_store: TestResult(ResultCode.success))
+    test.name = "test"
+    for _ in range(3):
+        result = test.test(slack_user_workspace)
+    assert result.result_code == ResultCode.success
+    assert user.events.last_processed_event == {"type": "reaction_added", "reaction": "thumbsup"}
+    assert '.then(expect_event_function) - {"type": "reaction_added", "reaction": "thumbsup"}' in \
+        result.call_stack
+
+
 def test_complex_event_pattern_expect_success():
     verifier = EventVerifier({
         "name": SimpleEventPattern("Kieran"),
@@ -621,3 +638,52 @@ def test_complex_event_pattern_expect_failure():
     })
 
     assert not result
+
+
+def test_event_verifier_expect_literal_fields_found():
+    verifier = EventVerifier({
+        "type": "message",
+        "channel": "{{channel,C1}}",
+        "user": "{{user,*}}",
+        "text": SimpleEventPattern("hello"),
+        "grouped": SimpleEventPattern("1", group_id=1),
+        "list": ["1"]
+    })
+
+    assert verifier.literal_fields == [("type", "message"), ("channel", "C1"), ("text", "hello")]
+
+
+def test_event_verifier_verify_batch_expect_matches_in_order_with_stored_values():
+    verifier = EventVerifier({
+        "type": "message",
+        "text": "{{text,*}}"
+    })
+    events = [
+        {"type": "message", "text": "1"},
+        {"type": "user_typing"},
+        "not an event",
+        {"type": {"nested": "message"}},
+        {"type": "message", "text": "2"},
+        {"type": "message"}
+    ]
+
+    matches = verifier.verify_batch(events)
+
+    assert matches == [(events[0], {"text": "1"}), (events[4], {"text": "2"})]
+    assert verifier.verify_batch(events, limit=1) == [(events[0], {"text": "1"})]
+
+
+def test_verify_batch_expect_each_verifier_matched():
+    events = [
+        {"type": "message", "channel": "C1"},
+        {"type": "message", "channel": "C2"},
+        {"type": "reaction_added", "channel": "C1"}
+    ]
+
+    matches = verify_batch(events, [
+        EventVerifier({"type": "message", "channel": "C2"}),
+        EventVerifier({"channel": "C1"}),
+        EventVerifier({"type": "channel_created"})
+    ])
+
+    assert matches == [[(events[1], {})], [(events[0], {}), (events[2], {})], []]
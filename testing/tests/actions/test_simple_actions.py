@@ -2,7 +2,8 @@ from unittest import mock
 from unittest.mock import MagicMock
 
 import subatomic_coherence.actions.simple_actions as SimpleActions
-from subatomic_coherence.testing.test import ResultCode
+from subatomic_coherence.actions import text_matchers
+from subatomic_coherence.testing.test import ResultCode, RESPONSE_TIMES
 from subatomic_coherence.user.slack_user import SlackUser
 from subatomic_coherence.user.slack_user_workspace import SlackUserWorkspace
 from testing.mocking.mocking import MockRequestsResponse
@@ -118,6 +119,45 @@ def test_expect_message_with_simple_message_from_channel_expect_event_returned()
     assert result == expected_event
 
 
+def test_expect_message_with_message_from_other_channel_expect_none():
+    user = SlackUser("user", "token")
+    user.load_events([
+        {
+            "type": "message",
+            "user": "U2222222",
+            "text": "some text",
+            "channel": "G111112"
+        }
+    ])
+
+    result = SimpleActions._expect_message(user, "U2222222", channel_id="G111111")
+    assert result is None
+
+
+def test_expect_message_thread_message_in_channel_expect_event_marked_processed():
+    user = SlackUser("user", "token")
+    expected_event = {
+        "type": "message",
+        "user": "U2222222",
+        "text": "some text",
+        "channel": "G111111",
+        "thread_ts": "1000"
+    }
+    user.load_events([
+        {
+            "type": "message",
+            "user": "U2222222",
+            "text": "some text",
+            "channel": "G111111"
+        },
+        expected_event
+    ])
+
+    result = SimpleActions._expect_message(user, "U2222222", channel_id="G111111", thread_ts="1000", is_thread=True)
+    assert result == expected_event
+    assert user.events.last_processed_event == expected_event
+
+
 def test_expect_message_with_matching_text_from_user_ignore_case_expect_event_returned():
     user = SlackUser("user", "token")
     expected_event = {
@@ -173,6 +213,11 @@ def test_try_compare_message_text_case_sensitive_expect_failure():
     assert result is False
 
 
+def test_try_compare_message_text_with_text_matcher_expect_matcher_used():
+    result = SimpleActions._try_compare_message_text("Build 12 passed", text_matchers.regex(r"build \d+", True))
+    assert result is True
+
+
 def test_try_get_channel_id_expect_success():
     slack_user_workspace = SlackUserWorkspace()
     slack_user_workspace.find_group_or_channel_by_name = MagicMock(return_value={"id": "G123456"})
@@ -220,6 +265,73 @@ def test_send_message_to_channel_simple_expect_success():
     assert result.result_code == ResultCode.success
 
 
+def test_send_message_to_channel_with_ts_name_expect_sent_ts_stored():
+    send_message_function = SimpleActions.send_message_to_channel("user1", "channel1", "hello", ts_name="sent")
+    user1 = SlackUser("user1", "token")
+    slack_user_workspace = SlackUserWorkspace()
+    slack_user_workspace.find_user_client_by_username = MagicMock(return_value=user1)
+    slack_user_workspace.find_channel_by_name = MagicMock(return_value={"id": "G123456"})
+    user1.client.api_call = MagicMock(return_value={"ok": True, "ts": "1000.000100"})
+    data_store = {}
+    result = send_message_function(slack_user_workspace, data_store)
+    assert result.result_code == ResultCode.success
+    assert data_store == {"sent": "1000.000100"}
+
+
+def test_send_message_to_user_with_ts_name_and_failed_send_expect_failure():
+    send_message_function = SimpleActions.send_message_to_user("user1", "user2", "hello", ts_name="sent")
+    user1 = SlackUser("user1", "token")
+    slack_user_workspace = SlackUserWorkspace()
+    slack_user_workspace.find_user_client_by_username = MagicMock(return_value=user1)
+    slack_user_workspace.find_user_by_username = MagicMock(return_value={"id": "U222222"})
+    user1.client.api_call = MagicMock(return_value={"ok": False, "error": "channel_not_found"})
+    result = send_message_function(slack_user_workspace, {})
+    assert result.result_code == ResultCode.failure
+
+
+def _response_time_workspace(events):
+    user1 = SlackUser("user1", "token")
+    user1.load_events(events)
+    slack_user_workspace = SlackUserWorkspace()
+    slack_user_workspace.find_user_client_by_username = MagicMock(return_value=user1)
+    slack_user_workspace.find_user_by_username = MagicMock(return_value={"id": "U2222222"})
+    return slack_user_workspace
+
+
+def test_expect_message_within_expect_response_time_stored_and_earlier_messages_ignored():
+    slack_user_workspace = _response_time_workspace([
+        {"type": "message", "user": "U2222222", "channel": "D1", "text": "deployed", "ts": "999.000000"},
+        {"type": "message", "user": "U2222222", "channel": "D1", "text": "deployed", "ts": "1000.250000"}
+    ])
+    expect_function = SimpleActions.expect_message_within("bot", "user1", "sent", 800, message_text="deployed")
+    data_store = {"sent": "1000.000000"}
+    result = expect_function(slack_user_workspace, data_store)
+    assert result.result_code == ResultCode.success
+    assert data_store["sent_response_time"] == 250
+    assert data_store[RESPONSE_TIMES] == {"sent_response_time": 250}
+
+
+def test_expect_message_within_slow_response_expect_failure():
+    slack_user_workspace = _response_time_workspace([
+        {"type": "message", "user": "U2222222", "channel": "D1", "text": "deployed", "ts": "1001.500000"}
+    ])
+    expect_function = SimpleActions.expect_message_within("bot", "user1", "sent", 800, response_time_name="deploy")
+    data_store = {"sent": "1000.000000"}
+    result = expect_function(slack_user_workspace, data_store)
+    assert result.result_code == ResultCode.failure
+    assert "1500ms" in result.message
+    assert data_store["deploy"] == 1500
+
+
+def test_expect_message_within_without_response_expect_pending():
+    slack_user_workspace = _response_time_workspace([
+        {"type": "message", "user": "U2222222", "channel": "D1", "text": "deployed", "ts": "999.000000"}
+    ])
+    expect_function = SimpleActions.expect_message_within("bot", "user1", "sent", 800)
+    result = expect_function(slack_user_workspace, {"sent": "1000.000000"})
+    assert result.result_code == ResultCode.pending
+
+
 def test_expect_message_from_user_simple_message_expect_success():
     simple_actions = mockable_simple_actions()
     expect_message_function = simple_actions.expect_message_from_user("user1", "user2")
@@ -312,6 +424,27 @@ def test_expect_and_store_action_message_with_validator_expect_failure():
     assert result.result_code == ResultCode.pending
 
 
+def test_expect_and_store_action_message_with_only_blocks_expect_pending():
+    simple_actions = mockable_simple_actions()
+
+    expect_action_function = simple_actions.expect_and_store_action_message("user1", "user2", "my_action")
+    slack_user_workspace = SlackUserWorkspace()
+    user2 = SlackUser("user2", "token")
+    slack_user_workspace.find_user_client_by_username = MagicMock(return_value=user2)
+    slack_user_workspace.find_user_by_username = MagicMock(return_value={"id": "U111111"})
+    simple_actions._try_get_channel_id = MagicMock(return_value=None)
+    user2.load_events({
+        "type": "message",
+        "user": "U111111",
+        "text": "some text",
+        "blocks": [{"type": "actions", "block_id": "b1", "elements": [{"type": "button", "action_id": "approve"}]}]
+    })
+    data_store = {}
+    result = expect_action_function(slack_user_workspace, data_store)
+    assert result.result_code == ResultCode.pending
+    assert "my_action" not in data_store
+
+
 def test_respond_to_stored_action_message_expect_success():
     user1 = SlackUser("user", "token")
     slack_user_workspace = SlackUserWorkspace()
@@ -673,3 +806,54 @@ def test_kick_user_to_channel_private_channel_expect_success():
     kick_user_from_channel = simple_actions.kick_user_from_channel("user1", "user2", "some_channel", is_private=True)
     result = kick_user_from_channel(slack_user_workspace, {})
     assert result.result_code == ResultCode.success
+
+
+def test_lease_users_with_available_personas_expect_usernames_stored():
+    slack_user_workspace = SlackUserWorkspace()
+    slack_user_workspace.add_slack_user_client(SlackUser("user1", "token"), roles=["developer"])
+    slack_user_workspace.add_slack_user_client(SlackUser("user2", "token"), roles=["developer"])
+    slack_user_workspace.active_test = "test"
+    data_store = {}
+    result = SimpleActions.lease_users("developer", 2, "developers")(slack_user_workspace, data_store)
+    assert result.result_code == ResultCode.success
+    assert data_store["developers"] == ["user1", "user2"]
+
+
+def test_lease_users_with_leased_personas_expect_pending():
+    slack_user_workspace = SlackUserWorkspace()
+    slack_user_workspace.add_slack_user_client(SlackUser("user1", "token"), roles=["developer"])
+    slack_user_workspace.persona_pool.lease("developer", 1, "another_test")
+    slack_user_workspace.active_test = "test"
+    result = SimpleActions.lease_users("developer", 1, "developers")(slack_user_workspace, {})
+    assert result.result_code == ResultCode.pending
+
+
+def test_send_message_to_user_with_stored_usernames_expect_message_sent_by_leased_user():
+    user1 = SlackUser("user1", "token")
+    user1.send_message = MagicMock()
+    slack_user_workspace = SlackUserWorkspace()
+    slack_user_workspace.add_slack_user_client(user1)
+    slack_user_workspace.set_workspace_user_details([{"name": "user2", "id": "U2"}])
+    data_store = {"developers": ["user1", "user2"]}
+    action = SimpleActions.send_message_to_user(SimpleActions.stored_value("developers", 0),
+                                                SimpleActions.stored_value("developers", 1), "Hello")
+    action(slack_user_workspace, data_store)
+    user1.send_message.assert_called_once_with("U2", "Hello", thread_ts=None)
+
+
+def test_acquire_channel_with_free_channel_expect_channel_name_stored():
+    slack_user_workspace = SlackUserWorkspace()
+    slack_user_workspace.channel_pool = MagicMock()
+    slack_user_workspace.channel_pool.acquire = MagicMock(return_value={"id": "C1", "name": "coherence-1"})
+    data_store = {}
+    result = SimpleActions.acquire_channel("channel")(slack_user_workspace, data_store)
+    assert result.result_code == ResultCode.success
+    assert data_store["channel"] == "coherence-1"
+
+
+def test_acquire_channel_with_no_free_channel_expect_pending():
+    slack_user_workspace = SlackUserWorkspace()
+    slack_user_workspace.channel_pool = MagicMock()
+    slack_user_workspace.channel_pool.acquire = MagicMock(return_value=None)
+    result = SimpleActions.acquire_channel("channel")(slack_user_workspace, {})
+    assert result.result_code == ResultCode.pending
@@ -0,0 +1,63 @@
+import re
+
+from subatomic_coherence.actions import text_matchers
+from subatomic_coherence.actions.text_matchers import text_matcher, ExactTextMatcher, AnyTextMatcher, \
+    RegexTextMatcher
+
+
+def test_text_matcher_with_string_expect_exact_matcher_with_normalised_expected_text():
+    matcher = text_matcher("A Message")
+    assert isinstance(matcher, ExactTextMatcher)
+    assert matcher.expected_text == "a message"
+    assert matcher.match("a MESSAGE")
+    assert not matcher.match("a message!")
+
+
+def test_text_matcher_case_sensitive_expect_case_compared():
+    matcher = text_matcher("A Message", ignore_case=False)
+    assert matcher.match("A Message")
+    assert not matcher.match("a message")
+
+
+def test_text_matcher_with_none_expect_any_text_matched():
+    assert isinstance(text_matcher(None), AnyTextMatcher)
+    assert text_matcher(None).match("anything")
+
+
+def test_text_matcher_with_compiled_pattern_expect_pattern_searched():
+    pattern = re.compile(r"build \d+ passed")
+    matcher = text_matcher(pattern)
+    assert isinstance(matcher, RegexTextMatcher)
+    assert matcher.pattern is pattern
+    assert matcher.match("Your build 42 passed!")
+    assert not matcher.match("Your build 42 failed")
+
+
+def test_text_matcher_with_matcher_expect_same_matcher():
+    matcher = text_matchers.glob("*")
+    assert text_matcher(matcher) is matcher
+
+
+def test_regex_full_match_ignore_case_expect_whole_text_matched():
+    matcher = text_matchers.regex(r"hello \w+", ignore_case=True, full_match=True)
+    assert matcher.match("HELLO world")
+    assert not matcher.match("HELLO world, how are you")
+
+
+def test_glob_expect_wildcards_matched():
+    matcher = text_matchers.glob("Channel * created?")
+    assert matcher.match("channel coherence-1234 created!")
+    assert not matcher.match("Channel coherence-1234 deleted.")
+
+
+def test_normalized_expect_whitespace_and_case_ignored():
+    matcher = text_matchers.normalized("  Hello\n   World ")
+    assert matcher.expected_text == "hello world"
+    assert matcher.match("hello \t world")
+    assert not matcher.match("hello  worlds")
+
+
+def test_fuzzy_expect_similar_text_matched():
+    matcher = text_matchers.fuzzy("Your request has been approved", threshold=0.9)
+    assert matcher.match("your request has been aproved")
+    assert not matcher.match("Your request has been rejected")
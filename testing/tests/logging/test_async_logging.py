@@ -0,0 +1,100 @@
+import io
+import logging
+import threading
+from collections import deque
+from unittest import mock
+
+import pytest
+
+from subatomic_coherence.logging.async_logging import AsyncLogSink
+from subatomic_coherence.logging.console_logging import ConsoleLogger, LazyCall
+
+
+@pytest.fixture(autouse=True)
+def restore_console_logger():
+    # ConsoleLogger's mode and buffer are class level, so each test gets them back as it found them
+    with mock.patch.object(ConsoleLogger, "interactive_mode", ConsoleLogger.interactive_mode), \
+            mock.patch.object(ConsoleLogger, "buffer_capacity", ConsoleLogger.buffer_capacity), \
+            mock.patch.object(ConsoleLogger, "buffered_log", deque(maxlen=ConsoleLogger.buffer_capacity)), \
+            mock.patch.object(ConsoleLogger, "sink", ConsoleLogger.sink):
+        yield
+
+
+def test_write_expect_lines_written_to_stream_after_stop():
+    stream = io.StringIO()
+    sink = AsyncLogSink(stream=stream)
+    sink.start()
+    sink.write("line1")
+    sink.write("line2")
+    sink.stop()
+    assert stream.getvalue() == "line1\nline2\n"
+
+
+def test_wrap_handler_expect_records_handled_by_wrapped_handler():
+    stream = io.StringIO()
+    sink = AsyncLogSink(stream=io.StringIO())
+    target_handler = logging.StreamHandler(stream)
+    target_handler.setFormatter(logging.Formatter("%(levelname)s - %(message)s"))
+    logger = logging.getLogger("coherence_async_test")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    async_handler = sink.wrap_handler(target_handler)
+    logger.addHandler(async_handler)
+    sink.start()
+    logger.info("Event %s", "received")
+    sink.stop()
+    logger.removeHandler(async_handler)
+    assert stream.getvalue() == "INFO - Event received\n"
+
+
+def test_wrap_handler_expect_record_formatted_on_sink_thread():
+    stream = io.StringIO()
+    sink = AsyncLogSink(stream=io.StringIO())
+    target_handler = logging.StreamHandler(stream)
+    logger = logging.getLogger("coherence_async_format_test")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    async_handler = sink.wrap_handler(target_handler)
+    logger.addHandler(async_handler)
+    formatting_threads = []
+
+    def format_event():
+        formatting_threads.append(threading.current_thread())
+        return "formatted"
+
+    logger.info("Event %s", LazyCall(format_event))
+    assert formatting_threads == []
+    sink.start()
+    sink.stop()
+    logger.removeHandler(async_handler)
+    assert stream.getvalue() == "Event formatted\n"
+    assert formatting_threads[0].name == "coherence-log-sink"
+
+
+def test_write_with_full_queue_expect_message_dropped():
+    sink = AsyncLogSink(stream=io.StringIO(), capacity=1, put_timeout=0)
+    sink.write("line1")
+    sink.write("line2")
+    assert sink.dropped == 1
+
+
+def test_write_with_full_queue_from_several_threads_expect_every_drop_counted():
+    sink = AsyncLogSink(stream=io.StringIO(), capacity=1, put_timeout=0)
+    sink.write("line")
+    threads = [threading.Thread(target=lambda: [sink.write("line") for _ in range(500)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sink.dropped == 2000
+
+
+def test_console_logger_with_sink_expect_output_written_to_sink():
+    stream = io.StringIO()
+    sink = AsyncLogSink(stream=stream)
+    sink.start()
+    ConsoleLogger.interactive_mode = False
+    ConsoleLogger.sink = sink
+    ConsoleLogger.log("Test")
+    sink.stop()
+    assert stream.getvalue() == "Test\n"
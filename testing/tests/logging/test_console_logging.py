@@ -1,4 +1,20 @@
-from subatomic_coherence.logging.console_logging import ConsoleLogger
+import logging
+from collections import deque
+from unittest import mock
+
+import pytest
+
+from subatomic_coherence.logging.console_logging import ConsoleLogger, LazyJson, LazyCall
+
+
+@pytest.fixture(autouse=True)
+def restore_console_logger():
+    # ConsoleLogger's mode and buffer are class level, so each test gets them back as it found them
+    with mock.patch.object(ConsoleLogger, "interactive_mode", ConsoleLogger.interactive_mode), \
+            mock.patch.object(ConsoleLogger, "buffer_capacity", ConsoleLogger.buffer_capacity), \
+            mock.patch.object(ConsoleLogger, "buffered_log", deque(maxlen=ConsoleLogger.buffer_capacity)), \
+            mock.patch.object(ConsoleLogger, "sink", ConsoleLogger.sink):
+        yield
 
 
 def test_success_log_expect_added_to_buffer():
@@ -36,3 +52,44 @@ def test_read_buffered_log_expect_emptied_buffer():
     ConsoleLogger.success("Test1\nTest2")
     ConsoleLogger.read_buffered_log()
     assert len(ConsoleLogger.buffered_log) == 0
+
+
+def test_buffer_message_not_interactive_expect_not_buffered():
+    ConsoleLogger.read_buffered_log()
+    ConsoleLogger.interactive_mode = False
+    ConsoleLogger.log("Test")
+    assert len(ConsoleLogger.buffered_log) == 0
+
+
+def test_buffer_message_with_ansi_codes_expect_codes_removed():
+    ConsoleLogger.interactive_mode = True
+    ConsoleLogger.log("\x1b[31mTest\x1b[0m")
+    assert ConsoleLogger.read_buffered_log()[-1] == "Test"
+
+
+def test_set_buffer_capacity_expect_oldest_lines_dropped():
+    ConsoleLogger.interactive_mode = True
+    ConsoleLogger.read_buffered_log()
+    ConsoleLogger.set_buffer_capacity(2)
+    ConsoleLogger.log("Test1\nTest2\nTest3")
+    assert ConsoleLogger.read_buffered_log() == ["Test2", "Test3"]
+
+
+def test_lazy_json_expect_rendered_as_json():
+    assert str(LazyJson({"type": "message"})) == '{"type": "message"}'
+
+
+def test_lazy_call_disabled_log_level_expect_not_rendered():
+    call_count = 0
+
+    def render():
+        nonlocal call_count
+        call_count += 1
+        return "rendered"
+
+    logger = logging.getLogger("coherence_lazy_test")
+    logger.setLevel(logging.INFO)
+    logger.debug("Payload %s", LazyCall(render))
+    assert call_count == 0
+    assert str(LazyCall(render)) == "rendered"
+    assert call_count == 1
@@ -0,0 +1,32 @@
+from subatomic_coherence.profiling.delivery_lag import DeliveryLagTracker, event_time_stamp
+
+
+def test_event_time_stamp_expect_event_ts_preferred_over_ts():
+    assert event_time_stamp({"ts": "1.5", "event_ts": "2.5"}) == 2.5
+    assert event_time_stamp({"ts": "1.5"}) == 1.5
+    assert event_time_stamp({"type": "hello"}) is None
+
+
+def test_delivery_lag_tracker_record_expect_lag_per_user():
+    tracker = DeliveryLagTracker()
+    assert tracker.record("user", {"ts": "100.0"}, 100.25) == 250
+    assert tracker.record("user", {"event_ts": "100.0"}, 100.125) == 125
+    assert tracker.record("user", {"type": "pong"}, 100.125) is None
+    tracker.record("other_user", {"ts": "100.0"}, 101)
+
+    delivery_lag = tracker.users["user"]
+    assert delivery_lag.count == 2
+    assert delivery_lag.mean() == 187.5
+    assert delivery_lag.minimum == 125
+    assert delivery_lag.maximum == 250
+    assert delivery_lag.histogram is None
+    assert tracker.summary().splitlines()[1:] == ["other_user: 1, 1000.0, 1000.0, 1000.0",
+                                                  "user: 2, 187.5, 125.0, 250.0"]
+
+
+def test_delivery_lag_tracker_with_distribution_expect_histogram_in_summary():
+    tracker = DeliveryLagTracker(track_distribution=True)
+    tracker.record("user", {"ts": "100.0"}, 100.003)
+    tracker.record("user", {"ts": "100.0"}, 99.9)
+    assert tracker.users["user"].histogram.buckets == [1, 0, 1]
+    assert tracker.summary().splitlines()[-1] == "    <1ms: 1, <4ms: 1"
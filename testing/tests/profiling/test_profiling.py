@@ -0,0 +1,86 @@
+import json
+import time
+
+from subatomic_coherence.profiling.profiling import ProfileCollector, ProfilingHook, Histogram, add_profiling_hook, \
+    profiled, remove_profiling_hook
+
+
+class RecordingHook(ProfilingHook):
+    def __init__(self):
+        self.calls = []
+
+    def before(self, category, name):
+        self.calls.append(("before", category, name))
+
+    def after(self, category, name, start_time, duration):
+        self.calls.append(("after", category, name))
+
+
+def test_profiled_without_hooks_expect_shared_context():
+    assert profiled("api_call", "chat.postMessage") is profiled("rtm_read", "user")
+
+
+def test_profiled_with_hook_expect_before_and_after_called():
+    hook = RecordingHook()
+    add_profiling_hook(hook)
+    try:
+        with profiled("api_call", "chat.postMessage"):
+            hook.calls.append(("body",))
+    finally:
+        remove_profiling_hook(hook)
+    assert hook.calls == [("before", "api_call", "chat.postMessage"), ("body",),
+                          ("after", "api_call", "chat.postMessage")]
+
+
+def test_profiled_with_exception_expect_after_called_and_exception_raised():
+    hook = RecordingHook()
+    add_profiling_hook(hook)
+    try:
+        with profiled("run_element", "step"):
+            raise ValueError()
+    except ValueError:
+        pass
+    finally:
+        remove_profiling_hook(hook)
+    assert hook.calls[-1] == ("after", "run_element", "step")
+
+
+def test_profile_collector_expect_histograms_and_summary():
+    collector = ProfileCollector()
+    add_profiling_hook(collector)
+    try:
+        for _ in range(3):
+            with profiled("verification", "message"):
+                pass
+        with profiled("api_call", "users.list"):
+            time.sleep(0.002)
+    finally:
+        remove_profiling_hook(collector)
+    assert collector.histograms[("verification", "message")].count == 3
+    assert collector.histograms[("api_call", "users.list")].maximum >= 2
+    summary = collector.summary().splitlines()
+    assert summary[1].startswith("api_call users.list: ")
+    assert summary[3].startswith("verification message: ")
+    assert summary[4] == "    <1ms: 3"
+
+
+def test_profile_collector_write_chrome_trace_expect_complete_events(tmp_path):
+    collector = ProfileCollector(max_spans=2)
+    for index in range(3):
+        collector.after("run_element", f"step_{index}", collector.start_time + index, 0.5)
+    trace_file = tmp_path / "profile.json"
+    collector.write_chrome_trace(str(trace_file))
+
+    trace_events = json.loads(trace_file.read_text())["traceEvents"]
+    assert [event["name"] for event in trace_events] == ["step_1", "step_2"]
+    assert trace_events[0]["ph"] == "X"
+    assert trace_events[0]["ts"] == 1000000
+    assert trace_events[0]["dur"] == 500000
+
+
+def test_histogram_expect_power_of_two_buckets():
+    histogram = Histogram()
+    for value in [0.5, 1, 3, 3.9, 4]:
+        histogram.record(value)
+    assert histogram.buckets == [1, 1, 2, 1]
+    assert histogram.mean() == 12.4 / 5
@@ -0,0 +1,29 @@
+from subatomic_coherence.profiling.resource_usage import ResourceMonitor, memory_usage
+
+
+def test_resource_monitor_sample_expect_resources_and_sizes():
+    resource_monitor = ResourceMonitor()
+    sample = resource_monitor.sample(recorded_events=3)
+    assert sample["recorded_events"] == 3
+    assert sample["python_objects"] > 0
+    assert sample["threads"] >= 1
+    assert sample["memory_bytes"] == memory_usage() or sample["memory_bytes"] > 0
+    assert list(resource_monitor.samples) == [sample]
+
+
+def test_resource_monitor_suspected_leaks_expect_only_growing_metrics():
+    resource_monitor = ResourceMonitor()
+    for index in range(20):
+        resource_monitor.samples.append({"elapsed_ms": index * 60000, "memory_bytes": 1000 + 100 * index,
+                                         "python_objects": 5000 + (index % 2), "threads": 4})
+    leaks = resource_monitor.suspected_leaks()
+    assert [(metric, round(growth), round(growth_per_hour)) for metric, growth, growth_per_hour in leaks] == \
+        [("memory_bytes", 900, 6000)]
+
+
+def test_resource_monitor_suspected_leaks_with_few_samples_expect_none():
+    resource_monitor = ResourceMonitor()
+    for index in range(5):
+        resource_monitor.samples.append({"elapsed_ms": index, "memory_bytes": index * 1000, "python_objects": 1,
+                                         "threads": 1})
+    assert resource_monitor.suspected_leaks() == []
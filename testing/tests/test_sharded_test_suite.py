@@ -0,0 +1,95 @@
+import multiprocessing
+import os
+import queue
+from unittest import mock
+
+from subatomic_coherence import sharded_test_suite
+from subatomic_coherence.sharded_test_suite import ShardedTestSuite, _run_shard
+from subatomic_coherence.slack_test_suite import SlackTestSuite
+from subatomic_coherence.testing.test import TestPortal, TestResult, ResultCode
+from subatomic_coherence.testing.test_history import TestHistory
+
+
+def _failing_test():
+    return TestPortal().then(lambda slack_user_workspace, data_store: TestResult(ResultCode.failure, "FAILURE"))
+
+
+def _killed_shard(shard_index, slack_users, shard_tests, settings, result_queue):
+    os._exit(3)
+
+
+def test_assign_tests_expect_tests_distributed_across_shards():
+    test_suite = ShardedTestSuite()
+    test_suite.add_shard([]).add_shard([])
+    for index in range(3):
+        test_suite.add_test(f"test{index}", TestPortal)
+    shard_tests = test_suite._assign_tests()
+    assert [name for name, _ in shard_tests[0]] == ["test0", "test2"]
+    assert [name for name, _ in shard_tests[1]] == ["test1"]
+
+
+def test_assign_tests_with_history_expect_tests_bin_packed_longest_first(tmp_path):
+    history_file = str(tmp_path / "history.db")
+    test_history = TestHistory(history_file)
+    for test_name, duration in [("test0", 100), ("test1", 500), ("test2", 300), ("test3", 300)]:
+        test_history.record(test_name, duration)
+    test_history.save()
+
+    test_suite = ShardedTestSuite(history_file=history_file)
+    test_suite.add_shard([]).add_shard([])
+    for index in range(4):
+        test_suite.add_test(f"test{index}", TestPortal)
+    shard_tests = test_suite._assign_tests()
+    assert [name for name, _ in shard_tests[0]] == ["test1", "test0"]
+    assert [name for name, _ in shard_tests[1]] == ["test2", "test3"]
+
+
+@mock.patch.object(SlackTestSuite, "_connect_clients", return_value=True)
+def test_run_tests_expect_results_merged_from_all_shards(mock_connect):
+    test_suite = ShardedTestSuite()
+    test_suite.add_shard([]).add_shard([])
+    test_suite.add_test("passing_test", TestPortal)
+    test_suite.add_test("failing_test", _failing_test)
+    assert test_suite.run_tests() is False
+    assert [outcome.name for outcome in test_suite.successful_tests] == ["passing_test"]
+    assert [outcome.name for outcome in test_suite.failed_tests] == ["failing_test"]
+    assert test_suite.failed_tests[0].message == "FAILURE"
+    assert test_suite.failed_tests[0].shard_index == 1
+
+
+def test_run_shard_with_broken_test_factory_expect_tests_reported_failed():
+    def broken_factory():
+        raise ValueError("broken")
+
+    result_queue = queue.Queue()
+    settings = {"description": "shard", "log_file": None, "log_level": 20, "record_events": False}
+    _run_shard(0, [], [("broken_test", broken_factory)], settings, result_queue)
+    shard_result = result_queue.get()
+    assert "ValueError" in shard_result.error
+    assert shard_result.outcomes[0].name == "broken_test"
+    assert shard_result.outcomes[0].passed is False
+
+
+@mock.patch.object(sharded_test_suite, "_run_shard", _killed_shard)
+def test_run_tests_with_dead_shard_expect_its_tests_reported_failed():
+    test_suite = ShardedTestSuite()
+    test_suite.result_poll_interval = 0.05
+    test_suite.add_shard([])
+    test_suite.add_test("killed_test", TestPortal)
+    assert test_suite.run_tests() is False
+    assert [outcome.name for outcome in test_suite.failed_tests] == ["killed_test"]
+    assert "code 3" in test_suite.shard_errors[0]
+
+
+@mock.patch.object(sharded_test_suite, "_get_multiprocessing_context",
+                   return_value=multiprocessing.get_context("spawn"))
+def test_run_tests_spawned_with_lambda_factory_expect_failure_before_shards_start(mock_context):
+    test_suite = ShardedTestSuite()
+    test_suite.add_shard([])
+    test_suite.add_test("module_level_test", _failing_test)
+    test_suite.add_test("lambda_test", lambda: TestPortal())
+    with mock.patch.object(sharded_test_suite.ConsoleLogger, "error") as mock_error:
+        assert test_suite.run_tests() is False
+    assert "lambda_test" in mock_error.call_args[0][0]
+    assert "module_level_test" not in mock_error.call_args[0][0]
+    assert test_suite.failed_tests == []
@@ -1,8 +1,15 @@
+import json
+import threading
+import time
+from unittest import mock
 from unittest.mock import MagicMock
 
+import pytest
+
 from subatomic_coherence.logging.console_logging import ConsoleLogger
-from subatomic_coherence.slack_test_suite import SlackTestSuite, RecordedEvent
-from subatomic_coherence.testing.test import TestPortal, TestResult, ResultCode
+from subatomic_coherence.slack_test_suite import SlackTestSuite, RecordedEvent, build_summary
+from subatomic_coherence.testing.test import TestPortal, TestResult, ResultCode, RESPONSE_TIMES
+from subatomic_coherence.testing.test_history import TestHistory, AdaptiveTimeout
 from subatomic_coherence.ui.ui import TestingStage
 
 
@@ -19,6 +26,12 @@ def test_add_slack_user_expect_added_to_user_list():
     assert test_suite.slack_user_workspace.find_user_client_by_username("user") is not None
 
 
+def test_add_slack_user_with_ratelimit_retries_expect_retries_set():
+    test_suite = SlackTestSuite()
+    test_suite.add_slack_user("user", "token", ratelimit_retries=2)
+    assert test_suite.slack_user_workspace.find_user_client_by_username("user").ratelimit_retries == 2
+
+
 def test_connect_clients_expect_clients_connected_successfully():
     test_suite = SlackTestSuite()
     test_suite.add_slack_user("user", "token")
@@ -54,6 +67,18 @@ def test_client_read_event_expect_events_added_to_event_store_of_client():
     assert user.events.events[-1] == event
 
 
+def test_client_read_event_expect_delivery_lag_recorded():
+    test_suite = SlackTestSuite()
+    test_suite.add_slack_user("user", "token")
+    user = test_suite.slack_user_workspace.find_user_client_by_username("user")
+    user.client.rtm_read = MagicMock(return_value=[{"type": "message", "ts": "100.0"}, {"type": "hello"}])
+    with mock.patch("subatomic_coherence.slack_test_suite.time.time", return_value=100.5):
+        test_suite._read_slack_events(True)
+    assert test_suite.delivery_lag.users["user"].count == 1
+    assert [event.delivery_lag for event in test_suite.recorded_events] == [500, None]
+    assert '"DeliveryLagMs": 500' in test_suite.recorded_events[0].json()
+
+
 def test_client_read_channel_created_event_expect_channel_details_added_to_slack_workspace():
     test_suite = SlackTestSuite()
     test_suite.add_slack_user("user", "token")
@@ -98,17 +123,15 @@ def test_process_test_with_child_expect_test_fails():
     assert test_suite.failed_tests[0] == test
 
 
-def test_log_recorded_events_expect_printed_log_buffer():
-    # clear the buffer
-    ConsoleLogger.read_buffered_log()
+def test_log_recorded_events_expect_printed_log(capsys):
     test_suite = SlackTestSuite()
     event = RecordedEvent("client", {"name": "test", "ts": "1"})
     test_suite.recorded_events.append(event)
     test_suite._log_recorded_events()
 
-    log_buffer = ConsoleLogger.read_buffered_log()
-    assert '"name": "test"' in log_buffer[-5]
-    assert '"ts": "1"' in log_buffer[-4]
+    printed_lines = capsys.readouterr().out.split("\n")
+    assert '"name": "test"' in printed_lines[-6]
+    assert '"ts": "1"' in printed_lines[-5]
 
 
 def test_log_recorded_multiple_events_expect_sorted_by_time_stamp():
@@ -151,3 +174,271 @@ def test_process_current_test_expect_test_passes():
     test_suite.add_test("test", test)
     test_suite._run_clean_up()
     assert some_var == 2
+
+
+def test_process_current_test_with_concurrent_tests_expect_tests_run_together():
+    test_suite = SlackTestSuite(max_concurrent_tests=2)
+    pending_action = lambda slack_user_workspace, data_store: TestResult(ResultCode.pending)
+    test_suite.add_test("test1", TestPortal().then(pending_action))
+    test_suite.add_test("test2", TestPortal().then(pending_action))
+    test_suite.add_test("test3", TestPortal().then(pending_action))
+    test_suite._process_current_test()
+    assert [test.name for test in test_suite.live_tests] == ["test1", "test2"]
+    assert [test.name for test in test_suite.tests] == ["test3"]
+
+
+def test_process_current_test_expect_leased_personas_released():
+    test_suite = SlackTestSuite()
+    test_suite.slack_user_workspace.persona_pool.add_persona("user1", "developer")
+    test = TestPortal().then(lambda slack_user_workspace, data_store: TestResult(
+        ResultCode.success if slack_user_workspace.persona_pool.lease("developer", 1, slack_user_workspace.active_test)
+        else ResultCode.failure))
+    test_suite.add_test("test", test)
+    test_suite._process_current_test()
+    test_suite._process_current_test()
+    assert test_suite.successful_tests[0] == test
+    assert test_suite.slack_user_workspace.persona_pool.available("developer") == ["user1"]
+
+
+def test_run_clean_up_with_failing_clean_up_expect_failure_collected():
+    test_suite = SlackTestSuite()
+    some_var = 0
+
+    def failing_clean_up(workspace):
+        raise ValueError("clean up failed")
+
+    def clean_up(workspace):
+        nonlocal some_var
+        some_var = 2
+
+    test_suite.add_test("failing_test", TestPortal().set_clean_up(failing_clean_up))
+    test_suite.add_test("test", TestPortal().set_clean_up(clean_up))
+    test_suite._run_clean_up()
+    assert some_var == 2
+    assert test_suite.clean_up_failures[0][0] == "failing_test"
+    assert "clean up failed" in test_suite.clean_up_failures[0][1]
+
+
+def test_run_clean_up_by_default_expect_clean_ups_run_one_at_a_time():
+    test_suite = SlackTestSuite()
+    running = []
+    overlapped = []
+
+    def clean_up(workspace):
+        running.append(True)
+        overlapped.append(len(running) > 1)
+        time.sleep(0.01)
+        running.pop()
+
+    for index in range(3):
+        test_suite.add_test(f"test{index}", TestPortal().set_clean_up(clean_up))
+    test_suite._run_clean_up()
+    assert overlapped == [False, False, False]
+
+
+def test_process_current_test_with_clean_up_on_completion_expect_clean_up_given_workspace_snapshot():
+    test_suite = SlackTestSuite(clean_up_on_completion=True)
+    test_suite.slack_user_workspace.set_workspace_channels([{"id": "C1", "name": "general"}])
+    workspace_changed = threading.Event()
+    channel_names = []
+
+    def clean_up(slack_user_workspace):
+        workspace_changed.wait(5)
+        channel_names.append(slack_user_workspace.find_channel_by_slack_id("C1")["name"])
+
+    test = TestPortal().set_clean_up(clean_up)
+    test_suite.add_test("test", test)
+    test_suite._process_current_test()
+    assert test_suite._clean_up_futures[0][0] == test
+    test_suite.slack_user_workspace.upsert_channel({"id": "C1", "name": "renamed"})
+    workspace_changed.set()
+    test_suite._run_clean_up()
+    assert channel_names == ["general"]
+    assert test_suite.slack_user_workspace.find_channel_by_name("renamed")["id"] == "C1"
+
+
+def test_process_current_test_with_clean_up_on_completion_and_no_clean_up_expect_nothing_submitted():
+    test_suite = SlackTestSuite(clean_up_on_completion=True)
+    test_suite.add_test("test", TestPortal())
+    test_suite._process_current_test()
+    assert test_suite._clean_up_futures == []
+
+
+def test_client_read_event_with_only_routed_tests_expect_unrelated_event_discarded():
+    test_suite = SlackTestSuite()
+    test_suite.add_slack_user("user", "token")
+    test_suite.slack_user_workspace.set_workspace_channels([{"id": "C1", "name": "general"}])
+    user = test_suite.slack_user_workspace.find_user_client_by_username("user")
+    test = TestPortal().route(channel_name="general").then(
+        lambda slack_user_workspace, data_store: TestResult(ResultCode.pending))
+    test_suite.add_test("test", test)
+    test_suite._process_current_test()
+    event = {"type": "message", "channel": "C1", "user": "U1", "ts": "1.0"}
+    user.client.rtm_read = MagicMock(return_value=[event, {"type": "message", "channel": "C2", "ts": "2.0"}])
+    test_suite._read_slack_events(False)
+    assert len(user.events.events) == 0
+    assert test_suite.event_router.test_events[test]["user"].events == [event]
+
+
+def test_process_current_test_with_priorities_expect_highest_priority_started_first():
+    test_suite = SlackTestSuite()
+    test_suite.add_test("test1", TestPortal())
+    test_suite.add_test("test2", TestPortal(), priority=10)
+    test_suite.add_test("test3", TestPortal())
+    test_suite._process_current_test()
+    assert [test.name for test in test_suite.successful_tests] == ["test2"]
+    assert [test.name for test in test_suite.tests] == ["test1", "test3"]
+
+
+def test_process_current_test_with_history_expect_duration_recorded_and_longest_test_first(tmp_path):
+    history_file = str(tmp_path / "history.db")
+    test_suite = SlackTestSuite(history_file=history_file, max_concurrent_tests=2)
+    test_suite.test_history.record("fast_test", 10)
+    test_suite.test_history.record("slow_test", 5000)
+    test_suite.add_test("fast_test", TestPortal())
+    test_suite.add_test("slow_test", TestPortal())
+    assert test_suite.tests.peek().name == "slow_test"
+    test_suite._process_current_test()
+    assert test_suite.test_history.runs["slow_test"] == 2
+    test_suite.test_history.save()
+    assert TestHistory(history_file).expected_duration("slow_test") < 5000
+
+
+def test_add_test_with_history_in_serial_suite_expect_order_added_kept(tmp_path):
+    test_suite = SlackTestSuite(history_file=str(tmp_path / "history.db"))
+    test_suite.test_history.record("fast_test", 10)
+    test_suite.test_history.record("slow_test", 5000)
+    test_suite.add_test("fast_test", TestPortal())
+    test_suite.add_test("slow_test", TestPortal())
+    assert [test.name for test in test_suite.tests] == ["fast_test", "slow_test"]
+
+
+def test_process_current_test_with_max_failures_expect_live_tests_cancelled_and_queued_tests_skipped():
+    test_suite = SlackTestSuite(max_concurrent_tests=2, max_failures=1)
+    failing_test = TestPortal().then(lambda slack_user_workspace, data_store: TestResult(ResultCode.failure, "FAILED"))
+    pending_test = TestPortal().then(lambda slack_user_workspace, data_store: TestResult(ResultCode.pending))
+    test_suite.add_test("failing_test", failing_test)
+    test_suite.add_test("pending_test", pending_test)
+    test_suite.add_test("queued_test", TestPortal())
+    for _ in range(2):
+        test_suite._process_current_test()
+    assert test_suite.failed_tests == [failing_test]
+    assert test_suite.cancelled_tests == [pending_test]
+    assert pending_test.is_live is False
+    assert pending_test.message == "Cancelled after 1 failed tests"
+    assert [test.name for test in test_suite.skipped_tests] == ["queued_test"]
+    assert len(test_suite.live_tests) == 0
+    assert len(test_suite.tests) == 0
+
+
+def test_run_clean_up_after_fail_fast_expect_only_started_tests_cleaned_up():
+    test_suite = SlackTestSuite(max_failures=1)
+    cleaned_up = []
+    test_suite.add_test("failing_test", TestPortal()
+                        .then(lambda slack_user_workspace, data_store: TestResult(ResultCode.failure))
+                        .set_clean_up(lambda slack_user_workspace: cleaned_up.append("failing_test")))
+    test_suite.add_test("skipped_test", TestPortal()
+                        .set_clean_up(lambda slack_user_workspace: cleaned_up.append("skipped_test")))
+    for _ in range(2):
+        test_suite._process_current_test()
+    test_suite._run_clean_up()
+    assert [test.name for test in test_suite.skipped_tests] == ["skipped_test"]
+    assert cleaned_up == ["failing_test"]
+    assert test_suite.clean_up_failures == []
+
+
+def test_select_tags_expect_only_tagged_tests_queued():
+    test_suite = SlackTestSuite()
+    test_suite.add_test("deploy_test", TestPortal().tag("deploy"))
+    test_suite.add_test("status_test", TestPortal().tag("status", "core"))
+    test_suite.add_test("untagged_test", TestPortal())
+    test_suite.select_tags(["deploy", "core"])
+    test_suite._select_tests()
+    assert [test.name for test in test_suite.tests] == ["deploy_test", "status_test"]
+    assert test_suite.total_tests == 2
+
+
+def test_select_impacted_tests_expect_tests_selected_from_changed_files(tmp_path):
+    test_suite = SlackTestSuite()
+    test_suite.add_test("deploy_test", TestPortal().tag("deploy"))
+    test_suite.add_test("status_test", TestPortal().tag("status"))
+    test_suite.add_test("untagged_test", TestPortal())
+    with mock.patch("subatomic_coherence.slack_test_suite.changed_files",
+                    return_value=["bot/commands/deploy/handler.py"]):
+        test_suite.select_impacted_tests({"bot/commands/deploy/*": "deploy"}, include_untagged=True)
+    test_suite._select_tests()
+    assert [test.name for test in test_suite.tests] == ["deploy_test", "untagged_test"]
+
+
+def test_start_queued_tests_with_adaptive_timeout_expect_step_timeouts_from_latencies():
+    def slow_step(slack_user_workspace, data_store):
+        return TestResult(ResultCode.pending)
+
+    test_suite = SlackTestSuite(adaptive_timeout=AdaptiveTimeout(multiplier=2, floor=100, min_samples=3))
+    for latency in [200, 300, 400]:
+        test_suite.test_history.record_step_latency("test.1.slow_step", latency)
+    test = TestPortal().then(slow_step).then(slow_step)
+    test_suite.add_test("test", test)
+    test_suite._start_queued_tests()
+    assert [element.timeout for _, element in test.steps()] == [800, 15000]
+
+
+def test_complete_test_expect_step_latencies_recorded_in_history():
+    test_suite = SlackTestSuite(adaptive_timeout=AdaptiveTimeout())
+    test_suite.add_test("test", TestPortal()
+                        .then(lambda slack_user_workspace, data_store: TestResult(ResultCode.success)))
+    test_suite._process_current_test()
+    test_suite._process_current_test()
+    assert len(test_suite.test_history.latencies("test.1.<lambda>")) == 1
+
+
+def test_stop_profiling_expect_steps_profiled_and_trace_written(tmp_path):
+    profile_file = tmp_path / "profile.json"
+    test_suite = SlackTestSuite(profile_file=str(profile_file))
+    test_suite.add_test("test", TestPortal()
+                        .then(lambda slack_user_workspace, data_store: TestResult(ResultCode.success)))
+    test_suite._start_profiling()
+    test_suite._process_current_test()
+    test_suite._process_current_test()
+    test_suite._stop_profiling()
+    assert test_suite.profile_collector is None
+    trace_events = json.loads(profile_file.read_text())["traceEvents"]
+    assert [(event["cat"], event["name"]) for event in trace_events] == [("run_element", "start_test"),
+                                                                         ("run_element", "<lambda>")]
+
+
+def test_build_summary_with_cancelled_and_skipped_tests_expect_them_in_total():
+    passed_test = TestPortal()
+    passed_test.name = "passed"
+    failed_test = TestPortal()
+    failed_test.name = "failed"
+    cancelled_test = TestPortal()
+    cancelled_test.name = "cancelled"
+    skipped_test = TestPortal()
+    skipped_test.name = "skipped"
+    summary = build_summary([passed_test], [failed_test], [cancelled_test], [skipped_test])
+    assert "1/4 tests passed" in summary
+    assert "1/4 tests failed" in summary
+
+
+def test_build_summary_with_response_times_expect_response_times_listed():
+    test = TestPortal()
+    test.name = "test"
+    test.data_store[RESPONSE_TIMES] = {"deploy": 250}
+    summary = build_summary([test], [])
+    assert "Test passed: test (deploy: 250ms)" in summary
+
+
+def test_init_with_async_logging_expect_sink_not_started():
+    test_suite = SlackTestSuite(async_logging=True)
+    assert not test_suite.log_sink.is_running()
+    assert ConsoleLogger.sink is None
+
+
+@mock.patch.object(SlackTestSuite, "_connect_clients", side_effect=RuntimeError("connection failed"))
+def test_run_tests_with_async_logging_and_error_expect_sink_stopped(mock_connect):
+    test_suite = SlackTestSuite(async_logging=True)
+    with pytest.raises(RuntimeError):
+        test_suite.run_tests()
+    assert not test_suite.log_sink.is_running()
+    assert ConsoleLogger.sink is None
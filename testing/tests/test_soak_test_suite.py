@@ -0,0 +1,91 @@
+import json
+import time
+from unittest import mock
+
+from subatomic_coherence.slack_test_suite import SlackTestSuite
+from subatomic_coherence.soak_test_suite import SoakTestSuite
+from subatomic_coherence.testing.test import TestPortal, TestResult, ResultCode
+
+
+def _failing_test():
+    return TestPortal().then(lambda slack_user_workspace, data_store: TestResult(ResultCode.failure, "FAILURE"))
+
+
+@mock.patch.object(SlackTestSuite, "_connect_clients", return_value=True)
+def test_run_tests_expect_rounds_repeated_and_metrics_flushed(mock_connect, tmp_path):
+    metrics_file = tmp_path / "metrics.jsonl"
+    test_suite = SoakTestSuite(round_interval=0, rounds=3, metrics_file=str(metrics_file), metrics_interval=0,
+                               max_completed_tests=2)
+    test_suite.add_test("passing_test", TestPortal)
+    test_suite.add_test("failing_test", _failing_test)
+    test_suite.run_tests()
+
+    assert test_suite.rounds_started == 3
+    assert test_suite.total_successful_tests == 3
+    assert test_suite.total_failed_tests == 3
+    assert len(test_suite.successful_tests) == 2
+    assert len(test_suite._full_test_list) <= 2
+    metrics = [json.loads(line) for line in metrics_file.read_text().splitlines()]
+    assert len(metrics) >= 3
+    assert metrics[-1]["round"] == 3
+    assert metrics[-1]["failed_tests"] == 3
+    assert "memory_bytes" in metrics[-1]
+
+
+@mock.patch.object(SlackTestSuite, "_connect_clients", return_value=True)
+def test_run_tests_with_max_failures_expect_no_further_rounds(mock_connect):
+    test_suite = SoakTestSuite(round_interval=0, rounds=5, max_failures=1)
+    test_suite.add_test("failing_test", _failing_test)
+    test_suite.run_tests()
+    assert test_suite.rounds_started == 1
+    assert test_suite.total_failed_tests == 1
+
+
+@mock.patch.object(SlackTestSuite, "_connect_clients", return_value=True)
+def test_run_tests_with_max_failures_beyond_kept_failures_expect_fail_fast(mock_connect):
+    test_suite = SoakTestSuite(round_interval=0, rounds=1, max_failures=2, max_completed_tests=1)
+    test_suite.add_test("failing_test_one", _failing_test)
+    test_suite.add_test("failing_test_two", _failing_test)
+    with mock.patch.object(SlackTestSuite, "_fail_fast", autospec=True) as mock_fail_fast:
+        test_suite.run_tests()
+    assert len(test_suite.failed_tests) == 1
+    mock_fail_fast.assert_called_once_with(test_suite)
+
+
+def test_update_test_status_between_rounds_expect_suite_kept_running():
+    test_suite = SoakTestSuite(round_interval=60000, duration=3600000)
+    test_suite.add_test("passing_test", TestPortal)
+    test_suite._start_time = time.monotonic()
+    test_suite._next_flush_time = float("inf")
+    test_suite._start_round(test_suite._start_time)
+    while len(test_suite.tests) > 0 or len(test_suite.live_tests) > 0:
+        test_suite._process_current_test()
+    with mock.patch("subatomic_coherence.soak_test_suite.time.sleep") as mock_sleep:
+        test_suite._update_test_status()
+    assert test_suite.rounds_started == 1
+    assert test_suite.test_status.current_operation.name == "run_tests"
+    assert 0 < mock_sleep.call_args[0][0] <= 0.1
+
+
+def test_update_test_status_just_before_next_round_expect_sleep_until_round():
+    test_suite = SoakTestSuite(round_interval=60000, idle_interval=10000)
+    test_suite._start_time = time.monotonic()
+    test_suite._next_flush_time = float("inf")
+    test_suite.rounds_started = 1
+    test_suite._next_round_time = test_suite._start_time + 1
+    with mock.patch("subatomic_coherence.soak_test_suite.time.sleep") as mock_sleep:
+        test_suite._update_test_status()
+    assert 0 < mock_sleep.call_args[0][0] <= 1
+
+
+def test_build_soak_report_expect_totals_and_leaks():
+    test_suite = SoakTestSuite()
+    test_suite.rounds_started = 2
+    test_suite.total_successful_tests = 4
+    for index in range(20):
+        test_suite.resource_monitor.samples.append({"elapsed_ms": index * 1000, "memory_bytes": 1048576 * (index + 1),
+                                                    "python_objects": 100, "threads": 2})
+    report = test_suite.build_soak_report().splitlines()
+    assert report[0] == "Soak test report: 2 rounds, 4 tests passed, 0 tests failed"
+    assert report[1] == "Memory: 1.0 MB at the start, 20.0 MB at the end"
+    assert report[2].startswith("Possible leak: memory_bytes grew by")
@@ -0,0 +1,70 @@
+from subatomic_coherence.testing.event_router import EventRouter, route_fields
+from subatomic_coherence.testing.test import TestPortal
+from subatomic_coherence.user.slack_user import SlackUser
+from subatomic_coherence.user.slack_user_workspace import SlackUserWorkspace
+
+
+def _create_workspace():
+    slack_user_workspace = SlackUserWorkspace()
+    slack_user_workspace.add_slack_user_client(SlackUser("user", "token"))
+    slack_user_workspace.set_workspace_channels([{"id": "C1", "name": "general"}])
+    slack_user_workspace.set_workspace_user_details([{"id": "U1", "name": "bot"}])
+    return slack_user_workspace
+
+
+def test_route_fields_with_thread_reply_expect_channel_thread_and_user():
+    event = {"type": "message", "channel": "C1", "user": "U1", "ts": "2.0", "thread_ts": "1.0"}
+    assert route_fields(event) == ("C1", "1.0", "U1")
+
+
+def test_route_fields_with_changed_message_expect_inner_message_fields():
+    event = {"type": "message", "subtype": "message_changed", "channel": "C1",
+             "message": {"user": "U1", "ts": "1.0"}}
+    assert route_fields(event) == ("C1", "1.0", "U1")
+
+
+def test_route_event_in_routed_channel_expect_event_delivered_to_test():
+    slack_user_workspace = _create_workspace()
+    router = EventRouter()
+    test = TestPortal().route(channel_name="general")
+    router.update_routes(test, slack_user_workspace)
+    event = {"type": "message", "channel": "C1", "user": "U2", "ts": "1.0"}
+    assert router.route("user", event) is True
+    assert router.route("user", {"type": "message", "channel": "C2", "user": "U2", "ts": "1.0"}) is False
+    assert router.test_events[test]["user"].events == [event]
+
+
+def test_route_event_with_thread_from_data_store_expect_only_thread_events_delivered():
+    slack_user_workspace = _create_workspace()
+    router = EventRouter()
+    test = TestPortal().route(channel_name="general", thread_ts_name="thread", from_user="bot")
+    test.data_store["thread"] = "1.0"
+    router.update_routes(test, slack_user_workspace)
+    reply = {"type": "message", "channel": "C1", "user": "U1", "ts": "2.0", "thread_ts": "1.0"}
+    assert router.route("user", reply) is True
+    assert router.route("user", {"type": "message", "channel": "C1", "user": "U1", "ts": "3.0"}) is False
+
+
+def test_activate_expect_user_events_swapped_for_routed_events():
+    slack_user_workspace = _create_workspace()
+    router = EventRouter()
+    test = TestPortal().route(channel_name="general")
+    router.update_routes(test, slack_user_workspace)
+    event = {"type": "message", "channel": "C1", "user": "U2", "ts": "1.0"}
+    router.route("user", event)
+    user = slack_user_workspace.find_user_client_by_username("user")
+    user.load_events({"type": "message", "channel": "C2"})
+    router.activate(test, slack_user_workspace)
+    assert user.events.events == [event]
+    router.deactivate()
+    assert user.events.events == [{"type": "message", "channel": "C2"}]
+
+
+def test_remove_expect_routes_removed():
+    slack_user_workspace = _create_workspace()
+    router = EventRouter()
+    test = TestPortal().route(channel_name="general")
+    router.update_routes(test, slack_user_workspace)
+    router.remove(test)
+    assert len(router.routes) == 0
+    assert router.route("user", {"type": "message", "channel": "C1", "user": "U2", "ts": "1.0"}) is False
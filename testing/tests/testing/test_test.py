@@ -161,3 +161,37 @@ def test_test_portal_add_clean_up_function_expect_clean_up_function_created():
     test = TestPortal().set_clean_up(some_function)
 
     assert test.clean_up == some_function
+
+
+def test_test_portal_test_pending_expect_shared_pending_result():
+    test = TestPortal().then(lambda slack_user_workspace, data_store: TestResult(ResultCode.pending))
+    slack_user_workspace = SlackUserWorkspace()
+    first_result = test.test(slack_user_workspace)
+    second_result = test.test(slack_user_workspace)
+    assert first_result.result_code == ResultCode.pending
+    assert first_result.message == "pending"
+    assert first_result is second_result
+
+
+def test_test_portal_expect_no_instance_dictionary():
+    test = TestPortal().then(lambda slack_user_workspace, data_store: TestResult(ResultCode.success))
+    assert not hasattr(test, "__dict__")
+    assert not hasattr(test.next_action, "__dict__")
+    assert not hasattr(TestResult(ResultCode.success), "__dict__")
+    assert not hasattr(CallStackAction("action"), "__dict__")
+
+
+def test_test_portal_completed_steps_expect_step_latencies_recorded():
+    def step_one(slack_user_workspace, data_store):
+        return TestResult(ResultCode.success)
+
+    def step_two(slack_user_workspace, data_store):
+        return TestResult(ResultCode.success)
+
+    test = TestPortal().then(step_one).then(step_two)
+    test.name = "test"
+    slack_user_workspace = SlackUserWorkspace()
+    for _ in range(3):
+        test.test(slack_user_workspace)
+    assert [step_name for step_name, _ in test.step_latencies] == ["test.1.step_one", "test.2.step_two"]
+    assert [step_name for step_name, _ in test.steps()] == ["test.1.step_one", "test.2.step_two"]
@@ -0,0 +1,76 @@
+import sqlite3
+from unittest import mock
+
+from subatomic_coherence.testing.test_history import TestHistory, AdaptiveTimeout, percentile
+
+
+def test_test_history_without_history_expect_zero_expected_duration(tmp_path):
+    test_history = TestHistory(str(tmp_path / "history.db"))
+    assert test_history.has_history() is False
+    assert test_history.expected_duration("test") == 0
+
+
+def test_test_history_record_and_save_expect_durations_read_back(tmp_path):
+    history_file = str(tmp_path / "history.db")
+    test_history = TestHistory(history_file)
+    test_history.record("fast", 100)
+    test_history.record("slow", 1000)
+    test_history.record("slow", 2000)
+    test_history.save()
+
+    test_history = TestHistory(history_file)
+    assert test_history.expected_duration("fast") == 100
+    assert test_history.expected_duration("slow") == 1500
+    assert test_history.runs["slow"] == 2
+    assert test_history.expected_duration("unknown") == 800
+
+
+def test_test_history_step_latencies_expect_most_recent_samples_saved(tmp_path):
+    history_file = str(tmp_path / "history.db")
+    test_history = TestHistory(history_file, step_samples=3)
+    for latency in [10, 20, 30, 40]:
+        test_history.record_step_latency("test.1.step", latency)
+    assert test_history.latencies("test.1.step") == [20, 30, 40]
+    test_history.save()
+    test_history.record_step_latency("test.1.step", 50)
+    test_history.save()
+
+    assert TestHistory(history_file, step_samples=3).latencies("test.1.step") == [30, 40, 50]
+
+
+def test_test_history_without_path_expect_kept_in_memory():
+    test_history = TestHistory()
+    test_history.record_step_latency("step", 10)
+    test_history.record("test", 100)
+    test_history.save()
+    assert test_history.latencies("step") == [10]
+    assert test_history.expected_duration("test") == 100
+    assert len(test_history._pending_step_latencies) == 0
+    assert len(test_history._pending_durations) == 0
+
+
+def test_test_history_with_failing_saves_expect_pending_latencies_bounded(tmp_path):
+    test_history = TestHistory(str(tmp_path / "history.db"), max_pending_latencies=2)
+    with mock.patch.object(test_history, "_connect", side_effect=sqlite3.OperationalError("locked")):
+        for latency in [10, 20, 30]:
+            test_history.record_step_latency("step", latency)
+            test_history.save()
+    assert [entry[1] for entry in test_history._pending_step_latencies] == [20, 30]
+    test_history.save()
+    assert len(test_history._pending_step_latencies) == 0
+
+
+def test_percentile_expect_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 99) == 99
+    assert percentile(values, 50) == 50
+    assert percentile([5], 99) == 5
+
+
+def test_adaptive_timeout_expect_scaled_percentile_within_bounds():
+    adaptive_timeout = AdaptiveTimeout(percentile=99, multiplier=3, floor=1000, min_samples=5)
+    assert adaptive_timeout.timeout([100] * 4, 15000) == 15000
+    assert adaptive_timeout.timeout([100] * 5, 15000) == 1000
+    assert adaptive_timeout.timeout([2000] * 5, 15000) == 6000
+    assert adaptive_timeout.timeout([9000] * 5, 15000) == 15000
+    assert AdaptiveTimeout(ceiling=60000, min_samples=5).timeout([9000] * 5, 15000) == 27000
@@ -0,0 +1,28 @@
+import subprocess
+
+from subatomic_coherence.testing.test_impact import changed_files, impacted_tags
+
+
+def test_impacted_tags_expect_tags_for_matching_patterns():
+    tags = impacted_tags({"bot/commands/deploy/*": "deploy", "bot/core/*": ["deploy", "status"], "docs/*": "docs"},
+                         ["bot/core/router.py", "README.md"])
+    assert tags == {"deploy", "status"}
+
+
+def test_changed_files_expect_modified_and_untracked_files(tmp_path):
+    def git(*arguments):
+        subprocess.run(["git"] + list(arguments), cwd=str(tmp_path), check=True, stdout=subprocess.PIPE,
+                       stderr=subprocess.PIPE)
+
+    git("init", "-q")
+    (tmp_path / "tracked.py").write_text("a = 1\n")
+    (tmp_path / "unchanged.py").write_text("b = 1\n")
+    git("add", ".")
+    git("-c", "user.name=test", "-c", "user.email=test@example.com", "commit", "-q", "-m", "initial")
+    (tmp_path / "tracked.py").write_text("a = 2\n")
+    (tmp_path / "new.py").write_text("c = 1\n")
+    assert changed_files(repository_path=str(tmp_path)) == ["new.py", "tracked.py"]
+
+
+def test_changed_files_outside_repository_expect_none(tmp_path):
+    assert changed_files(repository_path=str(tmp_path)) is None
@@ -0,0 +1,32 @@
+from subatomic_coherence.testing.test import TestPortal
+from subatomic_coherence.testing.test_queue import TestQueue
+
+
+def _named_test(name):
+    test = TestPortal()
+    test.name = name
+    return test
+
+
+def test_test_queue_expect_higher_priorities_first_then_insertion_order():
+    queue = TestQueue()
+    queue.push(_named_test("low"), -1)
+    queue.push(_named_test("first"))
+    queue.push(_named_test("urgent"), 5)
+    queue.push(_named_test("second"))
+    assert queue.peek().name == "urgent"
+    assert queue[0].name == "urgent"
+    assert queue[-1].name == "low"
+    assert [test.name for test in queue] == ["urgent", "first", "second", "low"]
+    assert len(queue) == 4
+    assert [queue.pop().name for _ in range(4)] == ["urgent", "first", "second", "low"]
+    assert len(queue) == 0
+
+
+def test_test_queue_with_expected_durations_expect_longest_first_within_priority():
+    queue = TestQueue()
+    queue.push(_named_test("short"), expected_duration=10)
+    queue.push(_named_test("long"), expected_duration=1000)
+    queue.push(_named_test("unknown"))
+    queue.push(_named_test("prioritised"), 1, expected_duration=1)
+    assert [test.name for test in queue] == ["prioritised", "long", "short", "unknown"]
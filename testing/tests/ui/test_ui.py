@@ -0,0 +1,134 @@
+import threading
+from collections import deque
+from unittest import mock
+from unittest.mock import MagicMock
+
+import pytest
+
+from subatomic_coherence.logging.console_logging import ConsoleLogger
+from subatomic_coherence.slack_test_suite import SlackTestSuite
+from subatomic_coherence.testing.test import TestPortal
+from subatomic_coherence.ui.ui import TestStatus, ScreenRenderer, UICommand, TestingStage, InteractiveUI
+
+
+@pytest.fixture(autouse=True)
+def restore_console_logger():
+    # ConsoleLogger's mode and buffer are class level, so each test gets them back as it found them
+    with mock.patch.object(ConsoleLogger, "interactive_mode", ConsoleLogger.interactive_mode), \
+            mock.patch.object(ConsoleLogger, "buffer_capacity", ConsoleLogger.buffer_capacity), \
+            mock.patch.object(ConsoleLogger, "buffered_log", deque(maxlen=ConsoleLogger.buffer_capacity)), \
+            mock.patch.object(ConsoleLogger, "sink", ConsoleLogger.sink):
+        yield
+
+
+def test_update_log_expect_new_lines_appended():
+    test_status = TestStatus(SlackTestSuite())
+    ConsoleLogger.interactive_mode = True
+    ConsoleLogger.read_buffered_log()
+    ConsoleLogger.log("line1\nline2")
+    assert test_status.update_log() is True
+    assert list(test_status.current_log) == ["line1", "line2"]
+    assert test_status.log_version == 2
+    assert test_status.update_log() is False
+
+
+def test_log_window_expect_newest_lines_with_absolute_index():
+    test_status = TestStatus(SlackTestSuite(), log_capacity=3)
+    test_status.current_log.extend(["line1", "line2", "line3", "line4"])
+    test_status.log_version = 4
+    assert test_status.log_window(2) == [("line3", 2), ("line4", 3)]
+    assert test_status.log_window(10) == [("line2", 1), ("line3", 2), ("line4", 3)]
+
+
+def test_screen_renderer_unchanged_status_expect_no_forced_update():
+    screen = MagicMock()
+    test_status = TestStatus(SlackTestSuite())
+    renderer = ScreenRenderer(screen, test_status)
+    renderer.current_time = lambda: 0
+    renderer.update()
+    renderer.current_time = lambda: 1
+    renderer.update()
+    assert screen.force_update.call_count == 1
+    assert screen.draw_next_frame.call_count == 2
+
+
+def test_screen_renderer_within_frame_interval_expect_frame_skipped():
+    screen = MagicMock()
+    renderer = ScreenRenderer(screen, TestStatus(SlackTestSuite()), max_fps=10)
+    renderer.current_time = lambda: 0
+    assert renderer.update() is True
+    renderer.current_time = lambda: 0.05
+    assert renderer.update() is False
+    assert screen.draw_next_frame.call_count == 1
+
+
+def test_process_commands_expect_commands_applied_in_order():
+    test_status = TestStatus(SlackTestSuite())
+    test_status.send_command(UICommand.run_one_test)
+    test_status.send_command(UICommand.set_break_at_test, "a_test")
+    test_status.send_command(UICommand.toggle_recording)
+    test_status.process_commands()
+    assert test_status.current_operation == TestingStage.run_one_test
+    assert test_status.break_at_test == "a_test"
+    assert test_status.is_recording is True
+    assert len(test_status.commands) == 0
+
+
+def test_publish_expect_snapshot_reflects_status():
+    test_suite = SlackTestSuite()
+    test_status = TestStatus(test_suite)
+    test_status.next_test = "a_test"
+    test_status.current_operation = TestingStage.run_tests
+    assert test_status.snapshot.next_test == ""
+    test_status.publish()
+    assert test_status.snapshot.next_test == "a_test"
+    assert test_status.snapshot.current_operation == TestingStage.run_tests
+
+
+def test_publish_expect_log_read_by_suite_into_snapshot():
+    test_status = TestStatus(SlackTestSuite(), log_window_size=2)
+    ConsoleLogger.interactive_mode = True
+    ConsoleLogger.read_buffered_log()
+    ConsoleLogger.log("line1\nline2\nline3")
+    ConsoleLogger.interactive_mode = False
+    test_status.publish()
+    assert test_status.snapshot.log_lines == (("line2", 1), ("line3", 2))
+    test_status.send_command(UICommand.clear_log)
+    test_status.process_commands()
+    test_status.publish()
+    assert test_status.snapshot.log_lines == ()
+
+
+def test_interactive_ui_open_on_worker_thread_expect_error_raised_to_caller():
+    errors = []
+
+    def run_ui():
+        try:
+            InteractiveUI(TestStatus(SlackTestSuite())).run()
+        except RuntimeError as error:
+            errors.append(error)
+
+    ui_thread = threading.Thread(target=run_ui)
+    ui_thread.start()
+    ui_thread.join()
+    assert len(errors) == 1
+
+
+@mock.patch.object(SlackTestSuite, "_connect_clients", return_value=True)
+def test_run_tests_interactive_on_worker_thread_expect_error_raised_before_tests_start(mock_connect):
+    test_suite = SlackTestSuite(interactive=True)
+    test_suite.add_test("test", TestPortal())
+    errors = []
+
+    def run_suite():
+        try:
+            test_suite.run_tests()
+        except RuntimeError as error:
+            errors.append(error)
+
+    suite_thread = threading.Thread(target=run_suite)
+    suite_thread.start()
+    suite_thread.join()
+    assert len(errors) == 1
+    assert len(test_suite.tests) == 1
+    assert test_suite.ui is None
@@ -0,0 +1,40 @@
+from subatomic_coherence.user.action_index import ActionIndex, action_index
+
+
+def _button_message():
+    return {
+        "type": "message",
+        "user": "U1",
+        "attachments": [
+            {"id": 1, "callback_id": "approve", "actions": [{"id": "1", "name": "yes"}, {"id": "2", "name": "no"}]},
+            {"id": 2, "text": "no actions"},
+            {"id": "3", "callback_id": "other", "actions": [{"id": 1, "name": "maybe"}]}
+        ]
+    }
+
+
+def test_action_index_find_attachment_actions_expect_actions_found_by_ids_in_message_order():
+    index = ActionIndex(_button_message())
+    assert [action["name"] for _, action in index.find_attachment_actions()] == ["yes", "no", "maybe"]
+    assert [action["name"] for _, action in index.find_attachment_actions([3, 1])] == ["yes", "no", "maybe"]
+    assert [action["name"] for _, action in index.find_attachment_actions(["1"], [2])] == ["no"]
+    assert [action["name"] for _, action in index.find_attachment_actions(action_ids=[1])] == ["yes", "maybe"]
+    assert index.find_attachment_actions([2]) == []
+
+
+def test_action_index_with_only_blocks_expect_no_actions():
+    index = ActionIndex({
+        "blocks": [
+            {"type": "actions", "block_id": "b1", "elements": [{"type": "button", "action_id": "approve"}]}
+        ]
+    })
+    assert not index.has_actions()
+    assert index.find_attachment_actions() == []
+
+
+def test_action_index_of_changed_message_expect_inner_message_indexed_and_memoised():
+    event = {"type": "message", "subtype": "message_changed", "message": _button_message()}
+    index = action_index(event)
+    assert index.has_actions()
+    assert action_index(event) is index
+    assert not action_index({"type": "message", "text": "plain"}).has_actions()
@@ -0,0 +1,64 @@
+from unittest.mock import MagicMock
+
+from subatomic_coherence.user.channel_pool import ChannelPool
+from subatomic_coherence.user.slack_user import SlackUser
+from subatomic_coherence.user.slack_user_workspace import SlackUserWorkspace
+
+
+def _create_workspace():
+    owner = SlackUser("owner", "token")
+    owner.slack_id = "UOWNER"
+    owner.create_channel = MagicMock(side_effect=lambda name: (True, {"channel": {"id": f"C{name}", "name": name}}))
+    owner.rename_channel = MagicMock(side_effect=lambda channel_id, name: (True, {"channel": {"id": channel_id,
+                                                                                              "name": name}}))
+    owner.unarchive_channel = MagicMock(return_value=(True, {}))
+    owner.archive_channel = MagicMock(return_value=(True, {}))
+    owner.kick_from_channel = MagicMock(return_value=(True, {}))
+    owner.query_channel_members = MagicMock(return_value=["UOWNER", "U1"])
+    slack_user_workspace = SlackUserWorkspace()
+    slack_user_workspace.add_slack_user_client(owner)
+    return slack_user_workspace, owner
+
+
+def test_prepare_expect_channels_created_up_to_pool_size():
+    slack_user_workspace, owner = _create_workspace()
+    pool = ChannelPool("owner", size=2)
+    pool.prepare(slack_user_workspace)
+    pool.clean_up(slack_user_workspace)
+    assert owner.create_channel.call_count == 2
+    assert len(pool.free_channels) == 2
+    assert slack_user_workspace.find_channel_by_name(pool.free_channels[0]["name"]) is not None
+
+
+def test_prepare_with_archived_pool_channel_expect_channel_reused():
+    slack_user_workspace, owner = _create_workspace()
+    slack_user_workspace.set_workspace_channels([{"id": "C1", "name": "coherence-old", "is_archived": True}])
+    pool = ChannelPool("owner", size=1)
+    pool.prepare(slack_user_workspace)
+    pool.clean_up(slack_user_workspace)
+    owner.unarchive_channel.assert_called_once_with("C1")
+    assert owner.create_channel.call_count == 0
+    assert pool.free_channels[0]["id"] == "C1"
+    assert pool.free_channels[0]["name"] != "coherence-old"
+
+
+def test_acquire_with_no_free_channels_expect_none():
+    slack_user_workspace, owner = _create_workspace()
+    pool = ChannelPool("owner", size=1)
+    pool.prepare(slack_user_workspace)
+    assert pool.acquire("test1", slack_user_workspace) is not None
+    assert pool.acquire("test2", slack_user_workspace) is None
+    pool.clean_up(slack_user_workspace)
+
+
+def test_release_expect_channel_recycled_with_new_name_and_members_removed():
+    slack_user_workspace, owner = _create_workspace()
+    pool = ChannelPool("owner", size=1)
+    pool.prepare(slack_user_workspace)
+    channel = pool.acquire("test1", slack_user_workspace)
+    pool.release("test1")
+    pool.clean_up(slack_user_workspace)
+    owner.kick_from_channel.assert_called_once_with("U1", channel["id"])
+    assert pool.free_channels[0]["id"] == channel["id"]
+    assert pool.free_channels[0]["name"] != channel["name"]
+    owner.archive_channel.assert_called_once_with(channel["id"])
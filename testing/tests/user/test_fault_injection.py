@@ -0,0 +1,72 @@
+from unittest import mock
+from unittest.mock import MagicMock
+
+from subatomic_coherence.user.fault_injection import FaultProfile, FaultInjectingClient
+
+
+def _faulty_client(fault_profile, events=None, username="user"):
+    client = MagicMock()
+    client.api_call = MagicMock(return_value={"ok": True})
+    client.rtm_read = MagicMock(return_value=events or [])
+    return FaultInjectingClient(client, fault_profile, username)
+
+
+def test_api_call_without_faults_expect_call_passed_through():
+    faulty_client = _faulty_client(FaultProfile())
+    assert faulty_client.api_call("chat.postMessage", None, channel="C1") == {"ok": True}
+    faulty_client.client.api_call.assert_called_once_with("chat.postMessage", None, channel="C1")
+    assert faulty_client.rtm_connect is faulty_client.client.rtm_connect
+
+
+def test_api_call_with_ratelimit_rate_expect_ratelimited_error_without_call():
+    faulty_client = _faulty_client(FaultProfile(ratelimit_rate=1.0, retry_after=2))
+    response = faulty_client.api_call("users.list")
+    assert response == {"ok": False, "error": "ratelimited", "headers": {"Retry-After": "2"}}
+    faulty_client.client.api_call.assert_not_called()
+    assert faulty_client.injected_faults["ratelimited"] == 1
+
+
+def test_api_call_with_methods_expect_other_methods_not_faulted():
+    faulty_client = _faulty_client(FaultProfile(ratelimit_rate=1.0, methods=["chat.postMessage"]))
+    assert faulty_client.api_call("users.list") == {"ok": True}
+    assert faulty_client.api_call("chat.postMessage")["error"] == "ratelimited"
+
+
+def test_api_call_with_delay_expect_sleep():
+    faulty_client = _faulty_client(FaultProfile(api_delay=(100, 100)))
+    with mock.patch("subatomic_coherence.user.fault_injection.time.sleep") as mock_sleep:
+        faulty_client.api_call("users.list")
+    mock_sleep.assert_called_once_with(0.1)
+
+
+def test_rtm_read_with_drops_and_duplicates_expect_seeded_faults():
+    events = [{"type": "message", "ts": str(index)} for index in range(100)]
+    fault_profile = FaultProfile(seed=7, drop_rate=0.2, duplicate_rate=0.2)
+    first_read = _faulty_client(fault_profile, events).rtm_read()
+    second_read = _faulty_client(fault_profile, events).rtm_read()
+    assert first_read == second_read
+    assert len(first_read) != len(events)
+    assert set(event["ts"] for event in first_read) < set(event["ts"] for event in events)
+    assert _faulty_client(fault_profile, events, "other_user").rtm_read() != first_read
+
+
+def test_rtm_read_with_api_calls_between_reads_expect_same_seeded_faults():
+    events = [{"type": "message", "ts": str(index)} for index in range(100)]
+    fault_profile = FaultProfile(seed=7, drop_rate=0.2, ratelimit_rate=0.5)
+    first_read = _faulty_client(fault_profile, events).rtm_read()
+    faulty_client = _faulty_client(fault_profile, events)
+    for _ in range(10):
+        faulty_client.api_call("users.list")
+    assert faulty_client.rtm_read() == first_read
+
+
+def test_rtm_read_with_delay_expect_events_held_back_until_due():
+    faulty_client = _faulty_client(FaultProfile(rtm_delay=(1000, 1000)), [{"type": "message", "ts": "1"}])
+    with mock.patch("subatomic_coherence.user.fault_injection.time.monotonic", return_value=10):
+        assert faulty_client.rtm_read() == []
+    faulty_client.client.rtm_read = MagicMock(return_value=[{"type": "message", "ts": "2"}])
+    with mock.patch("subatomic_coherence.user.fault_injection.time.monotonic", return_value=11):
+        assert faulty_client.rtm_read() == [{"type": "message", "ts": "1"}]
+    faulty_client.client.rtm_read = MagicMock(return_value=[])
+    with mock.patch("subatomic_coherence.user.fault_injection.time.monotonic", return_value=12):
+        assert faulty_client.rtm_read() == [{"type": "message", "ts": "2"}]
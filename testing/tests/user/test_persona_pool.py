@@ -0,0 +1,30 @@
+from subatomic_coherence.user.persona_pool import PersonaPool
+
+
+def test_lease_expect_personas_leased_exclusively():
+    pool = PersonaPool()
+    pool.add_persona("user1", "developer")
+    pool.add_persona("user2", "developer")
+    assert pool.lease("developer", 1, "test1") == ["user1"]
+    assert pool.lease("developer", 1, "test2") == ["user2"]
+    assert pool.available("developer") == []
+
+
+def test_lease_not_enough_personas_expect_nothing_leased():
+    pool = PersonaPool()
+    pool.add_persona("user1", "developer")
+    pool.add_persona("user2", "developer")
+    pool.lease("developer", 1, "test1")
+    assert pool.lease("developer", 2, "test2") is None
+    assert pool.available("developer") == ["user2"]
+
+
+def test_release_expect_personas_available_again():
+    pool = PersonaPool()
+    pool.add_persona("user1", "developer")
+    pool.add_persona("user1", "admin")
+    pool.lease("developer", 1, "test1")
+    assert pool.available("admin") == []
+    pool.release("test1")
+    assert pool.available("admin") == ["user1"]
+    assert pool.leased_by("test1") == []
@@ -1,6 +1,10 @@
+import threading
+import time
 from unittest import mock
 from unittest.mock import MagicMock
 
+from subatomic_coherence.profiling.profiling import ProfileCollector, add_profiling_hook, remove_profiling_hook
+from subatomic_coherence.user.fault_injection import FaultProfile
 from subatomic_coherence.user.slack_user import SlackUser, RateLimiter, EventStore
 from testing.mocking.mocking import MockRequestsResponse
 
@@ -17,6 +21,69 @@ def test_user_connect_expect_failure():
     assert user.connect() is False
 
 
+def test_api_call_and_rtm_read_with_profile_collector_expect_calls_profiled():
+    user = SlackUser("user", "token")
+    user.client.api_call = MagicMock(return_value={"ok": True})
+    user.client.rtm_read = MagicMock(return_value=[])
+    profile_collector = ProfileCollector()
+    add_profiling_hook(profile_collector)
+    try:
+        assert user.invite_to_channel("some_user", "some_channel") is True
+        assert user.rtm_read() == []
+    finally:
+        remove_profiling_hook(profile_collector)
+    user.client.api_call.assert_called_once_with("channels.invite", user="some_user", channel="some_channel")
+    assert set(profile_collector.histograms) == {("api_call", "channels.invite"), ("rtm_read", "user")}
+
+
+@mock.patch("subatomic_coherence.user.slack_user.sleep")
+def test_api_call_ratelimited_expect_retried_after_retry_after(mock_sleep):
+    user = SlackUser("user", "token", ratelimit_retries=3)
+    ratelimited_response = {"ok": False, "error": "ratelimited", "headers": {"Retry-After": "3"}}
+    user.client.api_call = MagicMock(side_effect=[ratelimited_response, {"ok": True}])
+    assert user.api_call("users.list") == {"ok": True}
+    mock_sleep.assert_called_once_with(3)
+
+
+@mock.patch("subatomic_coherence.user.slack_user.sleep")
+def test_api_call_with_fault_profile_expect_ratelimited_after_retries(mock_sleep):
+    user = SlackUser("user", "token", fault_profile=FaultProfile(ratelimit_rate=1.0), ratelimit_retries=2)
+    assert user.api_call("users.list")["error"] == "ratelimited"
+    assert mock_sleep.call_count == 2
+    assert user.client.injected_faults["ratelimited"] == 3
+
+
+def test_api_call_from_several_threads_expect_calls_serialised():
+    user = SlackUser("user", "token")
+    running = []
+    overlapped = []
+
+    def api_call(method, *args, **kwargs):
+        running.append(method)
+        overlapped.append(len(running) > 1)
+        time.sleep(0.001)
+        running.pop()
+        return {"ok": True}
+
+    user.client.api_call = api_call
+    threads = [threading.Thread(target=lambda: [user.api_call("channels.info") for _ in range(20)]) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(overlapped) == 60
+    assert not any(overlapped)
+
+
+@mock.patch("subatomic_coherence.user.slack_user.sleep")
+def test_api_call_ratelimited_by_default_expect_not_retried(mock_sleep):
+    user = SlackUser("user", "token")
+    user.client.api_call = MagicMock(return_value={"ok": False, "error": "ratelimited"})
+    assert user.api_call("users.list")["error"] == "ratelimited"
+    user.client.api_call.assert_called_once()
+    mock_sleep.assert_not_called()
+
+
 def test_link_user_details_expect_correct_slack_id_found():
     user = SlackUser("user", "token")
     assert user.link_user_details([{"name": "user", "id": "U2203024"}]) is True
@@ -190,6 +257,35 @@ def test_attachment_action_expect_body_and_url_correctly_formed(mock_post):
     assert result is True
 
 
+@mock.patch('subatomic_coherence.user.slack_user.requests.post', side_effect=_mock_attachment_action_post)
+def test_attachment_action_expect_profiled_as_api_call(mock_post):
+    user = SlackUser("user", "token")
+    profile_collector = ProfileCollector()
+    add_profiling_hook(profile_collector)
+    try:
+        result, _ = user.attachment_action("service_id", "bot_user_id", [], "attachment_id", "callback_id",
+                                           "channel_id", "message_ts")
+    finally:
+        remove_profiling_hook(profile_collector)
+    assert result is True
+    assert set(profile_collector.histograms) == {("api_call", "chat.attachmentAction")}
+
+
+@mock.patch("subatomic_coherence.user.slack_user.sleep")
+@mock.patch('subatomic_coherence.user.slack_user.requests.post')
+def test_attachment_action_with_fault_profile_expect_ratelimited_and_retried(mock_post, mock_sleep):
+    user = SlackUser("user", "token", fault_profile=FaultProfile(ratelimit_rate=1.0, retry_after=2),
+                     ratelimit_retries=1)
+    result, response = user.attachment_action("service_id", "bot_user_id", [], "attachment_id", "callback_id",
+                                              "channel_id", "message_ts")
+    assert result is False
+    assert response.status_code == 429
+    assert response.json()["error"] == "ratelimited"
+    mock_sleep.assert_called_once_with(2)
+    mock_post.assert_not_called()
+    assert user.client.injected_faults["ratelimited"] == 2
+
+
 def test_rate_limiter_log_call_expect_call_logged():
     limiter = RateLimiter(2, 100000)
     limiter.current_milli_time = lambda: 0
@@ -257,4 +353,86 @@ def test_event_store_iter_expect_success():
         assert event["id"] == 5
 
     assert event_store.last_processed_event is None
-    assert event_store.next_event_index == 1
\ No newline at end of file
+    assert event_store.next_event_index == 1
+
+
+def test_create_channel_expect_success():
+    user = SlackUser("user", "token")
+    user.client.api_call = MagicMock(return_value={"ok": True, "channel": {"id": "C1", "name": "channel"}})
+    result, response = user.create_channel("channel")
+    assert result is True
+    assert response["channel"]["id"] == "C1"
+
+
+def test_rename_channel_expect_failure():
+    user = SlackUser("user", "token")
+    user.client.api_call = MagicMock(return_value={"ok": False})
+    result, response = user.rename_channel("C1", "channel")
+    assert result is False
+
+
+def test_archive_channel_expect_success():
+    user = SlackUser("user", "token")
+    user.client.api_call = MagicMock(return_value={"ok": True})
+    result, response = user.archive_channel("C1")
+    assert result is True
+
+
+def test_query_channel_members_expect_member_ids():
+    user = SlackUser("user", "token")
+    user.client.api_call = MagicMock(return_value={"ok": True, "channel": {"members": ["U1", "U2"]}})
+    assert user.query_channel_members("C1") == ["U1", "U2"]
+
+
+def test_rate_limiter_where_not_exceeding_count_expect_no_wait_time():
+    limiter = RateLimiter(2, 10)
+    limiter.current_milli_time = lambda: 0
+    limiter.log_call()
+    assert limiter.wait_time() == 0
+    limiter.log_call()
+    limiter.current_milli_time = lambda: 4
+    assert limiter.wait_time() == 6
+
+
+def test_rate_limiter_acquire_expect_call_logged_without_waiting():
+    limiter = RateLimiter(2, 100000)
+    limiter.acquire()
+    limiter.acquire()
+    assert len(limiter.calls) == 2
+    assert limiter.can_call() is False
+
+
+def test_event_store_find_messages_expect_messages_indexed_by_channel_and_thread():
+    event_store = EventStore()
+    channel_message = {"type": "message", "user": "U1", "channel": "C1", "text": "a"}
+    thread_message = {"type": "message", "user": "U1", "channel": "C1", "text": "b", "thread_ts": "1.0"}
+    event_store.load_event(channel_message)
+    event_store.load_event(thread_message)
+    event_store.load_event({"type": "message", "user": "U2", "channel": "C1", "text": "c"})
+    assert event_store.find_messages("U1") == [channel_message, thread_message]
+    assert event_store.find_messages("U1", channel_id="C1", is_thread=True) == [thread_message]
+    assert event_store.find_messages("U1", thread_ts="1.0") == [thread_message]
+    assert event_store.find_messages("U1", channel_id="C2") == []
+
+
+def test_event_store_find_messages_with_changed_message_expect_indexed_by_inner_user():
+    event_store = EventStore()
+    event = {"type": "message", "subtype": "message_changed", "channel": "C1", "message": {"user": "U1"}}
+    event_store.load_event(event)
+    assert event_store.find_messages("U1", channel_id="C1") == [event]
+    event_store.clear_event_store()
+    assert event_store.find_messages("U1") == []
+
+
+def test_event_store_find_action_messages_expect_only_interactive_messages_indexed():
+    event_store = EventStore()
+    action_message = {"type": "message", "user": "U1", "channel": "C1",
+                      "attachments": [{"id": 1, "actions": [{"id": "1"}]}]}
+    event_store.load_event(action_message)
+    event_store.load_event({"type": "message", "user": "U1", "channel": "C1", "attachments": [{"id": 1}]})
+    event_store.load_event({"type": "message", "user": "U1", "channel": "C1", "text": "plain"})
+    assert event_store.find_action_messages("U1") == [action_message]
+    assert event_store.find_action_messages("U1", "C1") == [action_message]
+    assert event_store.find_action_messages("U1", "C2") == []
+    event_store.clear_event_store()
+    assert event_store.find_action_messages("U1") == []
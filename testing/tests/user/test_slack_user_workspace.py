@@ -135,3 +135,73 @@ def test_find_group_or_channel_by_id_expect_failure():
     slack_user_workspace.set_workspace_groups([{"id": "group1"}, {"id": "group2"}])
     result = slack_user_workspace.find_channel_by_slack_id("channel3")
     assert result is None
+
+
+def test_apply_event_team_join_and_user_change_expect_user_directory_updated():
+    slack_user_workspace = SlackUserWorkspace()
+    slack_user_workspace.set_workspace_user_details([{"id": "U1", "name": "user1"}])
+    slack_user_workspace.apply_event({"type": "team_join", "user": {"id": "U2", "name": "user2"}})
+    user = slack_user_workspace.find_user_by_slack_id("U1")
+    slack_user_workspace.apply_event({"type": "user_change", "user": {"id": "U1", "name": "renamed", "real_name": "R"}})
+    assert slack_user_workspace.find_user_by_username("user2")["id"] == "U2"
+    assert slack_user_workspace.find_user_by_username("user1") is None
+    assert slack_user_workspace.find_user_by_username("renamed") is user
+    assert user["real_name"] == "R"
+    assert len(slack_user_workspace.workspace_user_details) == 2
+
+
+def test_apply_event_channel_rename_archive_and_delete_expect_channel_directory_updated():
+    slack_user_workspace = SlackUserWorkspace()
+    slack_user_workspace.set_workspace_channels([{"id": "C1", "name": "general"}, {"id": "C2", "name": "random"}])
+    slack_user_workspace.apply_event({"type": "channel_rename", "channel": {"id": "C1", "name": "announcements"}})
+    slack_user_workspace.apply_event({"type": "channel_archive", "channel": "C1", "user": "U1"})
+    slack_user_workspace.apply_event({"type": "channel_deleted", "channel": "C2"})
+    assert slack_user_workspace.find_channel_by_name("general") is None
+    assert slack_user_workspace.find_channel_by_name("announcements")["is_archived"] is True
+    assert slack_user_workspace.find_channel_by_slack_id("C2") is None
+    assert slack_user_workspace.workspace_channels == [{"id": "C1", "name": "announcements", "is_archived": True}]
+    slack_user_workspace.apply_event({"type": "channel_unarchive", "channel": "C1", "user": "U1"})
+    assert slack_user_workspace.find_channel_by_slack_id("C1")["is_archived"] is False
+
+
+def test_apply_event_group_events_expect_group_directory_updated():
+    slack_user_workspace = SlackUserWorkspace()
+    slack_user_workspace.apply_event({"type": "group_joined", "channel": {"id": "G1", "name": "secret"}})
+    slack_user_workspace.apply_event({"type": "channel_rename", "channel": {"id": "G1", "name": "private"}})
+    slack_user_workspace.apply_event({"type": "group_archive", "channel": "G1"})
+    assert slack_user_workspace.find_group_by_name("private") == {"id": "G1", "name": "private", "is_archived": True}
+    assert slack_user_workspace.find_channel_by_slack_id("G1") is None
+    assert slack_user_workspace.find_group_or_channel_by_name("private")["id"] == "G1"
+
+
+def test_upsert_channel_with_duplicate_names_expect_first_channel_found_after_rename():
+    slack_user_workspace = SlackUserWorkspace()
+    slack_user_workspace.set_workspace_channels([{"id": "C1", "name": "dup"}, {"id": "C2", "name": "dup"}])
+    assert slack_user_workspace.find_channel_by_name("dup")["id"] == "C1"
+    slack_user_workspace.upsert_channel({"id": "C1", "name": "unique"})
+    assert slack_user_workspace.find_channel_by_name("dup")["id"] == "C2"
+    assert slack_user_workspace.find_channel_by_name("unique")["id"] == "C1"
+
+
+def test_assign_workspace_lists_expect_directories_rebuilt():
+    slack_user_workspace = SlackUserWorkspace()
+    slack_user_workspace.workspace_user_details = [{"id": "U1", "name": "user"}]
+    slack_user_workspace.workspace_channels = [{"id": "C1", "name": "general"}]
+    slack_user_workspace.workspace_groups = [{"id": "G1", "name": "private"}]
+    assert slack_user_workspace.find_user_by_slack_id("U1")["name"] == "user"
+    assert slack_user_workspace.find_channel_by_name("general")["id"] == "C1"
+    assert slack_user_workspace.find_group_by_name("private")["id"] == "G1"
+    assert slack_user_workspace.workspace_channels == [{"id": "C1", "name": "general"}]
+
+
+def test_snapshot_expect_directories_copied_and_clients_shared():
+    slack_user_workspace = SlackUserWorkspace()
+    slack_user_workspace.add_slack_user_client(SlackUser("user", "token"))
+    slack_user_workspace.set_workspace_channels([{"id": "C1", "name": "general"}])
+    snapshot = slack_user_workspace.snapshot()
+    slack_user_workspace.upsert_channel({"id": "C1", "name": "renamed"})
+    slack_user_workspace.upsert_channel({"id": "C2", "name": "new"})
+    assert snapshot.find_channel_by_name("general")["id"] == "C1"
+    assert snapshot.find_channel_by_name("new") is None
+    assert snapshot.find_user_client_by_username("user") is slack_user_workspace.find_user_client_by_username("user")
+    assert snapshot.persona_pool is slack_user_workspace.persona_pool